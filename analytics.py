@@ -0,0 +1,147 @@
+"""
+Analytics Module for GitLab MR Manager
+Maintains daily MR throughput rollups in the analytics collection, updated incrementally from the MR sync
+"""
+
+import logging
+import statistics
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+from database import get_mrs_collection, get_analytics_collection
+from stages import mr_stage, STAGES
+
+logger = logging.getLogger(__name__)
+
+DAILY_METRIC = 'mr_daily'
+
+def parse_timestamp(value):
+    """Parse a GitLab ISO timestamp into an aware UTC datetime"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc)
+
+def _day(moment):
+    return moment.strftime('%Y-%m-%d') if moment else None
+
+def _contribution(doc):
+    """Day buckets an MR document counts towards"""
+    created_at = parse_timestamp(doc['created_at'])
+    merged_at = parse_timestamp(doc.get('merged_at')) if doc['state'] == 'merged' else None
+    closed_at = parse_timestamp(doc.get('closed_at')) if doc['state'] == 'closed' else None
+    return {
+        'opened': _day(created_at),
+        'merged': _day(merged_at),
+        'merge_hours': round((merged_at - created_at).total_seconds() / 3600, 2) if merged_at else None,
+        'closed': _day(closed_at)
+    }
+
+def update_rollups(changed, closed_ids):
+    """Sync listener applying the rollup deltas of changed MRs to their day buckets.
+
+    Each MR remembers what it was counted as (the rollup field of its merge_requests record), so
+    re-synced MRs only move counts between buckets and only the affected days are written.
+    """
+    mrs_collection = get_mrs_collection()
+    analytics_collection = get_analytics_collection()
+    if mrs_collection is None or analytics_collection is None or not changed:
+        return
+
+    previous = {doc['mr_id']: doc.get('rollup') or {} for doc in
+                mrs_collection.find({'mr_id': {'$in': [doc['mr_id'] for doc in changed]}}, {'mr_id': 1, 'rollup': 1})}
+
+    incs = defaultdict(lambda: defaultdict(int))
+    sets = defaultdict(dict)
+    unsets = defaultdict(dict)
+    mr_updates = []
+
+    for doc in changed:
+        mr_id = doc['mr_id']
+        old = previous.get(mr_id, {})
+        new = _contribution(doc)
+
+        for metric in ('opened', 'merged', 'closed'):
+            if old.get(metric) != new[metric]:
+                if old.get(metric):
+                    incs[old[metric]][metric] -= 1
+                if new[metric]:
+                    incs[new[metric]][metric] += 1
+
+        if old.get('merged') and old['merged'] != new['merged']:
+            unsets[old['merged']][f"merge_hours.{mr_id}"] = ''
+        if new['merged'] and (old.get('merged') != new['merged'] or old.get('merge_hours') != new['merge_hours']):
+            sets[new['merged']][f"merge_hours.{mr_id}"] = new['merge_hours']
+
+        # Time in a review stage is booked on the day the MR leaves it; label changes bump updated_at
+        stage = mr_stage(doc['labels']) if doc['state'] == 'opened' else None
+        new['stage'], new['stage_since'] = old.get('stage'), old.get('stage_since')
+        if stage != old.get('stage'):
+            left_at = parse_timestamp(doc['updated_at'])
+            if old.get('stage') and old.get('stage_since'):
+                hours = (left_at - parse_timestamp(old['stage_since'])).total_seconds() / 3600
+                incs[_day(left_at)][f"stage_hours.{old['stage']}"] += round(max(hours, 0), 2)
+                incs[_day(left_at)][f"stage_exits.{old['stage']}"] += 1
+            new['stage'], new['stage_since'] = stage, doc['updated_at'] if stage else None
+
+        if new != old:
+            mr_updates.append(UpdateOne({'mr_id': mr_id}, {'$set': {'rollup': new}}))
+
+    merge_days = set(sets) | set(unsets)
+    days = set(incs) | merge_days
+    bucket_updates = []
+    for day in days:
+        update = {'$setOnInsert': {'metric_type': DAILY_METRIC, 'date': day}}
+        deltas = {field: delta for field, delta in incs.get(day, {}).items() if delta}
+        if deltas:
+            update['$inc'] = deltas
+        if day in sets:
+            update['$set'] = sets[day]
+        if day in unsets:
+            update['$unset'] = unsets[day]
+        bucket_updates.append(UpdateOne({'metric_type': DAILY_METRIC, 'date': day}, update, upsert=True))
+
+    if bucket_updates:
+        analytics_collection.bulk_write(bucket_updates, ordered=False)
+    if mr_updates:
+        mrs_collection.bulk_write(mr_updates, ordered=False)
+
+    if merge_days:
+        _refresh_medians(analytics_collection, merge_days)
+
+    logger.info(f"Updated analytics rollups for {len(days)} days from {len(changed)} MRs")
+
+def _refresh_medians(analytics_collection, days):
+    """Recompute the median time to merge of the given day buckets"""
+    updates = []
+    for bucket in analytics_collection.find({'metric_type': DAILY_METRIC, 'date': {'$in': list(days)}},
+                                            {'date': 1, 'merge_hours': 1}):
+        hours = list((bucket.get('merge_hours') or {}).values())
+        median = round(statistics.median(hours), 2) if hours else None
+        updates.append(UpdateOne({'_id': bucket['_id']}, {'$set': {'median_time_to_merge_hours': median}}))
+    if updates:
+        analytics_collection.bulk_write(updates, ordered=False)
+
+def get_daily_rollups(days=30):
+    """Daily rollups for the last `days` days, oldest first"""
+    analytics_collection = get_analytics_collection()
+    if analytics_collection is None:
+        return []
+
+    start = _day(datetime.now(timezone.utc) - timedelta(days=days - 1))
+    rollups = []
+    for bucket in analytics_collection.find({'metric_type': DAILY_METRIC, 'date': {'$gte': start}},
+                                            {'_id': 0, 'merge_hours': 0}).sort('date', 1):
+        stage_hours = bucket.pop('stage_hours', {})
+        stage_exits = bucket.pop('stage_exits', {})
+        rollups.append({
+            'date': bucket['date'],
+            'opened': int(bucket.get('opened', 0)),
+            'merged': int(bucket.get('merged', 0)),
+            'closed': int(bucket.get('closed', 0)),
+            'median_time_to_merge_hours': bucket.get('median_time_to_merge_hours'),
+            'avg_stage_hours': {
+                stage: round(stage_hours[stage] / stage_exits[stage], 2)
+                for stage in STAGES if stage_exits.get(stage)
+            }
+        })
+    return rollups
@@ -1,27 +1,45 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g
 import os
-import subprocess
 import json
 from datetime import datetime, timedelta
 import re
+import time
+import threading
+import logging
 import gitlab
-import redis
-import pickle
 from database import db_manager, insert_document, find_documents, find_one_document, update_document, delete_document, count_documents
+from cache import get_cached_data, set_cached_data, invalidate_cache, clear_all_cache, cache_ttl, redis_available, active_backend, start_redis_check
+from enrichment import pipeline_enricher, diff_stats_enricher, git_status_enricher
+from git_engine import run_git_command
+from mirror import GITLAB_MIRROR_ENABLED, mirror_scheduler
+from sync import mr_sync, persist_mrs
+from analytics import update_rollups, get_daily_rollups
+from review_latency import label_event_ingester, latency_percentiles
+from search import SORTS, search_index, encode_cursor, decode_cursor
+from stages import PAGE_STAGES, in_stage, matches_filters
+from listing import list_mr_records
+from export import EXPORT_FORMATS, export_query, export_mrs
+from fragments import fragment_cache
+from merge_queue import merge_queue
+from records import MRRecord
+from ratelimit import gitlab_budget, BudgetedSession
+from breaker import gitlab_breaker
+from cassette import GITLAB_CASSETTE_MODE, gitlab_cassette
+from timing import timed, init_app as init_request_timing
+from metrics import metrics_response, init_app as init_metrics
+from health import health_checker
+from leader import leader_election
 
 app = Flask(__name__)
+init_request_timing(app)
+init_metrics(app)
+logger = logging.getLogger(__name__)
 
 # Configuration
-GITLAB_REPO_PATH = os.getenv('GITLAB_REPO_PATH', '/path/to/your/gitlab/repo')
 GITLAB_URL = os.getenv('GITLAB_URL', 'https://git.csez.zohocorpin.com')
 GITLAB_TOKEN = os.getenv('GITLAB_TOKEN', 'VJaybg9Leej4zscS_Xf4')
 PROJECT_ID = os.getenv('PROJECT_ID', '16895')
-
-# Redis Configuration
-REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
-REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
-REDIS_DB = int(os.getenv('REDIS_DB', 0))
-REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
+GITLAB_TIMEOUT = int(os.getenv('GITLAB_TIMEOUT', 10))  # seconds before a GitLab call is abandoned
 
 # Load environment variables from .env file if it exists
 try:
@@ -33,91 +51,69 @@ except ImportError:
     # python-dotenv not installed, continue without it
     pass
 
-# Initialize GitLab client
+# Every GitLab call of every thread goes through the shared API budget and the circuit breaker
+session = BudgetedSession(gitlab_budget, gitlab_breaker)
+if GITLAB_CASSETTE_MODE:
+    # Record GitLab responses for offline benchmarks, or replay a recording instead of calling GitLab.
+    # Outside the try below: an unknown mode or a missing cassette must fail startup, not look like GitLab is down
+    gitlab_cassette.install(session)
+
+# Initialize GitLab client without any network call; the connection is verified by start_background_workers()
 try:
-    gl = gitlab.Gitlab(url=GITLAB_URL, private_token=GITLAB_TOKEN)
-    gl.auth()  # Explicit authentication
-    project = gl.projects.get(PROJECT_ID)
-    print(f"GitLab connection successful! Project: {project.name}")
+    gl = gitlab.Gitlab(url=GITLAB_URL, private_token=GITLAB_TOKEN, timeout=GITLAB_TIMEOUT, session=session)
+    project = gl.projects.get(PROJECT_ID, lazy=True)
 except Exception as e:
-    print(f"Error connecting to GitLab: {e}")
+    logger.error(f"Error creating GitLab client: {e}")
     gl = None
     project = None
 
-# Initialize Redis client
-try:
-    redis_client = redis.Redis(
-        host=REDIS_HOST,
-        port=REDIS_PORT,
-        db=REDIS_DB,
-        password=REDIS_PASSWORD,
-        decode_responses=False  # Keep as bytes for pickle compatibility
-    )
-    # Test connection
-    redis_client.ping()
-    print("Redis connection established successfully")
-except Exception as e:
-    print(f"Error connecting to Redis: {e}")
-    redis_client = None
-
-def get_cached_data(key):
-    """Get data from Redis cache"""
-    if redis_client is None:
-        return None
-    
-    try:
-        cached_data = redis_client.get(key)
-        if cached_data:
-            return pickle.loads(cached_data)
-        return None
-    except Exception as e:
-        print(f"Error getting cached data for key {key}: {e}")
-        return None
-
-def set_cached_data(key, data, expiry_hours=24):
-    """Set data in Redis cache with expiry"""
-    if redis_client is None:
-        return False
-    
-    try:
-        pickled_data = pickle.dumps(data)
-        redis_client.setex(key, expiry_hours * 3600, pickled_data)  # Convert hours to seconds
-        return True
-    except Exception as e:
-        print(f"Error setting cached data for key {key}: {e}")
-        return False
-
-def invalidate_cache(pattern):
-    """Invalidate cache entries matching a pattern"""
-    if redis_client is None:
-        return False
-    
-    try:
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
-            print(f"Invalidated {len(keys)} cache entries matching pattern: {pattern}")
-        return True
-    except Exception as e:
-        print(f"Error invalidating cache for pattern {pattern}: {e}")
-        return False
-
-def run_git_command(command, repo_path=None):
-    """Run git command and return output"""
-    if repo_path is None:
-        repo_path = GITLAB_REPO_PATH
-    
-    try:
-        result = subprocess.run(
-            ['git'] + command,
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        return result.stdout.strip(), result.stderr.strip(), result.returncode
-    except Exception as e:
-        return "", str(e), -1
+def connect_gitlab(retry_interval=30):
+    """Authenticate and load the project details, then start the workers that need them"""
+    while True:
+        try:
+            gl.auth()  # Explicit authentication
+            details = gl.projects.get(PROJECT_ID)
+            logger.info(f"GitLab connection successful! Project: {details.name}")
+            break
+        except Exception as e:
+            logger.error(f"Error connecting to GitLab: {e}")
+            time.sleep(retry_interval)
+    if GITLAB_MIRROR_ENABLED:
+        mirror_scheduler.start(details, GITLAB_TOKEN)
+
+_workers_started = False
+
+def start_background_workers():
+    """Connect to MongoDB, Redis and GitLab and start the background workers; once per process, after any fork"""
+    global _workers_started
+    if _workers_started:
+        return
+    _workers_started = True
+    db_manager.start()
+    start_redis_check()
+    health_checker.start()
+    if project is None:
+        return
+    threading.Thread(target=connect_gitlab, name='gitlab-connect', daemon=True).start()
+    gitlab_breaker.start(lambda: gl.http_get('/version'))
+    pipeline_enricher.start(project, PROJECT_ID)
+    diff_stats_enricher.start(project, PROJECT_ID)
+    git_status_enricher.start(project, PROJECT_ID)
+
+    # Store and index synced MRs, derive analytics and review latency, and keep the local mirror current
+    mr_sync.add_listener(persist_mrs)
+    mr_sync.add_listener(update_rollups)
+    mr_sync.add_listener(label_event_ingester.on_sync)
+    label_event_ingester.start(project)
+    mr_sync.add_listener(search_index.on_sync, every_process=True)
+    mr_sync.add_listener(search_index.snapshot_on_sync)
+    search_index.start()
+    if GITLAB_MIRROR_ENABLED:
+        # Each instance keeps its own local mirror for the git engine
+        mr_sync.add_listener(mirror_scheduler.on_sync, every_process=True)
+
+    mr_sync.start(project)
+    merge_queue.start(project)
 
 def get_mr_status(mr_id):
     """Get the status of a merge request"""
@@ -128,71 +124,46 @@ def get_mr_status(mr_id):
         mr = project.mergerequests.get(mr_id)
         return mr.state
     except Exception as e:
-        print(f"Error getting MR status: {e}")
+        logger.error(f"Error getting MR status: {e}")
         return 'unknown'
 
+# Last MR listing fetched from GitLab per state -> (records, fetch time), served while GitLab is unavailable
+last_good_mrs = {}
+
 def fetch_gitlab_mrs(state='opened'):
-    """Fetch merge requests from GitLab API"""
+    """Fetch merge requests from GitLab API as compact MRRecords (converted to dicts per page)"""
     if project is None:
         return []
     
     try:
-        mrs = project.mergerequests.list(state=state, get_all=True)
-        mr_list = []
-        
-        for mr in mrs:
-            # Get assignees (for display purposes only)
-            assignees = []
-            if mr.assignees:
-                for assignee in mr.assignees:
-                    assignees.append(assignee.get('username', assignee.get('name', 'Unknown')))
-            
-            # Get labels
-            labels = mr.labels if mr.labels else []
-            
-            # Get actual reviewers from the reviewers field
-            reviewers = []
-            if hasattr(mr, 'reviewers') and mr.reviewers:
-                for reviewer in mr.reviewers:
-                    reviewer_name = reviewer.get('username', reviewer.get('name', 'Unknown'))
-                    if reviewer_name != 'Unknown':
-                        reviewers.append(reviewer_name)
-            elif hasattr(mr, 'approved_by') and mr.approved_by:
-                # For merged MRs, use people who have already reviewed
-                for approver in mr.approved_by:
-                    reviewer_name = approver.get('user', {}).get('username', 'Unknown')
-                    if reviewer_name != 'Unknown':
-                        reviewers.append(reviewer_name)
-            
-            mr_data = {
-                'id': mr.iid,
-                'title': mr.title,
-                'author': mr.author.get('username', mr.author.get('name', 'Unknown')),
-                'created_at': mr.created_at.split('T')[0] if mr.created_at else 'Unknown',
-                'updated_at': mr.updated_at.split('T')[0] if mr.updated_at else 'Unknown',
-                'labels': labels,
-                'assignees': assignees,  # Keep for display purposes
-                'reviewers': reviewers,  # Add actual reviewers
-                'state': mr.state,
-                'web_url': mr.web_url,
-                'source_branch': mr.source_branch,
-                'target_branch': mr.target_branch
-            }
-            
-            if mr.merged_at:
-                mr_data['merged_at'] = mr.merged_at.split('T')[0]
-                mr_data['merged_by'] = mr.merged_by.get('username', 'Unknown') if mr.merged_by else 'Unknown'
-            
-            if mr.closed_at:
-                mr_data['closed_at'] = mr.closed_at.split('T')[0]
-                mr_data['closed_by'] = mr.closed_by.get('username', 'Unknown') if mr.closed_by else 'Unknown'
-            
-            mr_list.append(mr_data)
-        
-        return mr_list
+        # Raw JSON listing: no python-gitlab object per MR
+        mrs = list_mr_records(gl, PROJECT_ID, state=state)
+        last_good_mrs[state] = (mrs, time.time())
+        return mrs
     except Exception as e:
-        print(f"Error fetching MRs: {e}")
-        return []
+        logger.error(f"Error fetching MRs: {e}")
+        return last_known_good_mrs(state)
+
+def last_known_good_mrs(state):
+    """Last MRs fetched in a state, or the synced snapshot; marks the request as showing stale data"""
+    if state in last_good_mrs:
+        mrs, as_of = last_good_mrs[state]
+    else:
+        snapshot = search_index.matching()
+        mrs = sorted((mr for mr in snapshot if mr.state == state), key=lambda mr: mr.id, reverse=True)
+        # The snapshot is at least as fresh as the last sync, or its newest MR update
+        as_of = mr_sync.last_sync or max((mr.updated_at for mr in snapshot), default=None)
+    if as_of is not None:
+        g.data_as_of = min(as_of, g.get('data_as_of', as_of))
+    return mrs
+
+def stage_counts(open_mrs):
+    """Number of open MRs in each review stage"""
+    counts = {'to_be_reviewed': 0, 'reviewed': 0, 'good_to_merge': 0}
+    for mr in open_mrs:
+        if mr.stage in counts:
+            counts[mr.stage] += 1
+    return counts
 
 def get_mr_stats():
     """Get MR statistics from GitLab"""
@@ -207,53 +178,29 @@ def get_mr_stats():
         
         # Calculate counts for different MR states
         open_mrs = fetch_gitlab_mrs(state='opened')
-        to_be_reviewed_count = 0
-        reviewed_count = 0
-        good_to_merge_count = 0
-        
-        for mr in open_mrs:
-            labels = mr.get('labels', [])
-            label_names = [label.lower() for label in labels]
-            
-            # Count "To Be Reviewed" MRs
-            has_review_labels = all(label in label_names for label in ['self reviewed', 'peer reviewed', 'ready to be reviewed'])
-            has_reviewed_label = 'reviewed' in label_names
-            if has_review_labels and not has_reviewed_label:
-                to_be_reviewed_count += 1
-            
-            # Count "Reviewed" MRs
-            has_all_review_labels = all(label in label_names for label in ['self reviewed', 'peer reviewed', 'ready to be reviewed', 'reviewed'])
-            has_gtm_label = 'good to merge' in label_names
-            if has_all_review_labels and not has_gtm_label:
-                reviewed_count += 1
-            
-            # Count "Good to Merge" MRs
-            required_labels = ['self reviewed', 'peer reviewed', 'ready to be reviewed', 'reviewed', 'good to merge']
-            has_all_required_labels = all(label in label_names for label in required_labels)
-            if has_all_required_labels:
-                good_to_merge_count += 1
-        
-        return {
-            'open': open_count,
-            'to_be_reviewed': to_be_reviewed_count,
-            'reviewed': reviewed_count,
-            'good_to_merge': good_to_merge_count,
-            'merged': merged_count,
-            'total': total_count
-        }
+        return dict(stage_counts(open_mrs), open=open_count, merged=merged_count, total=total_count)
     except Exception as e:
-        print(f"Error getting MR stats: {e}")
-        return {'open': 0, 'to_be_reviewed': 0, 'reviewed': 0, 'good_to_merge': 0, 'merged': 0, 'total': 0}
+        logger.error(f"Error getting MR stats: {e}")
+        # Count the last known good data instead of showing zeros
+        open_mrs = last_known_good_mrs('opened')
+        return dict(stage_counts(open_mrs), open=len(open_mrs), merged=len(last_known_good_mrs('merged')),
+                    total=len(search_index) or len(open_mrs))
+
+@app.context_processor
+def inject_data_as_of():
+    """Time of the stale data a page shows while GitLab is unavailable, for the base template banner"""
+    as_of = g.get('data_as_of')
+    return {'data_as_of': time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(as_of)) if as_of else None}
 
 def paginate_mrs(mrs, page, per_page=10):
-    """Helper function to paginate MRs"""
+    """Helper function to paginate MRs, converting only the page's records to template dicts"""
     total_mrs = len(mrs)
     total_pages = (total_mrs + per_page - 1) // per_page
     start_idx = (page - 1) * per_page
     end_idx = start_idx + per_page
     
     return {
-        'mrs': mrs[start_idx:end_idx],
+        'mrs': [mr.to_template() for mr in mrs[start_idx:end_idx]],
         'current_page': page,
         'total_pages': total_pages,
         'total_mrs': total_mrs,
@@ -262,6 +209,12 @@ def paginate_mrs(mrs, page, per_page=10):
         'has_next': page < total_pages
     }
 
+def render_stage_page(template, stage, pagination):
+    """Render a stage page with its MR cards taken from the fragment cache"""
+    with timed('render'):
+        pagination['mr_cards'] = fragment_cache.render(app.jinja_env, f'cards/{stage}.html', pagination['mrs'])
+    return render_template(template, **pagination)
+
 @app.route('/')
 def home():
     """Home page with navigation menu"""
@@ -281,34 +234,18 @@ def open_mrs():
     
     open_mrs = fetch_gitlab_mrs(state='opened')
     
-    # Apply filters with AND logic
-    filtered_mrs = []
-    for mr in open_mrs:
-        # Check reviewer filter (use actual reviewers, not assignees)
-        if reviewer_filter and reviewer_filter != 'all':
-            reviewers = mr.get('reviewers', [])
-            if reviewer_filter not in reviewers:
-                continue
-        
-        # Check author filter
-        if author_filter and author_filter != 'all':
-            if mr.get('author') != author_filter:
-                continue
-        
-        # Check label filter
-        if label_filter and label_filter != 'all':
-            labels = mr.get('labels', [])
-            if label_filter not in labels:
-                continue
-        
-        filtered_mrs.append(mr)
+    # Apply filters with AND logic (reviewer filter uses actual reviewers, not assignees)
+    with timed('filter'):
+        filtered_mrs = [mr for mr in open_mrs if matches_filters(mr, reviewer_filter, author_filter, label_filter)]
     
     pagination = paginate_mrs(filtered_mrs, page, per_page)
     pagination['current_reviewer'] = reviewer_filter
     pagination['current_author'] = author_filter
     pagination['current_label'] = label_filter
     
-    return render_template('open_mrs.html', **pagination)
+    diff_stats_enricher.annotate(pagination['mrs'])
+    
+    return render_stage_page('open_mrs.html', 'open', pagination)
 
 @app.route('/to-be-reviewed-mrs')
 def to_be_reviewed_mrs():
@@ -322,38 +259,19 @@ def to_be_reviewed_mrs():
     label_filter = request.args.get('label', '')
     
     open_mrs = fetch_gitlab_mrs(state='opened')
-    to_be_reviewed = []
     
-    for mr in open_mrs:
-        labels = mr.get('labels', [])
-        label_names = [label.lower() for label in labels]
-        
-        # Check if MR has ALL review-related labels but not "Reviewed"
-        required_labels = ['self reviewed', 'peer reviewed', 'ready to be reviewed']
-        has_all_review_labels = all(label in label_names for label in required_labels)
-        has_reviewed_label = 'reviewed' in label_names
-        
-        if has_all_review_labels and not has_reviewed_label:
-            # Apply filters with AND logic
-            if reviewer_filter and reviewer_filter != 'all':
-                if reviewer_filter not in mr.get('reviewers', []):
-                    continue
-            
-            if author_filter and author_filter != 'all':
-                if mr.get('author') != author_filter:
-                    continue
-            
-            if label_filter and label_filter != 'all':
-                if label_filter not in labels:
-                    continue
-            
-            to_be_reviewed.append(mr)
+    # MRs with ALL review-related labels but not "Reviewed", filtered with AND logic
+    with timed('filter'):
+        to_be_reviewed = [mr for mr in open_mrs
+                          if in_stage(mr, 'to_be_reviewed') and matches_filters(mr, reviewer_filter, author_filter, label_filter)]
     
     pagination = paginate_mrs(to_be_reviewed, page, per_page)
     pagination['current_reviewer'] = reviewer_filter
     pagination['current_author'] = author_filter
     
-    return render_template('to_be_reviewed_mrs.html', **pagination)
+    diff_stats_enricher.annotate(pagination['mrs'])
+    
+    return render_stage_page('to_be_reviewed_mrs.html', 'to_be_reviewed', pagination)
 
 @app.route('/reviewed-mrs')
 def reviewed_mrs():
@@ -366,34 +284,19 @@ def reviewed_mrs():
     author_filter = request.args.get('author', '')
     
     open_mrs = fetch_gitlab_mrs(state='opened')
-    reviewed_mrs = []
     
-    for mr in open_mrs:
-        labels = mr.get('labels', [])
-        label_names = [label.lower() for label in labels]
-        
-        # Check if MR has ALL review-related labels including "Reviewed" but not "Good to Merge"
-        required_labels = ['self reviewed', 'peer reviewed', 'ready to be reviewed', 'reviewed']
-        has_all_review_labels = all(label in label_names for label in required_labels)
-        has_gtm_label = 'good to merge' in label_names
-        
-        if has_all_review_labels and not has_gtm_label:
-            # Apply filters with AND logic
-            if reviewer_filter and reviewer_filter != 'all':
-                if reviewer_filter not in mr.get('reviewers', []):
-                    continue
-            
-            if author_filter and author_filter != 'all':
-                if mr.get('author') != author_filter:
-                    continue
-            
-            reviewed_mrs.append(mr)
+    # MRs with ALL review-related labels including "Reviewed" but not "Good to Merge"
+    with timed('filter'):
+        reviewed_mrs = [mr for mr in open_mrs
+                        if in_stage(mr, 'reviewed') and matches_filters(mr, reviewer_filter, author_filter)]
     
     pagination = paginate_mrs(reviewed_mrs, page, per_page)
     pagination['current_reviewer'] = reviewer_filter
     pagination['current_author'] = author_filter
     
-    return render_template('reviewed_mrs.html', **pagination)
+    diff_stats_enricher.annotate(pagination['mrs'])
+    
+    return render_stage_page('reviewed_mrs.html', 'reviewed', pagination)
 
 @app.route('/good-to-merge-mrs')
 def good_to_merge_mrs():
@@ -406,33 +309,24 @@ def good_to_merge_mrs():
     author_filter = request.args.get('author', '')
     
     open_mrs = fetch_gitlab_mrs(state='opened')
-    gtm_mrs = []
     
-    for mr in open_mrs:
-        labels = mr.get('labels', [])
-        label_names = [label.lower() for label in labels]
-        
-        # Check if MR has ALL review-related labels including "Good To Merge"
-        required_labels = ['self reviewed', 'peer reviewed', 'ready to be reviewed', 'reviewed', 'good to merge']
-        has_all_required_labels = all(label in label_names for label in required_labels)
-        
-        if has_all_required_labels:
-            # Apply filters with AND logic
-            if reviewer_filter and reviewer_filter != 'all':
-                if reviewer_filter not in mr.get('reviewers', []):
-                    continue
-            
-            if author_filter and author_filter != 'all':
-                if mr.get('author') != author_filter:
-                    continue
-            
-            gtm_mrs.append(mr)
+    # MRs with ALL review-related labels including "Good To Merge"
+    with timed('filter'):
+        gtm_mrs = [mr for mr in open_mrs
+                   if in_stage(mr, 'good_to_merge') and matches_filters(mr, reviewer_filter, author_filter)]
     
     pagination = paginate_mrs(gtm_mrs, page, per_page)
     pagination['current_reviewer'] = reviewer_filter
     pagination['current_author'] = author_filter
     
-    return render_template('good_to_merge_mrs.html', **pagination)
+    # Attach cached head pipeline status; unknown SHAs are fetched by the background worker
+    pipeline_enricher.annotate(pagination['mrs'])
+    diff_stats_enricher.annotate(pagination['mrs'])
+    
+    # Conflict and ahead/behind checks come from the local repository when one is configured
+    git_status_enricher.annotate(pagination['mrs'])
+    
+    return render_stage_page('good_to_merge_mrs.html', 'good_to_merge', pagination)
 
 
 
@@ -447,25 +341,105 @@ def merged_mrs():
     author_filter = request.args.get('author', '')
     
     merged_mrs = fetch_gitlab_mrs(state='merged')
-    filtered_mrs = []
     
-    for mr in merged_mrs:
-        # Apply filters with AND logic
-        if reviewer_filter and reviewer_filter != 'all':
-            if reviewer_filter not in mr.get('reviewers', []):
-                continue
-        
-        if author_filter and author_filter != 'all':
-            if mr.get('author') != author_filter:
-                continue
-        
-        filtered_mrs.append(mr)
+    # Apply filters with AND logic
+    with timed('filter'):
+        filtered_mrs = [mr for mr in merged_mrs if matches_filters(mr, reviewer_filter, author_filter)]
     
     pagination = paginate_mrs(filtered_mrs, page, per_page)
     pagination['current_reviewer'] = reviewer_filter
     pagination['current_author'] = author_filter
     
-    return render_template('merged_mrs.html', **pagination)
+    diff_stats_enricher.annotate(pagination['mrs'])
+    
+    return render_stage_page('merged_mrs.html', 'merged', pagination)
+
+def api_mr_items(records, stage):
+    """JSON MR dicts for /api/mrs with the same enrichments as the stage pages"""
+    mrs = [record.to_json() for record in records]
+    diff_stats_enricher.annotate(mrs)
+    if stage == 'good_to_merge':
+        pipeline_enricher.annotate(mrs)
+        git_status_enricher.annotate(mrs)
+    return mrs
+
+@app.route('/api/mrs')
+def list_mrs_api():
+    """API endpoint listing MRs of a stage with the page filters, keyset-paginated by an opaque cursor.
+
+    With changed_since=<version> only the MRs changed since that response are returned: those that
+    match go in `mrs`, the ids of those that no longer match in `removed`.
+    """
+    stage = request.args.get('stage', 'open')
+    sort = request.args.get('sort', 'updated_desc')
+    if stage not in PAGE_STAGES + ['all']:
+        return jsonify({'success': False, 'error': f'Invalid stage: {stage}'}), 400
+    if sort not in SORTS:
+        return jsonify({'success': False, 'error': f'Invalid sort: {sort}'}), 400
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    filters = {
+        'query': request.args.get('q', '').strip(),
+        'stage': stage,
+        'reviewer': request.args.get('reviewer', ''),
+        'author': request.args.get('author', ''),
+        'label': request.args.get('label', '')
+    }
+    
+    changed_since = request.args.get('changed_since', type=int)
+    if changed_since is not None:
+        changed, removed, version = search_index.changes_since(changed_since, **filters)
+        return jsonify({
+            'success': True,
+            'mrs': api_mr_items(changed, stage),
+            'removed': removed,
+            'version': version
+        })
+    
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_sort, after = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if cursor_sort != sort:
+            return jsonify({'success': False, 'error': 'Cursor belongs to a different sort order'}), 400
+    
+    # Read the version first so a refresh from it also covers updates made while paging
+    version = search_index.version
+    records, total, next_key = search_index.page(sort=sort, after=after, limit=limit, **filters)
+    return jsonify({
+        'success': True,
+        'mrs': api_mr_items(records, stage),
+        'total': total,
+        'next_cursor': encode_cursor(sort, next_key) if next_key else None,
+        'version': version,
+        'indexed': len(search_index)
+    })
+
+@app.route('/api/mrs/search')
+def search_mrs():
+    """API endpoint for full-text MR search combined with the page filters"""
+    query = request.args.get('q', '').strip()
+    stage = request.args.get('stage', 'open')
+    if stage not in PAGE_STAGES + ['all']:
+        return jsonify({'success': False, 'error': f'Invalid stage: {stage}'}), 400
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    started = time.perf_counter()
+    results = search_index.search(
+        query,
+        stage=stage,
+        reviewer=request.args.get('reviewer', ''),
+        author=request.args.get('author', ''),
+        label=request.args.get('label', ''),
+        limit=limit,
+        offset=offset
+    )
+    results['took_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    results['success'] = True
+    return jsonify(results)
 
 
 
@@ -483,7 +457,7 @@ def get_labels():
     # Try to get from cache first
     cached_labels = get_cached_data(cache_key)
     if cached_labels is not None:
-        print(f"Returning cached labels for project {PROJECT_ID}")
+        logger.debug(f"Returning cached labels for project {PROJECT_ID}")
         return jsonify(cached_labels)
     
     if project is None:
@@ -511,11 +485,11 @@ def get_labels():
         
         # Cache the data for 24 hours
         set_cached_data(cache_key, label_data, expiry_hours=24)
-        print(f"Cached labels for project {PROJECT_ID}")
+        logger.info(f"Cached labels for project {PROJECT_ID}")
         
         return jsonify(label_data)
     except Exception as e:
-        print(f"Error fetching labels: {e}")
+        logger.error(f"Error fetching labels: {e}")
         return jsonify([])
 
 @app.route('/api/reviewers')
@@ -526,7 +500,7 @@ def get_reviewers():
     # Try to get from cache first
     cached_reviewers = get_cached_data(cache_key)
     if cached_reviewers is not None:
-        print(f"Returning cached reviewers for project {PROJECT_ID}")
+        logger.debug(f"Returning cached reviewers for project {PROJECT_ID}")
         return jsonify(cached_reviewers)
     
     if project is None:
@@ -560,11 +534,11 @@ def get_reviewers():
         
         # Cache the data for 24 hours
         set_cached_data(cache_key, reviewer_list, expiry_hours=24)
-        print(f"Cached reviewers for project {PROJECT_ID}")
+        logger.info(f"Cached reviewers for project {PROJECT_ID}")
         
         return jsonify(reviewer_list)
     except Exception as e:
-        print(f"Error fetching reviewers: {e}")
+        logger.error(f"Error fetching reviewers: {e}")
         return jsonify([])
 
 @app.route('/api/authors')
@@ -575,7 +549,7 @@ def get_authors():
     # Try to get from cache first
     cached_authors = get_cached_data(cache_key)
     if cached_authors is not None:
-        print(f"Returning cached authors for project {PROJECT_ID}")
+        logger.debug(f"Returning cached authors for project {PROJECT_ID}")
         return jsonify(cached_authors)
     
     if project is None:
@@ -599,11 +573,11 @@ def get_authors():
         
         # Cache the data for 24 hours
         set_cached_data(cache_key, author_list, expiry_hours=24)
-        print(f"Cached authors for project {PROJECT_ID}")
+        logger.info(f"Cached authors for project {PROJECT_ID}")
         
         return jsonify(author_list)
     except Exception as e:
-        print(f"Error fetching authors: {e}")
+        logger.error(f"Error fetching authors: {e}")
         return jsonify([])
 
 @app.route('/api/mrs/<int:mr_id>/approve', methods=['POST'])
@@ -622,19 +596,50 @@ def approve_mr(mr_id):
 
 @app.route('/api/mrs/<int:mr_id>/merge', methods=['POST'])
 def merge_mr(mr_id):
-    """API endpoint to merge a merge request"""
+    """API endpoint queueing a merge of a merge request; poll the returned job for the outcome"""
     if project is None:
         return jsonify({'success': False, 'message': 'GitLab connection not available'})
     
     try:
-        mr = project.mergerequests.get(mr_id)
-        if mr.state == 'opened':
-            mr.merge()
-            return jsonify({'success': True, 'message': f'MR #{mr_id} merged successfully'})
-        else:
-            return jsonify({'success': False, 'message': f'MR #{mr_id} cannot be merged (state: {mr.state})'})
+        # The synced snapshot avoids a GitLab round trip; fall back to GitLab for MRs not indexed yet
+        record = search_index.get(mr_id)
+        if record is None:
+            record = MRRecord.from_gitlab(project.mergerequests.get(mr_id))
+        if record.state != 'opened':
+            return jsonify({'success': False, 'message': f'MR #{mr_id} cannot be merged (state: {record.state})'})
+        
+        job = merge_queue.enqueue(mr_id, record.target_branch)
+        if job is None:
+            return jsonify({'success': False, 'message': 'Merge queue not available'}), 503
+        return jsonify({
+            'success': True,
+            'message': f'MR #{mr_id} queued for merge into {record.target_branch}',
+            'job': job,
+            'status_url': f"/api/merge-jobs/{job['id']}"
+        }), 202
     except Exception as e:
-        return jsonify({'success': False, 'message': f'Error merging MR: {str(e)}'})
+        return jsonify({'success': False, 'message': f'Error queueing merge: {str(e)}'})
+
+@app.route('/api/merge-jobs/<job_id>')
+def merge_job_status(job_id):
+    """API endpoint returning the status of a merge job"""
+    job = merge_queue.get_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': f'Unknown merge job: {job_id}'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/merge-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_merge_job(job_id):
+    """API endpoint cancelling a merge job that has not started merging"""
+    job = merge_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Only queued merge jobs can be cancelled'}), 409
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/merge-queue')
+def merge_queue_status():
+    """API endpoint listing the unfinished merge jobs per target branch, in merge order"""
+    return jsonify({'success': True, 'queues': merge_queue.queue()})
 
 @app.route('/api/mrs/<int:mr_id>/close', methods=['POST'])
 def close_mr(mr_id):
@@ -670,7 +675,7 @@ def mark_reviewed(mr_id):
         
         return jsonify({'success': True, 'message': f'MR #{mr_id} marked as reviewed'})
     except Exception as e:
-        print(f"Error marking MR {mr_id} as reviewed: {e}")
+        logger.error(f"Error marking MR {mr_id} as reviewed: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/mrs/<int:mr_id>/mark-gtm', methods=['POST'])
@@ -691,7 +696,7 @@ def mark_gtm(mr_id):
         
         return jsonify({'success': True, 'message': f'MR #{mr_id} marked as Good to Merge'})
     except Exception as e:
-        print(f"Error marking MR {mr_id} as GTM: {e}")
+        logger.error(f"Error marking MR {mr_id} as GTM: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/stats')
@@ -700,27 +705,74 @@ def get_stats():
     stats = get_mr_stats()
     return jsonify(stats)
 
+@app.route('/api/mrs/export')
+def export_mrs_api():
+    """API endpoint streaming the stored MRs of a stage, with the page filters, as NDJSON or CSV"""
+    export_format = request.args.get('format', 'ndjson')
+    stage = request.args.get('stage', 'all')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': f'Invalid format: {export_format}'}), 400
+    if stage not in PAGE_STAGES + ['all']:
+        return jsonify({'success': False, 'error': f'Invalid stage: {stage}'}), 400
+    if db_manager.db is None:
+        return jsonify({'success': False, 'error': 'Database not available'}), 503
+    
+    query = export_query(
+        stage,
+        reviewer=request.args.get('reviewer', ''),
+        author=request.args.get('author', ''),
+        label=request.args.get('label', '')
+    )
+    filename = f"mrs-{stage}.{export_format}"
+    return Response(
+        stream_with_context(export_mrs(export_format, query)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/api/analytics/daily')
+def daily_analytics():
+    """API endpoint to get daily MR throughput rollups"""
+    try:
+        days = min(max(int(request.args.get('days', 30)), 1), 365)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'days must be a number'}), 400
+    return jsonify({'success': True, 'days': days, 'rollups': get_daily_rollups(days)})
+
+@app.route('/api/analytics/review-latency')
+def review_latency():
+    """API endpoint to get review latency percentiles per reviewer or per author"""
+    group_by = request.args.get('group_by', 'reviewer')
+    if group_by not in ('reviewer', 'author'):
+        return jsonify({'success': False, 'error': 'group_by must be reviewer or author'}), 400
+    return jsonify({
+        'success': True,
+        'group_by': group_by,
+        'latency': latency_percentiles(group_by, since=request.args.get('since'))
+    })
+
 @app.route('/api/cache/clear', methods=['POST'])
 def clear_cache():
     """API endpoint to clear all cache"""
     try:
-        if redis_client is None:
-            return jsonify({'success': False, 'message': 'Redis not available'})
+        if active_backend() is None:
+            return jsonify({'success': False, 'message': 'Cache not available'})
         
         # Clear all cache keys
-        redis_client.flushdb()
-        print("All cache cleared")
+        clear_all_cache()
+        fragment_cache.clear()
+        logger.info("All cache cleared")
         return jsonify({'success': True, 'message': 'All cache cleared successfully'})
     except Exception as e:
-        print(f"Error clearing cache: {e}")
+        logger.error(f"Error clearing cache: {e}")
         return jsonify({'success': False, 'message': f'Error clearing cache: {str(e)}'})
 
 @app.route('/api/cache/clear/<cache_type>', methods=['POST'])
 def clear_specific_cache(cache_type):
     """API endpoint to clear specific cache types"""
     try:
-        if redis_client is None:
-            return jsonify({'success': False, 'message': 'Redis not available'})
+        if active_backend() is None:
+            return jsonify({'success': False, 'message': 'Cache not available'})
         
         if cache_type == 'labels':
             pattern = f"labels:{PROJECT_ID}"
@@ -737,41 +789,76 @@ def clear_specific_cache(cache_type):
         else:
             return jsonify({'success': False, 'message': f'Error clearing {cache_type} cache'})
     except Exception as e:
-        print(f"Error clearing {cache_type} cache: {e}")
+        logger.error(f"Error clearing {cache_type} cache: {e}")
         return jsonify({'success': False, 'message': f'Error clearing {cache_type} cache: {str(e)}'})
 
 @app.route('/api/cache/status')
 def cache_status():
     """API endpoint to get cache status"""
     try:
-        if redis_client is None:
-            return jsonify({'success': False, 'message': 'Redis not available'})
+        backend = active_backend()
+        if backend is None:
+            return jsonify({'success': False, 'message': 'Cache not available'})
         
         # Get cache keys and their TTL
         cache_info = {}
         for cache_type in ['labels', 'reviewers', 'authors']:
             key = f"{cache_type}:{PROJECT_ID}"
-            ttl = redis_client.ttl(key)
-            exists = ttl > 0
+            ttl = cache_ttl(key)
+            exists = ttl is not None
             cache_info[cache_type] = {
                 'exists': exists,
                 'ttl_seconds': ttl if exists else None,
-                'ttl_hours': round(ttl / 3600, 2) if exists and ttl > 0 else None
+                'ttl_hours': round(ttl / 3600, 2) if exists else None
             }
         
         return jsonify({
             'success': True,
-            'redis_connected': True,
-            'cache_info': cache_info
+            'redis_connected': backend == 'redis',
+            'backend': backend,
+            'cache_info': cache_info,
+            'fragments': fragment_cache.stats()
         })
     except Exception as e:
-        print(f"Error getting cache status: {e}")
+        logger.error(f"Error getting cache status: {e}")
         return jsonify({
             'success': False,
             'redis_connected': False,
             'message': f'Error getting cache status: {str(e)}'
         })
 
+@app.route('/api/admin/gitlab-budget')
+def gitlab_budget_status():
+    """API endpoint showing the shared GitLab API budget and the rate limit GitLab last reported"""
+    return jsonify({'success': True, 'budget': gitlab_budget.status()})
+
+@app.route('/api/admin/gitlab-circuit')
+def gitlab_circuit_status():
+    """API endpoint showing the state of the GitLab circuit breaker"""
+    return jsonify({'success': True, 'circuit': gitlab_breaker.status()})
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe answered from the background health checker"""
+    alive, body = health_checker.liveness()
+    return jsonify(body), 200 if alive else 503
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: ready once fresh MR data is loaded; dependency health comes from the last background check"""
+    ready, body = health_checker.readiness()
+    return jsonify(body), 200 if ready else 503
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics, summed over all worker processes when PROMETHEUS_MULTIPROC_DIR is set"""
+    return metrics_response()
+
+@app.route('/api/admin/leaders')
+def leaders_status():
+    """API endpoint showing which instance leads each background job"""
+    return jsonify({'success': True, 'leaders': leader_election.status()})
+
 @app.route('/api/database/status')
 def database_status():
     """Get database connection status"""
@@ -782,8 +869,9 @@ def database_status():
                 'collections': list(db_manager.collections.keys()) if db_manager.collections else []
             },
             'redis': {
-                'connected': redis_client is not None and redis_client.ping() if redis_client else False
-            }
+                'connected': redis_available()
+            },
+            'cache_backend': active_backend()
         }
         return jsonify(status)
     except Exception as e:
@@ -826,4 +914,12 @@ def debug_mrs():
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    # Development server only; production runs gunicorn with gunicorn.conf.py (see wsgi.py)
+    debug = os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes')
+    # The development server is one process, so it runs every background job unless told otherwise
+    if 'SINGLE_INSTANCE' not in os.environ:
+        leader_election.single_instance = True
+    # With the reloader, workers run in the reloaded child process rather than the file watcher
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
+    app.run(debug=debug, host='0.0.0.0', port=5001)
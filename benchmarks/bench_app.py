@@ -0,0 +1,181 @@
+"""
+App Benchmark for GitLab MR Manager
+Latency percentiles, throughput and GitLab calls per request of the app's pages and APIs against a local fake GitLab
+
+Runs offline; MongoDB and Redis are used when running locally (a separate database and Redis DB by default):
+    python benchmarks/bench_app.py [--mrs 2000] [--concurrency 8] [--requests 200] [--output results.json]
+
+Against production-shaped data: record a cassette from the GitLab in GITLAB_URL/GITLAB_TOKEN/PROJECT_ID once,
+then replay it instead of the synthetic fake GitLab:
+    python benchmarks/bench_app.py --record cassette.jsonl
+    python benchmarks/bench_app.py --cassette cassette.jsonl [--latency-ms 20 | --recorded-latency]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import platform
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import requests
+from fake_gitlab import FakeGitLab, PROJECT_ID
+
+ENDPOINTS = ['/', '/open-mrs', '/to-be-reviewed-mrs', '/reviewed-mrs', '/good-to-merge-mrs', '/merged-mrs',
+             '/api/stats', '/api/labels', '/api/reviewers', '/api/authors']
+
+def start_app(gitlab_env, snapshot_dir):
+    """Import the app with the given GitLab settings and serve it on a local port"""
+    os.environ.update(gitlab_env, MR_SNAPSHOT_PATH=os.path.join(snapshot_dir, 'mr_snapshot.bin'))
+    # Never touch real data, and never let the benchmark throttle itself on the GitLab budget
+    os.environ.setdefault('MONGO_DB_NAME', 'gitlab_mr_manager_bench')
+    os.environ.setdefault('REDIS_DB', '15')
+    os.environ.setdefault('GITLAB_RATE_LIMIT', '1000000')
+    os.environ.setdefault('GITLAB_MIRROR_ENABLED', 'false')
+    os.environ.setdefault('SINGLE_INSTANCE', 'true')  # one process: run the sync without electing a leader
+
+    from werkzeug.serving import make_server
+    import app as app_module
+    app_module.start_background_workers()
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return app_module, server, f"http://127.0.0.1:{server.server_port}"
+
+def wait_for_sync(app_module, timeout):
+    """Wait for the first MR sync so pages are measured in steady state"""
+    deadline = time.time() + timeout
+    while app_module.mr_sync.last_sync is None and time.time() < deadline:
+        time.sleep(0.2)
+    return app_module.mr_sync.last_sync is not None
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def run_endpoint(base_url, path, count, concurrency, gitlab_calls):
+    """Request one endpoint `count` times from `concurrency` threads"""
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            ok = session.get(base_url + path, timeout=60).status_code < 400
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - started) * 1000, ok
+
+    calls_before = gitlab_calls()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    elapsed = time.perf_counter() - started
+    calls = gitlab_calls() - calls_before
+
+    latencies = sorted(ms for ms, _ in results)
+    return {
+        'requests': count,
+        'errors': sum(1 for _, ok in results if not ok),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'throughput_rps': round(count / elapsed, 1),
+        'gitlab_calls_per_request': round(calls / count, 3)
+    }
+
+def compare(results, baseline):
+    """Relative change of p95 and throughput against a previous results file"""
+    changes = {}
+    for path, current in results['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(path)
+        if not before:
+            continue
+        changes[path] = {
+            'p95_change_pct': round((current['p95_ms'] / before['p95_ms'] - 1) * 100, 1) if before['p95_ms'] else None,
+            'throughput_change_pct': round((current['throughput_rps'] / before['throughput_rps'] - 1) * 100, 1)
+                                     if before['throughput_rps'] else None
+        }
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--mrs', type=int, default=2000, help='synthetic MRs served by the fake GitLab')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients per endpoint')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--latency-ms', type=float, default=20, help='fake or replayed GitLab response latency')
+    parser.add_argument('--cassette', help='replay this recorded cassette instead of the synthetic fake GitLab')
+    parser.add_argument('--recorded-latency', action='store_true', help='replay with the latency of each recorded call')
+    parser.add_argument('--record', help='record the GitLab in GITLAB_URL to this cassette, then exit')
+    parser.add_argument('--endpoints', nargs='+', default=ENDPOINTS, help='paths to benchmark')
+    parser.add_argument('--sync-timeout', type=int, default=120, help='seconds to wait for the first MR sync')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', help='previous results file to compare against')
+    args = parser.parse_args()
+
+    fake = None
+    if args.record:
+        gitlab_env = {'GITLAB_CASSETTE_MODE': 'record', 'GITLAB_CASSETTE': os.path.abspath(args.record)}
+    elif args.cassette:
+        gitlab_env = {'GITLAB_CASSETTE_MODE': 'replay', 'GITLAB_CASSETTE': os.path.abspath(args.cassette),
+                      'GITLAB_REPLAY_LATENCY': 'recorded' if args.recorded_latency else str(args.latency_ms)}
+    else:
+        fake = FakeGitLab(args.mrs, args.latency_ms).start()
+        gitlab_env = {'GITLAB_URL': fake.url, 'GITLAB_TOKEN': 'bench-token', 'PROJECT_ID': str(PROJECT_ID)}
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        app_module, server, base_url = start_app(gitlab_env, snapshot_dir)
+        gitlab_calls = (lambda: fake.calls) if fake else (lambda: app_module.gitlab_cassette.calls)
+        synced = wait_for_sync(app_module, args.sync_timeout)
+        # One untimed pass fills the caches every later request would find warm
+        for path in args.endpoints:
+            requests.get(base_url + path, timeout=60)
+        if args.record:
+            server.shutdown()
+            print(f"Recorded {gitlab_calls()} GitLab calls to {args.record}", file=sys.stderr)
+            return
+
+        results = {
+            'config': {'gitlab': args.cassette or 'synthetic', 'mrs': None if args.cassette else args.mrs,
+                       'concurrency': args.concurrency, 'requests': args.requests,
+                       'gitlab_latency_ms': 'recorded' if args.cassette and args.recorded_latency else args.latency_ms,
+                       'synced': synced},
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpus': os.cpu_count(), 'redis': app_module.redis_available(),
+                            'mongodb': app_module.db_manager.db is not None},
+            'endpoints': {}
+        }
+        for path in args.endpoints:
+            results['endpoints'][path] = run_endpoint(base_url, path, args.requests, args.concurrency, gitlab_calls)
+            stats = results['endpoints'][path]
+            print(f"{path:22} p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+                  f"p99 {stats['p99_ms']:8.1f} ms  {stats['throughput_rps']:7.1f} req/s  "
+                  f"{stats['gitlab_calls_per_request']:6.2f} GitLab calls/req  {stats['errors']} errors",
+                  file=sys.stderr)
+        if args.baseline:
+            with open(args.baseline) as f:
+                results['baseline'] = {'file': args.baseline, 'changes': compare(results, json.load(f))}
+        server.shutdown()
+    # The fake GitLab stays up until exit so the app's background workers never see it vanish
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+MR Listing Benchmark for GitLab MR Manager
+CPU cost per 1,000 MRs of the python-gitlab listing path versus the raw JSON path in listing.py
+
+Runs offline on synthetic list pages shaped like GitLab's merge request API:
+    python benchmarks/bench_listing.py [--mrs 5000] [--repeat 5]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import gitlab
+from listing import _loads, LIST_PAGE_SIZE
+from records import MRRecord
+
+def _user(n):
+    return {'id': n, 'username': f"user{n}", 'name': f"User {n}", 'state': 'active', 'locked': False,
+            'avatar_url': f"https://gitlab.example.com/uploads/user/avatar/{n}/avatar.png",
+            'web_url': f"https://gitlab.example.com/user{n}"}
+
+def sample_mr(iid):
+    """An MR list item with the fields GitLab returns (descriptions and nested objects included)"""
+    labels = ['Self Reviewed', 'Peer Reviewed', 'Ready to be Reviewed', 'Reviewed'][:iid % 5] + ['backend']
+    return {
+        'id': 100000 + iid, 'iid': iid, 'project_id': 16895, 'title': f"Improve widget rendering path #{iid}",
+        'description': 'Refactors the widget renderer and adds caching.\n\n' * 8, 'state': 'opened',
+        'created_at': '2024-03-01T10:15:30.123Z', 'updated_at': '2024-03-04T08:01:02.456Z',
+        'merged_by': None, 'merge_user': None, 'merged_at': None, 'closed_by': None, 'closed_at': None,
+        'target_branch': 'main', 'source_branch': f"feature/widget-{iid}", 'user_notes_count': iid % 17,
+        'upvotes': 0, 'downvotes': 0, 'author': _user(iid % 40), 'assignees': [_user(iid % 40)],
+        'assignee': _user(iid % 40), 'reviewers': [_user((iid + 1) % 40), _user((iid + 2) % 40)],
+        'source_project_id': 16895, 'target_project_id': 16895, 'labels': labels, 'draft': False,
+        'work_in_progress': False, 'milestone': None, 'merge_when_pipeline_succeeds': False,
+        'merge_status': 'can_be_merged', 'detailed_merge_status': 'mergeable', 'sha': f"{iid:040x}",
+        'merge_commit_sha': None, 'squash_commit_sha': None, 'discussion_locked': None,
+        'should_remove_source_branch': None, 'force_remove_source_branch': True, 'prepared_at': None,
+        'reference': f"!{iid}", 'references': {'short': f"!{iid}", 'relative': f"!{iid}", 'full': f"group/project!{iid}"},
+        'web_url': f"https://gitlab.example.com/group/project/-/merge_requests/{iid}",
+        'time_stats': {'time_estimate': 0, 'total_time_spent': 0, 'human_time_estimate': None,
+                       'human_total_time_spent': None},
+        'squash': False, 'squash_on_merge': False, 'task_completion_status': {'count': 0, 'completed_count': 0},
+        'has_conflicts': False, 'blocking_discussions_resolved': True, 'approvals_before_merge': None
+    }
+
+def python_gitlab_path(pages, manager):
+    """What fetch_gitlab_mrs() used to do: stdlib JSON, one RESTObject per MR, then a dict per MR"""
+    mrs = []
+    for page in pages:
+        for item in json.loads(page):
+            mr = manager._obj_cls(manager, item, created_from_list=True)
+            mrs.append({
+                'id': mr.iid, 'title': mr.title,
+                'author': mr.author.get('username', mr.author.get('name', 'Unknown')),
+                'created_at': mr.created_at.split('T')[0], 'updated_at': mr.updated_at.split('T')[0],
+                'labels': mr.labels or [], 'assignees': [a.get('username') for a in mr.assignees],
+                'reviewers': [r.get('username') for r in mr.reviewers], 'state': mr.state, 'web_url': mr.web_url,
+                'source_branch': mr.source_branch, 'target_branch': mr.target_branch, 'sha': mr.sha
+            })
+    return mrs
+
+def raw_json_path(pages):
+    """listing.list_mr_records(): fast JSON parsing straight into MRRecords"""
+    return [MRRecord.from_json(item) for page in pages for item in _loads(page)]
+
+def cpu_ms(func, repeat):
+    """Best CPU time of several runs, in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        started = time.process_time()
+        func()
+        elapsed = (time.process_time() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--mrs', type=int, default=5000, help='number of MRs to list')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per path (best is reported)')
+    args = parser.parse_args()
+
+    items = [sample_mr(iid) for iid in range(1, args.mrs + 1)]
+    pages = [json.dumps(items[start:start + LIST_PAGE_SIZE]).encode()
+             for start in range(0, len(items), LIST_PAGE_SIZE)]
+    manager = gitlab.Gitlab('https://gitlab.example.com', private_token='x').projects.get(16895, lazy=True).mergerequests
+
+    per_thousand = 1000 / args.mrs
+    baseline = cpu_ms(lambda: python_gitlab_path(pages, manager), args.repeat) * per_thousand
+    fast = cpu_ms(lambda: raw_json_path(pages), args.repeat) * per_thousand
+
+    print(f"JSON parser: {_loads.__module__}")
+    print(f"python-gitlab objects: {baseline:8.1f} ms CPU per 1,000 MRs")
+    print(f"raw JSON records:      {fast:8.1f} ms CPU per 1,000 MRs")
+    print(f"saving:                {baseline - fast:8.1f} ms ({(1 - fast / baseline) * 100:.0f}%)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Worker Scaling Benchmark for GitLab MR Manager
+Throughput and latency of the app under gunicorn (gunicorn.conf.py) at increasing worker counts, against a local fake GitLab
+
+Needs gunicorn; MongoDB and Redis are used when running locally, as in bench_app.py:
+    python benchmarks/bench_workers.py [--workers 1 2 4] [--concurrency 16] [--requests 300] [--output scaling.json]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import requests
+from fake_gitlab import FakeGitLab, PROJECT_ID
+from bench_app import run_endpoint
+
+ENDPOINTS = ['/', '/open-mrs', '/to-be-reviewed-mrs', '/api/stats', '/api/labels']
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(workers, worker_class, env):
+    """Start gunicorn with the production config and wait until it reports ready"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+         '--worker-class', worker_class, '--bind', f"127.0.0.1:{port}"],
+        cwd=ROOT, env=dict(os.environ, **env, GUNICORN_WORKER_CLASS=worker_class),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+def wait_until_ready(base_url, workers, timeout):
+    """Wait until readiness probes, spread over the workers, keep answering 200"""
+    deadline = time.time() + timeout
+    ready_in_a_row = 0
+    while time.time() < deadline and ready_in_a_row < 4 * workers:
+        try:
+            ready = requests.get(base_url + '/readyz', timeout=5).status_code == 200
+        except requests.RequestException:
+            ready = False
+        ready_in_a_row = ready_in_a_row + 1 if ready else 0
+        time.sleep(0.1 if ready else 0.5)
+    return ready_in_a_row >= 4 * workers
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='worker counts to compare')
+    parser.add_argument('--worker-class', default='gthread', help="gunicorn worker class, e.g. 'gthread' or 'gevent'")
+    parser.add_argument('--mrs', type=int, default=2000, help='synthetic MRs served by the fake GitLab')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients per endpoint')
+    parser.add_argument('--requests', type=int, default=300, help='requests per endpoint')
+    parser.add_argument('--latency-ms', type=float, default=20, help='fake GitLab response latency')
+    parser.add_argument('--endpoints', nargs='+', default=ENDPOINTS, help='paths to benchmark')
+    parser.add_argument('--ready-timeout', type=int, default=180, help='seconds to wait for the workers to be ready')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    fake = FakeGitLab(args.mrs, args.latency_ms).start()
+    results = {
+        'config': {'mrs': args.mrs, 'worker_class': args.worker_class, 'concurrency': args.concurrency,
+                   'requests': args.requests, 'gitlab_latency_ms': args.latency_ms},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'workers': {}
+    }
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = {'GITLAB_URL': fake.url, 'GITLAB_TOKEN': 'bench-token', 'PROJECT_ID': str(PROJECT_ID),
+               'MR_SNAPSHOT_PATH': os.path.join(data_dir, 'mr_snapshot.bin'),
+               'MONGO_DB_NAME': os.getenv('MONGO_DB_NAME', 'gitlab_mr_manager_bench'),
+               'REDIS_DB': os.getenv('REDIS_DB', '15'), 'GITLAB_RATE_LIMIT': os.getenv('GITLAB_RATE_LIMIT', '1000000'),
+               'REQUEST_TIMING_SAMPLE_RATE': '0',
+               # Every worker syncs on its own and becomes ready without Redis or MongoDB;
+               # SINGLE_INSTANCE=false benchmarks with one elected sync leader instead
+               'SINGLE_INSTANCE': os.getenv('SINGLE_INSTANCE', 'true')}
+        for workers in args.workers:
+            process, base_url = start_gunicorn(workers, args.worker_class, env)
+            try:
+                ready = wait_until_ready(base_url, workers, args.ready_timeout)
+                # One untimed pass per worker warms the caches
+                for _ in range(workers):
+                    for path in args.endpoints:
+                        requests.get(base_url + path, timeout=60)
+                endpoints = {path: run_endpoint(base_url, path, args.requests, args.concurrency, lambda: fake.calls)
+                             for path in args.endpoints}
+            finally:
+                process.terminate()
+                process.wait(timeout=60)
+            total_rps = sum(stats['throughput_rps'] for stats in endpoints.values())
+            results['workers'][str(workers)] = {'ready': ready, 'throughput_rps': round(total_rps, 1), 'endpoints': endpoints}
+            print(f"{workers:3} workers: {total_rps:8.1f} req/s summed over endpoints", file=sys.stderr)
+
+    baseline = results['workers'][str(args.workers[0])]['throughput_rps']
+    results['scaling'] = {count: round(run['throughput_rps'] / baseline, 2) if baseline else None
+                          for count, run in results['workers'].items()}
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
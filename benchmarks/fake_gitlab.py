@@ -0,0 +1,220 @@
+"""
+Fake GitLab Server for GitLab MR Manager benchmarks
+Local HTTP server answering the GitLab API calls the app makes, from N synthetic MRs with realistic labels and pagination
+
+Run standalone to point a development server at it:
+    python benchmarks/fake_gitlab.py [--mrs 2000] [--port 8929] [--latency-ms 0]
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+PROJECT_ID = 16895
+REVIEW_LABELS = ['Self Reviewed', 'Peer Reviewed', 'Ready to be Reviewed', 'Reviewed', 'Good To Merge']
+TEAM_LABELS = ['backend', 'frontend', 'api', 'bug', 'feature', 'refactor', 'performance', 'security', 'docs', 'tests']
+LABEL_COLORS = ['#428BCA', '#44AD8E', '#A8D695', '#5CB85C', '#69D100', '#004E00', '#F0AD4E', '#D9534F', '#AD4363', '#7F8C8D']
+
+def _user(n):
+    return {'id': n, 'username': f"user{n}", 'name': f"User {n}", 'state': 'active', 'locked': False,
+            'avatar_url': f"https://gitlab.example.com/uploads/user/avatar/{n}/avatar.png",
+            'web_url': f"https://gitlab.example.com/user{n}"}
+
+def _iso(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f"{moment.microsecond // 1000:03d}Z"
+
+def generate_mrs(count, open_share=0.3, users=40, seed=1):
+    """Synthetic MRs: a share still open and spread over the review stages, the rest mostly merged"""
+    rng = random.Random(seed)
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    mrs = []
+    for iid in range(1, count + 1):
+        created = now - timedelta(hours=(count - iid) * 3 + rng.randint(0, 2))
+        updated = created + timedelta(hours=rng.randint(1, 96))
+        is_open = rng.random() < open_share
+        state = 'opened' if is_open else ('merged' if rng.random() < 0.9 else 'closed')
+        # Open MRs progress through the review labels; merged ones carry the full set
+        progress = rng.randint(0, len(REVIEW_LABELS)) if is_open else len(REVIEW_LABELS)
+        labels = REVIEW_LABELS[:progress] + rng.sample(TEAM_LABELS, rng.randint(0, 3))
+        author = rng.randrange(users)
+        reviewers = [_user(n) for n in rng.sample([n for n in range(users) if n != author], rng.randint(0, 3))]
+        merged = state == 'merged'
+        mrs.append({
+            'id': 100000 + iid, 'iid': iid, 'project_id': PROJECT_ID,
+            'title': f"{rng.choice(['Fix', 'Add', 'Improve', 'Refactor', 'Remove'])} {rng.choice(TEAM_LABELS)} "
+                     f"handling in module {iid % 97}",
+            'description': ' '.join(rng.choice(['cache', 'widget', 'render', 'query', 'index', 'latency', 'page'])
+                                    for _ in range(rng.randint(10, 120))),
+            'state': state, 'created_at': _iso(created), 'updated_at': _iso(updated),
+            'merged_by': _user(rng.randrange(users)) if merged else None,
+            'merged_at': _iso(updated) if merged else None,
+            'closed_by': _user(author) if state == 'closed' else None,
+            'closed_at': _iso(updated) if state == 'closed' else None,
+            'target_branch': 'main' if rng.random() < 0.9 else 'release',
+            'source_branch': f"feature/{iid}-{rng.choice(TEAM_LABELS)}",
+            'user_notes_count': rng.randint(0, 30), 'upvotes': 0, 'downvotes': 0,
+            'author': _user(author), 'assignees': [_user(author)], 'assignee': _user(author), 'reviewers': reviewers,
+            'source_project_id': PROJECT_ID, 'target_project_id': PROJECT_ID, 'labels': labels, 'draft': False,
+            'work_in_progress': False, 'milestone': None, 'merge_when_pipeline_succeeds': False,
+            'merge_status': 'can_be_merged', 'detailed_merge_status': 'mergeable', 'sha': f"{iid:040x}",
+            'merge_commit_sha': None, 'squash_commit_sha': None, 'discussion_locked': None,
+            'should_remove_source_branch': None, 'force_remove_source_branch': True,
+            'reference': f"!{iid}", 'references': {'short': f"!{iid}", 'relative': f"!{iid}",
+                                                   'full': f"group/project!{iid}"},
+            'web_url': f"https://gitlab.example.com/group/project/-/merge_requests/{iid}",
+            'time_stats': {'time_estimate': 0, 'total_time_spent': 0, 'human_time_estimate': None,
+                           'human_total_time_spent': None},
+            'squash': False, 'task_completion_status': {'count': 0, 'completed_count': 0},
+            'has_conflicts': False, 'blocking_discussions_resolved': True
+        })
+    return mrs
+
+class FakeGitLab:
+    """Fake GitLab API on a local port, counting the calls it answers"""
+
+    def __init__(self, mrs=2000, latency_ms=0, port=0, seed=1):
+        self.mrs = generate_mrs(mrs, seed=seed)
+        self.by_iid = {mr['iid']: mr for mr in self.mrs}
+        # GitLab lists newest first by default
+        self.newest_first = sorted(self.mrs, key=lambda mr: mr['created_at'], reverse=True)
+        self.labels = [{'id': n, 'name': name, 'color': LABEL_COLORS[n % len(LABEL_COLORS)], 'description': None}
+                       for n, name in enumerate(REVIEW_LABELS + TEAM_LABELS)]
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+        self.calls_by_route = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-gitlab', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, route):
+        with self._lock:
+            self.calls += 1
+            self.calls_by_route[route] = self.calls_by_route.get(route, 0) + 1
+
+    def list_mrs(self, query):
+        state = query.get('state', 'all')
+        mrs = self.newest_first if state == 'all' else [mr for mr in self.newest_first if mr['state'] == state]
+        if 'updated_after' in query:
+            mrs = [mr for mr in mrs if mr['updated_at'] > query['updated_after']]
+        if query.get('order_by') == 'updated_at':
+            mrs = sorted(mrs, key=lambda mr: mr['updated_at'], reverse=query.get('sort', 'desc') == 'desc')
+        return mrs
+
+    def route(self, path, query):
+        """(route name, JSON body) for an API path, or (None, None) when it is not faked"""
+        project = rf"/api/v4/projects/(?:{PROJECT_ID}|[^/]+)"
+        if path == '/api/v4/user':
+            return 'user', dict(_user(0), is_admin=False)
+        if path == '/api/v4/version':
+            return 'version', {'version': '16.11.0-ee', 'revision': 'fake'}
+        if re.fullmatch(project, path):
+            return 'project', {'id': PROJECT_ID, 'name': 'project', 'path_with_namespace': 'group/project',
+                               'http_url_to_repo': 'https://gitlab.example.com/group/project.git'}
+        if re.fullmatch(project + '/merge_requests', path):
+            return 'merge_requests', self.list_mrs(query)
+        if re.fullmatch(project + '/labels', path):
+            return 'labels', self.labels
+        if re.fullmatch(project + '/pipelines', path):
+            return 'pipelines', [{'id': 1, 'status': 'success', 'sha': query.get('sha'),
+                                  'web_url': 'https://gitlab.example.com/group/project/-/pipelines/1'}]
+        match = re.fullmatch(project + r'/merge_requests/(\d+)(/[a-z_]+)?', path)
+        if match and int(match.group(1)) in self.by_iid:
+            mr = self.by_iid[int(match.group(1))]
+            if match.group(2) is None:
+                return 'merge_request', dict(mr, head_pipeline={'id': 1, 'status': 'success'})
+            if match.group(2) == '/changes':
+                return 'changes', dict(mr, changes_count='3', changes=[
+                    {'old_path': f"src/file{n}.py", 'new_path': f"src/file{n}.py",
+                     'diff': '@@ -1,3 +1,4 @@\n-old line\n+new line\n+another line\n'} for n in range(3)])
+            if match.group(2) == '/resource_label_events':
+                return 'resource_label_events', []
+        return None, None
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=()):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+                route, body = fake.route(parts.path, query)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                fake.count(route or 'unknown')
+                if route is None:
+                    self._send(404, {'message': '404 Not found'})
+                    return
+                headers = [('RateLimit-Limit', '2000'), ('RateLimit-Remaining', '1999')]
+                if isinstance(body, list):
+                    # Offset pagination with the headers and Link GitLab sends
+                    per_page = min(int(query.get('per_page', 20)), 100)
+                    page = max(int(query.get('page', 1)), 1)
+                    total_pages = max((len(body) + per_page - 1) // per_page, 1)
+                    headers += [('X-Total', str(len(body))), ('X-Total-Pages', str(total_pages)),
+                                ('X-Per-Page', str(per_page)), ('X-Page', str(page))]
+                    if page < total_pages:
+                        next_query = urlencode(dict(query, page=page + 1, per_page=per_page))
+                        headers += [('X-Next-Page', str(page + 1)),
+                                    ('Link', f'<{fake.url}{parts.path}?{next_query}>; rel="next"')]
+                    body = body[(page - 1) * per_page:page * per_page]
+                self._send(200, body, headers)
+
+            def do_PUT(self):
+                self.do_GET()
+
+            do_POST = do_PUT
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--mrs', type=int, default=2000, help='number of synthetic MRs')
+    parser.add_argument('--port', type=int, default=8929)
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay added to every response')
+    args = parser.parse_args()
+
+    fake = FakeGitLab(args.mrs, args.latency_ms, args.port).start()
+    print(f"Fake GitLab with {args.mrs} MRs at {fake.url} (GITLAB_URL={fake.url} PROJECT_ID={PROJECT_ID})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Circuit Breaker Module for GitLab MR Manager
+Stops calling GitLab after repeated failures or slow responses and probes it in the background until it recovers
+"""
+
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+GITLAB_BREAKER_FAILURES = int(os.getenv('GITLAB_BREAKER_FAILURES', 3))         # consecutive failures that open the circuit
+GITLAB_BREAKER_SLOW_CALLS = int(os.getenv('GITLAB_BREAKER_SLOW_CALLS', 3))     # consecutive slow calls that open it
+GITLAB_SLOW_SECONDS = float(os.getenv('GITLAB_SLOW_SECONDS', 5))
+GITLAB_PROBE_INTERVAL = int(os.getenv('GITLAB_PROBE_INTERVAL', 15))            # seconds between probes while open
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """GitLab is not called while the circuit is open"""
+
+class CircuitBreaker:
+    """Closed while GitLab answers; opens after consecutive errors (connection errors, timeouts, 5xx)
+    or consecutive calls slower than GITLAB_SLOW_SECONDS.
+
+    While open every call fails immediately with CircuitOpenError, so pages fall back to stored data
+    instead of waiting on GitLab. A background thread probes GitLab every GITLAB_PROBE_INTERVAL seconds
+    and closes the circuit after the first fast, successful probe.
+    """
+
+    def __init__(self, failure_threshold=GITLAB_BREAKER_FAILURES, slow_threshold=GITLAB_BREAKER_SLOW_CALLS,
+                 slow_seconds=GITLAB_SLOW_SECONDS, probe_interval=GITLAB_PROBE_INTERVAL):
+        self.failure_threshold = failure_threshold
+        self.slow_threshold = slow_threshold
+        self.slow_seconds = slow_seconds
+        self.probe_interval = probe_interval
+        self.failures = 0
+        self.slow_calls = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probe = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def start(self, probe):
+        """Start the probe thread; `probe` makes one cheap GitLab call and raises if it fails"""
+        if self._thread is not None:
+            return
+        self._probe = probe
+        self._thread = threading.Thread(target=self._run, name='gitlab-probe', daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def probing(self):
+        """Let this thread's calls through while the circuit is open"""
+        self._local.probing = True
+        try:
+            yield
+        finally:
+            self._local.probing = False
+
+    def before_call(self):
+        """Raise CircuitOpenError instead of calling GitLab while the circuit is open"""
+        if self.opened_at is not None and not getattr(self._local, 'probing', False):
+            raise CircuitOpenError(f"GitLab circuit open since {time.strftime('%H:%M:%S', time.localtime(self.opened_at))}: "
+                                   f"{self.last_error}")
+
+    def record_success(self, elapsed):
+        """Count a call that returned; slow calls count towards opening the circuit"""
+        with self._lock:
+            self.failures = 0
+            if elapsed <= self.slow_seconds:
+                self.slow_calls = 0
+                return
+            self.slow_calls += 1
+            if self.slow_calls >= self.slow_threshold:
+                self._open(f"{self.slow_calls} calls slower than {self.slow_seconds}s")
+
+    def record_failure(self, error):
+        """Count a failed call"""
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._open(str(error))
+
+    def _open(self, reason):
+        self.last_error = reason
+        if self.opened_at is None:
+            self.opened_at = time.time()
+            logger.warning(f"GitLab circuit opened: {reason}")
+            self._wakeup.set()
+
+    def _close(self):
+        with self._lock:
+            self.failures = self.slow_calls = 0
+            self.opened_at = None
+        logger.info("GitLab circuit closed, GitLab is reachable again")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.probe_interval if self.is_open else None)
+            self._wakeup.clear()
+            if not self.is_open:
+                continue
+            started = time.time()
+            try:
+                with self.probing():
+                    self._probe()
+                if time.time() - started <= self.slow_seconds:
+                    self._close()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.info(f"GitLab probe failed: {e}")
+
+    def status(self):
+        """Circuit state for status endpoints"""
+        return {
+            'state': 'open' if self.is_open else 'closed',
+            'opened_at': self.opened_at,
+            'consecutive_failures': self.failures,
+            'consecutive_slow_calls': self.slow_calls,
+            'last_error': self.last_error
+        }
+
+# Global GitLab circuit breaker instance
+gitlab_breaker = CircuitBreaker()
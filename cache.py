@@ -0,0 +1,213 @@
+"""
+Cache Module for GitLab MR Manager
+Pickle-based cache helpers backed by Redis, failing over to the MongoDB cache collection while Redis is down
+"""
+
+import os
+import time
+import pickle
+import threading
+import logging
+from datetime import datetime, timedelta
+import redis
+from database import get_cache_entries, set_cache_entry, delete_cache_entries, db_manager
+from timing import timed
+from metrics import count_cache_lookups
+
+logger = logging.getLogger(__name__)
+
+# Redis Configuration
+REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+REDIS_DB = int(os.getenv('REDIS_DB', 0))
+REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
+REDIS_RETRY_INTERVAL = int(os.getenv('REDIS_RETRY_INTERVAL', 30))  # seconds before retrying a failed Redis
+
+# Initialize Redis client (connections are made lazily, so this never fails while Redis is down)
+redis_client = redis.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    password=REDIS_PASSWORD,
+    decode_responses=False,  # Keep as bytes for pickle compatibility
+    socket_connect_timeout=2,
+    socket_timeout=2
+)
+
+# Key namespaces written through this module. The merge queue, GitLab budget, leader leases and
+# enrichment requests share the Redis database and are not cache entries.
+CACHE_KEY_PATTERNS = ('labels:*', 'reviewers:*', 'authors:*', 'fragment:*', 'pipeline:*', 'diffstats:*', 'gitstatus:*')
+
+_redis_down_until = None   # while set, Redis is skipped until this time
+_health_lock = threading.Lock()
+
+def _mark_redis_down(error):
+    global _redis_down_until
+    with _health_lock:
+        if _redis_down_until is None:
+            logger.warning(f"Redis unavailable, using MongoDB cache: {error}")
+        _redis_down_until = time.time() + REDIS_RETRY_INTERVAL
+
+def redis_available():
+    """Whether Redis should be used, re-checking a failed Redis at most every REDIS_RETRY_INTERVAL seconds"""
+    global _redis_down_until
+    if _redis_down_until is None:
+        return True
+    if time.time() < _redis_down_until:
+        return False
+    try:
+        redis_client.ping()
+    except Exception as e:
+        _mark_redis_down(e)
+        return False
+    with _health_lock:
+        _redis_down_until = None
+    logger.info("Redis connection restored, leaving MongoDB cache")
+    return True
+
+def active_backend():
+    """Name of the cache backend currently in use"""
+    if redis_available():
+        return 'redis'
+    return 'mongodb' if db_manager.db is not None else None
+
+def _check_redis():
+    """Test the connection once at startup"""
+    try:
+        redis_client.ping()
+        logger.info("Redis connection established successfully")
+    except Exception as e:
+        logger.error(f"Error connecting to Redis: {e}")
+        _mark_redis_down(e)
+
+def start_redis_check():
+    """Test the Redis connection in the background so startup never waits on Redis"""
+    threading.Thread(target=_check_redis, name='redis-check', daemon=True).start()
+
+def get_cached_data(key):
+    """Get data from the cache"""
+    return get_cached_many([key]).get(key)
+
+def get_cached_many(keys):
+    """Get several keys from the cache in one round trip, returning a dict of hits"""
+    if not keys:
+        return {}
+
+    try:
+        with timed('cache'):
+            hits = None
+            if redis_available():
+                try:
+                    values = redis_client.mget(keys)
+                    hits = {key: pickle.loads(value) for key, value in zip(keys, values) if value}
+                except redis.RedisError as e:
+                    _mark_redis_down(e)
+            if hits is None:
+                hits = {key: pickle.loads(value) for key, value in get_cache_entries(keys).items()}
+        count_cache_lookups('data', len(hits), len(keys) - len(hits))
+        return hits
+    except Exception as e:
+        logger.error(f"Error getting cached data for {len(keys)} keys: {e}")
+        return {}
+
+def set_cached_data(key, data, expiry_hours=24, expiry_seconds=None):
+    """Set data in the cache with expiry"""
+    try:
+        with timed('cache'):
+            pickled_data = pickle.dumps(data)
+            if expiry_seconds is None:
+                expiry_seconds = expiry_hours * 3600  # Convert hours to seconds
+            if redis_available():
+                try:
+                    redis_client.setex(key, int(expiry_seconds), pickled_data)
+                    return True
+                except redis.RedisError as e:
+                    _mark_redis_down(e)
+            return set_cache_entry(key, pickled_data, datetime.utcnow() + timedelta(seconds=expiry_seconds))
+    except Exception as e:
+        logger.error(f"Error setting cached data for key {key}: {e}")
+        return False
+
+def set_cached_many(items, expiry_hours=24, expiry_seconds=None):
+    """Set several keys in the cache in one round trip"""
+    try:
+        with timed('cache'):
+            if expiry_seconds is None:
+                expiry_seconds = expiry_hours * 3600
+            pickled = {key: pickle.dumps(data) for key, data in items.items()}
+            if redis_available():
+                try:
+                    pipeline = redis_client.pipeline(transaction=False)
+                    for key, value in pickled.items():
+                        pipeline.setex(key, int(expiry_seconds), value)
+                    pipeline.execute()
+                    return True
+                except redis.RedisError as e:
+                    _mark_redis_down(e)
+            expires_at = datetime.utcnow() + timedelta(seconds=expiry_seconds)
+            return all([set_cache_entry(key, value, expires_at) for key, value in pickled.items()])
+    except Exception as e:
+        logger.error(f"Error setting cached data for {len(items)} keys: {e}")
+        return False
+
+def invalidate_cache(pattern):
+    """Invalidate cache entries matching a pattern in both backends"""
+    deleted = delete_cache_entries(pattern)
+    if not redis_available():
+        if deleted:
+            logger.info(f"Invalidated {deleted} cache entries matching pattern: {pattern}")
+        return db_manager.db is not None
+
+    try:
+        unlinked = _unlink_matching(pattern)
+        if unlinked or deleted:
+            logger.info(f"Invalidated {unlinked + deleted} cache entries matching pattern: {pattern}")
+        return True
+    except Exception as e:
+        logger.error(f"Error invalidating cache for pattern {pattern}: {e}")
+        return False
+
+def _unlink_matching(pattern, batch_size=500):
+    """Unlink the Redis keys matching a pattern batch by batch, returning how many were removed"""
+    unlinked = 0
+    batch = []
+    for key in redis_client.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            unlinked += redis_client.unlink(*batch)
+            batch = []
+    if batch:
+        unlinked += redis_client.unlink(*batch)
+    return unlinked
+
+def clear_all_cache():
+    """Remove every cache entry from both backends, leaving the other data kept in Redis"""
+    delete_cache_entries('*')
+    if not redis_available():
+        return db_manager.db is not None
+    try:
+        unlinked = sum(_unlink_matching(pattern) for pattern in CACHE_KEY_PATTERNS)
+        logger.info(f"Cleared {unlinked} Redis cache entries")
+        return True
+    except redis.RedisError as e:
+        logger.error(f"Error clearing the Redis cache: {e}")
+        return False
+
+def cache_ttl(key):
+    """Remaining TTL of a key in seconds, or None if it is not cached"""
+    if redis_available():
+        try:
+            ttl = redis_client.ttl(key)
+            return ttl if ttl > 0 else None
+        except redis.RedisError as e:
+            _mark_redis_down(e)
+    try:
+        collection = db_manager.get_collection('cache')
+        doc = collection.find_one({'key': key}, {'expires_at': 1}) if collection is not None else None
+        if doc is None:
+            return None
+        ttl = int((doc['expires_at'] - datetime.utcnow()).total_seconds())
+        return ttl if ttl > 0 else None
+    except Exception as e:
+        logger.error(f"Error getting TTL for key {key}: {e}")
+        return None
@@ -0,0 +1,181 @@
+"""
+Cassette Module for GitLab MR Manager
+Records GitLab API responses to a cassette file with tokens scrubbed, and replays them offline with injected latency
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.adapters import HTTPAdapter, BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+GITLAB_CASSETTE_MODE = os.getenv('GITLAB_CASSETTE_MODE', '').lower()   # 'record', 'replay', or empty to call GitLab
+GITLAB_CASSETTE = os.getenv('GITLAB_CASSETTE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gitlab_cassette.jsonl'))
+GITLAB_REPLAY_LATENCY = os.getenv('GITLAB_REPLAY_LATENCY', '0')        # ms added to each replayed response, or 'recorded'
+
+# Credentials never written to a cassette
+TOKEN_PARAMS = {'private_token', 'access_token', 'job_token'}
+TOKEN_HEADERS = ('PRIVATE-TOKEN', 'JOB-TOKEN', 'Authorization')
+# Time-dependent query parameters left out when matching, so an incremental sync replays the recorded listing
+VOLATILE_PARAMS = {'updated_after', 'updated_before', 'created_after', 'created_before'}
+# Response headers the app reads; everything else (cookies, request ids, server details) is dropped
+KEPT_HEADERS = {'content-type', 'link', 'x-total', 'x-total-pages', 'x-page', 'x-next-page', 'x-prev-page',
+                'x-per-page', 'ratelimit-limit', 'ratelimit-remaining', 'ratelimit-reset', 'retry-after'}
+SCRUBBED = '[SCRUBBED]'
+
+def request_key(method, url):
+    """Host-independent key of a GitLab API call, e.g. 'GET /api/v4/projects/1/merge_requests?page=2&state=opened'"""
+    parts = urlsplit(url)
+    path = parts.path
+    if '/api/' in path:
+        path = path[path.index('/api/'):]
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name not in TOKEN_PARAMS and name not in VOLATILE_PARAMS)
+    return f"{method.upper()} {path}" + (f"?{urlencode(query)}" if query else '')
+
+def _secrets(request):
+    """Credential values sent with a request"""
+    values = [request.headers.get(name, '') for name in TOKEN_HEADERS]
+    values += [value for name, value in parse_qsl(urlsplit(request.url).query) if name in TOKEN_PARAMS]
+    return [value.split(' ', 1)[-1] for value in values if value]
+
+def _scrub(text, secrets):
+    for secret in secrets:
+        text = text.replace(secret, SCRUBBED)
+    return text
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter that calls GitLab and appends every response to the cassette"""
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        secrets = _secrets(request)
+        self.cassette.record({
+            'key': _scrub(request_key(request.method, request.url), secrets),
+            'status': response.status_code,
+            'headers': {name: _scrub(value, secrets) for name, value in response.headers.items()
+                        if name.lower() in KEPT_HEADERS},
+            'body': _scrub(response.content.decode('utf-8', 'replace'), secrets),
+            'elapsed_ms': round(response.elapsed.total_seconds() * 1000, 1)
+        })
+        return response
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that answers GitLab calls from the cassette without touching the network"""
+
+    def __init__(self, cassette, latency=GITLAB_REPLAY_LATENCY):
+        super().__init__()
+        self.cassette = cassette
+        self.latency = latency
+
+    def send(self, request, **kwargs):
+        interaction = self.cassette.play(request_key(request.method, request.url))
+        if interaction is None:
+            interaction = {'status': 404, 'headers': {'Content-Type': 'application/json'},
+                           'body': json.dumps({'message': '404 Not found in cassette'}), 'elapsed_ms': 0}
+        delay_ms = interaction['elapsed_ms'] if self.latency == 'recorded' else float(self.latency or 0)
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        response._content = interaction['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK' if response.status_code < 400 else 'Not Found'
+        return response
+
+    def close(self):
+        pass
+
+class Cassette:
+    """GitLab API interactions stored one JSON object per line.
+
+    Recording truncates the file and appends each response as it arrives. Replay matches calls by method,
+    API path and query, ignoring the host, credentials and time-dependent filters. Repeated calls to the
+    same key get the recorded responses in order, then the last one again; unknown calls get a 404.
+    """
+
+    def __init__(self, path=GITLAB_CASSETTE):
+        self.path = path
+        self.mode = None
+        self.calls = 0
+        self.misses = 0
+        self._interactions = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def install(self, session, mode=GITLAB_CASSETTE_MODE, latency=GITLAB_REPLAY_LATENCY):
+        """Route every call of a requests session through the cassette in 'record' or 'replay' mode"""
+        if mode == 'record':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            open(self.path, 'w').close()
+            adapter = RecordingAdapter(self)
+        elif mode == 'replay':
+            self.load()
+            adapter = ReplayAdapter(self, latency)
+        else:
+            raise ValueError(f"Unknown cassette mode: {mode!r} (GITLAB_CASSETTE_MODE must be 'record' or 'replay')")
+        self.mode = mode
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        logger.info(f"GitLab cassette {mode}ing {self.path}")
+        return self
+
+    def load(self):
+        """Read the cassette file into per-key response lists"""
+        interactions = {}
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    interactions.setdefault(interaction['key'], []).append(interaction)
+        with self._lock:
+            self._interactions = interactions
+            self._positions = {}
+        logger.info(f"Loaded {sum(map(len, interactions.values()))} GitLab interactions from {self.path}")
+
+    def record(self, interaction):
+        with self._lock:
+            self.calls += 1
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(interaction) + '\n')
+
+    def play(self, key):
+        """Next recorded interaction for a key, or None if the key was never recorded"""
+        with self._lock:
+            self.calls += 1
+            recorded = self._interactions.get(key)
+            if not recorded:
+                self.misses += 1
+                logger.warning(f"GitLab call not in cassette: {key}")
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return recorded[min(position, len(recorded) - 1)]
+
+    def status(self):
+        """Cassette mode and counters"""
+        return {
+            'mode': self.mode,
+            'path': self.path,
+            'calls': self.calls,
+            'misses': self.misses,
+            'recorded_keys': len(self._interactions)
+        }
+
+# Global GitLab cassette instance
+gitlab_cassette = Cassette()
@@ -4,26 +4,60 @@ Handles database connection, collections, and basic CRUD operations
 """
 
 import os
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+import time
+import threading
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, OperationFailure
+from bson import Binary
 from datetime import datetime
+import re
 import logging
+from timing import MongoTimingListener
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bumped whenever create_indexes() changes; `python migrate.py` brings a database up to it
+SCHEMA_VERSION = 2
+SCHEMA_VERSION_KEY = 'schema_version'
+MONGO_RETRY_INTERVAL = int(os.getenv('MONGO_RETRY_INTERVAL', 30))  # seconds between background connection attempts
+
 class DatabaseManager:
-    """MongoDB database manager for GitLab MR Manager"""
+    """MongoDB database manager for GitLab MR Manager.
+
+    Nothing connects at import: start() connects in a background thread, so a preloading server can
+    import this module before forking and each worker opens its own client. `db` stays None (and
+    callers fall back as they do when MongoDB is down) until the first successful ping. Indexes are
+    created by the migration step, not on every connection.
+    """
     
     def __init__(self):
         self.client = None
         self.db = None
         self.collections = {}
-        self._connect()
+        self.connected = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+    
+    def start(self):
+        """Connect in a background thread, retrying every MONGO_RETRY_INTERVAL seconds until MongoDB answers"""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._connect_until_ready, name='mongodb-connect', daemon=True)
+                self._thread.start()
+    
+    def _connect_until_ready(self):
+        while not self._connect():
+            time.sleep(MONGO_RETRY_INTERVAL)
+    
+    def wait_until_connected(self, timeout=10):
+        """Start connecting if needed and block until connected; returns whether it succeeded"""
+        self.start()
+        return self.connected.wait(timeout)
     
     def _connect(self):
-        """Establish connection to MongoDB"""
+        """Establish connection to MongoDB, returning whether it succeeded"""
         try:
             # Get MongoDB configuration from environment variables
             mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
@@ -34,6 +68,7 @@ class DatabaseManager:
                 'serverSelectionTimeoutMS': 5000,  # 5 seconds timeout
                 'connectTimeoutMS': 10000,         # 10 seconds connection timeout
                 'socketTimeoutMS': 10000,          # 10 seconds socket timeout
+                'event_listeners': [MongoTimingListener()]  # per-request MongoDB time for Server-Timing
             }
             
             # Add authentication if provided
@@ -56,11 +91,13 @@ class DatabaseManager:
             self.client.admin.command('ping')
             logger.info("MongoDB connection successful")
             
-            # Get database
-            self.db = self.client[db_name]
-            
-            # Initialize collections
-            self._init_collections()
+            # Initialize collections before publishing the database to other threads
+            db = self.client[db_name]
+            self._init_collections(db)
+            self.db = db
+            self.connected.set()
+            self._check_schema()
+            return True
             
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
             logger.error(f"MongoDB connection failed: {e}")
@@ -70,28 +107,36 @@ class DatabaseManager:
             logger.error(f"Unexpected error connecting to MongoDB: {e}")
             self.client = None
             self.db = None
+        return False
     
-    def _init_collections(self):
+    def _init_collections(self, db):
         """Initialize database collections"""
-        if self.db is None:
-            return
-            
         # Define collections for different modules
         self.collections = {
-            'users': self.db.users,
-            'merge_requests': self.db.merge_requests,
-            'activities': self.db.activities,
-            'settings': self.db.settings,
-            'notifications': self.db.notifications,
-            'analytics': self.db.analytics,
-            'cache': self.db.cache
+            'users': db.users,
+            'merge_requests': db.merge_requests,
+            'activities': db.activities,
+            'settings': db.settings,
+            'notifications': db.notifications,
+            'analytics': db.analytics,
+            'review_cycles': db.review_cycles,
+            'cache': db.cache
         }
-        
-        # Create indexes for better performance
-        self._create_indexes()
     
-    def _create_indexes(self):
-        """Create database indexes for better performance"""
+    def _check_schema(self):
+        """Warn when the database has not been migrated to this version's indexes"""
+        try:
+            stored = self.collections['settings'].find_one({'key': SCHEMA_VERSION_KEY})
+            version = stored['value'] if stored else 0
+            if version < SCHEMA_VERSION:
+                logger.warning(f"MongoDB schema version {version} is older than {SCHEMA_VERSION}; run `python migrate.py`")
+        except Exception as e:
+            logger.error(f"Error checking MongoDB schema version: {e}")
+    
+    def create_indexes(self):
+        """Create database indexes for better performance and record the schema version"""
+        if self.db is None:
+            return False
         try:
             # Users collection indexes
             if 'users' in self.collections:
@@ -105,6 +150,9 @@ class DatabaseManager:
                 self.collections['merge_requests'].create_index([("state", 1)])
                 self.collections['merge_requests'].create_index([("created_at", -1)])
                 self.collections['merge_requests'].create_index([("labels", 1)])
+                self.collections['merge_requests'].create_index([("stage", 1)])
+                self.collections['merge_requests'].create_index([("diff_stats.sha", 1)])
+                self.collections['merge_requests'].create_index([("updated_at", 1)])
             
             # Activities collection indexes
             if 'activities' in self.collections:
@@ -126,16 +174,34 @@ class DatabaseManager:
             if 'analytics' in self.collections:
                 self.collections['analytics'].create_index([("date", 1)])
                 self.collections['analytics'].create_index([("metric_type", 1)])
+                self.collections['analytics'].create_index([("metric_type", 1), ("date", 1)], unique=True)
+            
+            # Review cycles collection indexes (latency percentiles sort each group by hours)
+            if 'review_cycles' in self.collections:
+                self.collections['review_cycles'].create_index([("mr_id", 1)], unique=True)
+                self.collections['review_cycles'].create_index([("reviewed_by", 1), ("ready_to_reviewed_hours", 1)])
+                self.collections['review_cycles'].create_index([("gtm_by", 1), ("reviewed_to_gtm_hours", 1)])
+                self.collections['review_cycles'].create_index([("author", 1), ("ready_to_reviewed_hours", 1)])
+                self.collections['review_cycles'].create_index([("author", 1), ("reviewed_to_gtm_hours", 1)])
             
-            # Cache collection indexes
+            # Cache collection indexes (expires_at is a TTL index so MongoDB purges expired entries)
             if 'cache' in self.collections:
                 self.collections['cache'].create_index([("key", 1)], unique=True)
-                self.collections['cache'].create_index([("expires_at", 1)])
+                try:
+                    self.collections['cache'].create_index([("expires_at", 1)], expireAfterSeconds=0)
+                except OperationFailure:
+                    # Replace the plain expires_at index created by older versions
+                    self.collections['cache'].drop_index("expires_at_1")
+                    self.collections['cache'].create_index([("expires_at", 1)], expireAfterSeconds=0)
             
+            self.collections['settings'].update_one({'key': SCHEMA_VERSION_KEY},
+                                                    {'$set': {'value': SCHEMA_VERSION}}, upsert=True)
             logger.info("Database indexes created successfully")
+            return True
             
         except Exception as e:
             logger.error(f"Error creating indexes: {e}")
+            return False
     
     def is_connected(self):
         """Check if database is connected"""
@@ -185,6 +251,10 @@ def get_analytics_collection():
     """Get analytics collection"""
     return db_manager.get_collection('analytics')
 
+def get_review_cycles_collection():
+    """Get review cycles collection"""
+    return db_manager.get_collection('review_cycles')
+
 def get_cache_collection():
     """Get cache collection"""
     return db_manager.get_collection('cache')
@@ -197,7 +267,7 @@ def insert_document(collection_name, document):
         if collection is not None:
             document['created_at'] = datetime.utcnow()
             result = collection.insert_one(document)
-            logger.info(f"Document inserted into {collection_name}: {result.inserted_id}")
+            logger.debug(f"Document inserted into {collection_name}: {result.inserted_id}")
             return result.inserted_id
         return None
     except Exception as e:
@@ -205,7 +275,7 @@ def insert_document(collection_name, document):
         return None
 
 def find_documents(collection_name, query=None, limit=None, sort=None):
-    """Find documents in a collection"""
+    """Find documents in a collection (materializes the result; use iter_documents for large reads)"""
     try:
         collection = db_manager.get_collection(collection_name)
         if collection is not None:
@@ -220,6 +290,26 @@ def find_documents(collection_name, query=None, limit=None, sort=None):
         logger.error(f"Error finding documents in {collection_name}: {e}")
         return []
 
+def iter_documents(collection_name, query=None, projection=None, sort=None, limit=None, batch_size=500):
+    """Stream documents from a collection with bounded memory, fetching batch_size documents per round trip"""
+    collection = db_manager.get_collection(collection_name)
+    if collection is None:
+        return
+    cursor = None
+    try:
+        cursor = collection.find(query or {}, projection, batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        for document in cursor:
+            yield document
+    except Exception as e:
+        logger.error(f"Error streaming documents from {collection_name}: {e}")
+    finally:
+        if cursor is not None:
+            cursor.close()
+
 def find_one_document(collection_name, query):
     """Find one document in a collection"""
     try:
@@ -231,15 +321,15 @@ def find_one_document(collection_name, query):
         logger.error(f"Error finding document in {collection_name}: {e}")
         return None
 
-def update_document(collection_name, query, update_data):
+def update_document(collection_name, query, update_data, upsert=False):
     """Update a document in a collection"""
     try:
         collection = db_manager.get_collection(collection_name)
         if collection is not None:
             update_data['updated_at'] = datetime.utcnow()
-            result = collection.update_one(query, {'$set': update_data})
-            logger.info(f"Document updated in {collection_name}: {result.modified_count} modified")
-            return result.modified_count > 0
+            result = collection.update_one(query, {'$set': update_data}, upsert=upsert)
+            logger.debug(f"Document updated in {collection_name}: {result.modified_count} modified")
+            return result.modified_count > 0 or result.upserted_id is not None
         return False
     except Exception as e:
         logger.error(f"Error updating document in {collection_name}: {e}")
@@ -251,7 +341,7 @@ def delete_document(collection_name, query):
         collection = db_manager.get_collection(collection_name)
         if collection is not None:
             result = collection.delete_one(query)
-            logger.info(f"Document deleted from {collection_name}: {result.deleted_count} deleted")
+            logger.debug(f"Document deleted from {collection_name}: {result.deleted_count} deleted")
             return result.deleted_count > 0
         return False
     except Exception as e:
@@ -268,3 +358,91 @@ def count_documents(collection_name, query=None):
     except Exception as e:
         logger.error(f"Error counting documents in {collection_name}: {e}")
         return 0
+
+# Cache collection operations (fallback cache backend when Redis is unavailable)
+def _cache_pattern_regex(pattern):
+    """Translate a Redis glob pattern (*, ?) into an anchored regex"""
+    return '^' + re.escape(pattern).replace('\\*', '.*').replace('\\?', '.') + '$'
+
+def get_cache_entries(keys):
+    """Get unexpired cache values (raw bytes) for keys, returning a dict of hits"""
+    try:
+        collection = db_manager.get_collection('cache')
+        if collection is not None and keys:
+            # The TTL monitor only runs once a minute, so expired entries are filtered here too
+            cursor = collection.find({'key': {'$in': list(keys)}, 'expires_at': {'$gt': datetime.utcnow()}},
+                                     {'_id': 0, 'key': 1, 'value': 1})
+            return {doc['key']: bytes(doc['value']) for doc in cursor}
+        return {}
+    except Exception as e:
+        logger.error(f"Error reading cache entries: {e}")
+        return {}
+
+def set_cache_entry(key, value, expires_at):
+    """Store a cache value (raw bytes) that MongoDB deletes after expires_at"""
+    try:
+        collection = db_manager.get_collection('cache')
+        if collection is not None:
+            collection.update_one({'key': key}, {'$set': {'value': Binary(value), 'expires_at': expires_at}}, upsert=True)
+            return True
+        return False
+    except Exception as e:
+        logger.error(f"Error writing cache entry {key}: {e}")
+        return False
+
+def delete_cache_entries(pattern):
+    """Delete cache entries whose key matches a Redis glob pattern, returning the number deleted"""
+    try:
+        collection = db_manager.get_collection('cache')
+        if collection is not None:
+            return collection.delete_many({'key': {'$regex': _cache_pattern_regex(pattern)}}).deleted_count
+        return 0
+    except Exception as e:
+        logger.error(f"Error deleting cache entries matching {pattern}: {e}")
+        return 0
+
+# Bulk operations
+def bulk_upsert_documents(collection_name, documents, key_fields=('mr_id',), batch_size=1000):
+    """Upsert many documents matched on key_fields, one unordered bulk_write per batch.
+
+    Documents are written as-is with $set; returns the number of inserted and modified documents.
+    """
+    collection = db_manager.get_collection(collection_name)
+    if collection is None:
+        return {'upserted': 0, 'modified': 0}
+
+    totals = {'upserted': 0, 'modified': 0}
+    batch = []
+
+    def flush():
+        try:
+            result = collection.bulk_write(batch, ordered=False)
+            totals['upserted'] += result.upserted_count
+            totals['modified'] += result.modified_count
+        except Exception as e:
+            logger.error(f"Error bulk upserting {len(batch)} documents into {collection_name}: {e}")
+        batch.clear()
+
+    for document in documents:
+        key = {field: document[field] for field in key_fields}
+        batch.append(UpdateOne(key, {'$set': document}, upsert=True))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    logger.info(f"Bulk upserted into {collection_name}: {totals['upserted']} inserted, {totals['modified']} modified")
+    return totals
+
+def bulk_delete_documents(collection_name, field, values):
+    """Delete all documents whose field is one of values in a single round trip"""
+    try:
+        collection = db_manager.get_collection(collection_name)
+        if collection is not None and values:
+            result = collection.delete_many({field: {'$in': list(values)}})
+            logger.info(f"Bulk deleted from {collection_name}: {result.deleted_count} deleted")
+            return result.deleted_count
+        return 0
+    except Exception as e:
+        logger.error(f"Error bulk deleting documents from {collection_name}: {e}")
+        return 0
@@ -0,0 +1,354 @@
+"""
+Background Enrichment Module for GitLab MR Manager
+Computes per-commit MR data (head pipeline status, diff stats) in worker threads and caches it by commit SHA
+"""
+
+import json
+import threading
+import time
+import logging
+import redis
+from concurrent.futures import ThreadPoolExecutor
+from cache import get_cached_many, set_cached_data, redis_client, redis_available
+from leader import leader_election
+from database import get_mrs_collection
+from git_engine import git_engine
+
+logger = logging.getLogger(__name__)
+
+# Pipeline statuses that can no longer change for a given commit SHA
+FINAL_PIPELINE_STATUSES = {'success', 'failed', 'canceled', 'skipped', 'manual'}
+
+# Marker for a failed computation that should be retried on the next poll
+_FAILED = object()
+
+class ShaEnricher:
+    """Base class for MR data computed once per head commit SHA by a background worker pool.
+
+    Only the elected leader computes. Other instances hand the SHAs their pages need to the leader
+    through a Redis hash and read the results back from the shared cache.
+    """
+
+    name = 'enrichment'
+    field = 'enrichment'
+    max_workers = 8
+    poll_interval = 15          # seconds between polls of a SHA whose value is not final yet
+    idle_timeout = 600          # stop polling SHAs nobody has viewed for this long
+    final_expiry_hours = 24 * 7
+    max_results = 5000
+
+    def __init__(self):
+        self.project = None
+        self.project_id = None
+        self._results = {}      # sha -> computed value
+        self._pending = {}      # sha -> {'mr', 'requested_at', 'polled_at'}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, project, project_id):
+        """Attach the GitLab project and start the worker thread"""
+        if self._thread is not None:
+            return
+        self.project = project
+        self.project_id = project_id
+        leader_election.register(self.job)
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-enricher", daemon=True)
+        self._thread.start()
+        logger.info(f"Started {self.name} enrichment worker")
+
+    @property
+    def job(self):
+        """Leader election job name"""
+        return f"{self.name}_enricher"
+
+    def cache_key(self, sha):
+        """Redis key holding the value for a commit SHA"""
+        return f"{self.name}:{self.project_id}:{sha}"
+
+    def demand_key(self):
+        """Redis hash of SHAs requested by other instances for the leader to compute"""
+        return f"enrichment_requests:{self.name}:{self.project_id}"
+
+    def keys(self, mrs):
+        """Key each MR's value is computed and cached under: its head SHA, or None to skip the MR"""
+        return [mr.get('sha') for mr in mrs]
+
+    def is_final(self, value):
+        """Whether a computed value can never change for its SHA"""
+        return True
+
+    def compute(self, mr, sha):
+        """Compute the value for one MR head SHA (runs in a worker thread); None stops tracking the SHA"""
+        raise NotImplementedError
+
+    def load_stored(self, shas):
+        """Load values for SHAs missing from Redis from persistent storage, if any"""
+        return {}
+
+    def store(self, mr_id, sha, value):
+        """Persist a final value beyond the Redis cache, if needed"""
+        pass
+
+    def annotate(self, mrs):
+        """Attach known values to MR dicts and queue unknown or unfinished SHAs for the worker.
+
+        Never calls GitLab: MRs whose SHA has not been computed yet get None.
+        """
+        now = time.time()
+        leading = leader_election.is_leader(self.job)
+        shas = self.keys(mrs)
+        with self._lock:
+            # Unfinished values are only refreshed in process by the leader; others re-read the cache
+            missing = list({sha for sha in shas if sha and
+                            (sha not in self._results or not (leading or self.is_final(self._results[sha])))})
+
+        if missing and self.project_id is not None:
+            keys = [self.cache_key(sha) for sha in missing]
+            hits = get_cached_many(keys)
+            stored = self.load_stored([sha for sha, key in zip(missing, keys) if key not in hits])
+            with self._lock:
+                for sha, key in zip(missing, keys):
+                    if key in hits:
+                        self._remember(sha, hits[key])
+                    elif sha in stored:
+                        self._remember(sha, stored[sha])
+
+        queued = False
+        requested = {}
+        with self._lock:
+            for mr, sha in zip(mrs, shas):
+                value = self._results.get(sha) if sha else None
+                mr[self.field] = value
+                if not sha or (value is not None and self.is_final(value)):
+                    continue
+                if not leading:
+                    requested[sha] = {'id': mr['id'], 'target_branch': mr.get('target_branch')}
+                    continue
+                entry = self._pending.get(sha)
+                if entry is None:
+                    self._pending[sha] = {'mr': {'id': mr['id'], 'target_branch': mr.get('target_branch')},
+                                          'requested_at': now, 'polled_at': 0}
+                    queued = True
+                else:
+                    entry['requested_at'] = now
+
+        if queued:
+            self._wakeup.set()
+        if requested:
+            self._request_from_leader(requested)
+        return mrs
+
+    def _request_from_leader(self, requested):
+        """Hand SHAs to the leading instance; repeated requests just refresh the entry"""
+        if not redis_available():
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.hset(self.demand_key(), mapping={sha: json.dumps(mr) for sha, mr in requested.items()})
+            pipeline.expire(self.demand_key(), self.idle_timeout)
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"Error requesting {self.name} values from the leader: {e}")
+
+    def _take_requested(self, now):
+        """Queue the SHAs other instances requested (leader only)"""
+        if not redis_available():
+            return
+        try:
+            pipeline = redis_client.pipeline()
+            pipeline.hgetall(self.demand_key())
+            pipeline.delete(self.demand_key())
+            requested, _ = pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"Error reading requested {self.name} values: {e}")
+            return
+        with self._lock:
+            for sha, mr in requested.items():
+                sha = sha.decode()
+                entry = self._pending.get(sha)
+                if entry is None:
+                    self._pending[sha] = {'mr': json.loads(mr), 'requested_at': now, 'polled_at': 0}
+                else:
+                    entry['requested_at'] = now
+
+    def _remember(self, sha, value):
+        """Store a value in the in-process cache, dropping the oldest entries past max_results"""
+        self._results.pop(sha, None)
+        self._results[sha] = value
+        while len(self._results) > self.max_results:
+            self._results.pop(next(iter(self._results)))
+
+    def _run(self):
+        """Worker loop: wake on new SHAs or every poll interval and process due entries"""
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as executor:
+            while True:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                if not leader_election.is_leader(self.job):
+                    continue
+                try:
+                    self._take_requested(time.time())
+                    self._process(executor)
+                except Exception as e:
+                    logger.error(f"Error in {self.name} enrichment worker: {e}")
+
+    def _process(self, executor):
+        """Compute all due SHAs concurrently and publish the results"""
+        now = time.time()
+        with self._lock:
+            for sha, entry in list(self._pending.items()):
+                if now - entry['requested_at'] > self.idle_timeout:
+                    del self._pending[sha]
+            batch = [(entry['mr'], sha) for sha, entry in self._pending.items()
+                     if now - entry['polled_at'] >= self.poll_interval]
+            for _, sha in batch:
+                self._pending[sha]['polled_at'] = now
+
+        if not batch:
+            return
+
+        results = executor.map(lambda item: self._compute_safely(*item), batch)
+        for (mr, sha), value in zip(batch, results):
+            if value is _FAILED:
+                continue  # retried on the next poll
+            if value is None:
+                with self._lock:
+                    self._pending.pop(sha, None)
+                continue
+            final = self.is_final(value)
+            with self._lock:
+                self._remember(sha, value)
+                if final:
+                    self._pending.pop(sha, None)
+            if final:
+                set_cached_data(self.cache_key(sha), value, expiry_hours=self.final_expiry_hours)
+                self.store(mr['id'], sha, value)
+            else:
+                set_cached_data(self.cache_key(sha), value, expiry_seconds=self.poll_interval * 2)
+
+    def _compute_safely(self, mr, sha):
+        try:
+            return self.compute(mr, sha)
+        except Exception as e:
+            logger.error(f"Error computing {self.name} for MR {mr['id']} ({sha[:8]}): {e}")
+            return _FAILED
+
+class PipelineStatusEnricher(ShaEnricher):
+    """Head pipeline status per MR commit SHA, polled until the pipeline finishes"""
+
+    name = 'pipeline'
+    field = 'pipeline'
+
+    def is_final(self, value):
+        return value['status'] in FINAL_PIPELINE_STATUSES
+
+    def compute(self, mr, sha):
+        pipelines = self.project.pipelines.list(sha=sha, per_page=1, get_all=False)
+        if not pipelines:
+            return {'status': 'none', 'web_url': None}
+        pipeline = pipelines[0]
+        return {'status': pipeline.status, 'web_url': getattr(pipeline, 'web_url', None)}
+
+class DiffStatsEnricher(ShaEnricher):
+    """Lines added/removed and files changed per MR commit SHA, computed once and stored on the MR record"""
+
+    name = 'diffstats'
+    field = 'diff_stats'
+    max_workers = 4
+
+    def compute(self, mr, sha):
+        # Prefer the local repository when it has the commits; it costs no GitLab calls
+        local_stats = git_engine.mr_diff_stats(sha, mr.get('target_branch'))
+        if local_stats is not None:
+            return local_stats
+
+        changes = self.project.mergerequests.get(mr['id']).changes()
+        if changes.get('sha') != sha:
+            # The MR moved on since it was listed; the next listing queues the new SHA
+            return None
+
+        additions = deletions = 0
+        for change in changes.get('changes', []):
+            for line in change.get('diff', '').splitlines():
+                if line.startswith('+'):
+                    additions += 1
+                elif line.startswith('-'):
+                    deletions += 1
+
+        changes_count = str(changes.get('changes_count') or len(changes.get('changes', [])))
+        return {
+            'sha': sha,
+            'additions': additions,
+            'deletions': deletions,
+            'files_changed': int(changes_count.rstrip('+')),
+            'truncated': changes_count.endswith('+') or bool(changes.get('overflow'))
+        }
+
+    def load_stored(self, shas):
+        collection = get_mrs_collection()
+        if collection is None or not shas:
+            return {}
+        try:
+            cursor = collection.find({'diff_stats.sha': {'$in': shas}}, {'diff_stats': 1})
+            return {doc['diff_stats']['sha']: doc['diff_stats'] for doc in cursor}
+        except Exception as e:
+            logger.error(f"Error loading stored diff stats: {e}")
+            return {}
+
+    def store(self, mr_id, sha, value):
+        collection = get_mrs_collection()
+        if collection is None:
+            return
+        try:
+            # No upsert: an MR the sync has not stored yet would get a document without title, state or
+            # author. Its value is still served from the cache.
+            collection.update_one({'mr_id': mr_id}, {'$set': {'diff_stats': value}})
+        except Exception as e:
+            logger.error(f"Error storing diff stats for MR {mr_id}: {e}")
+
+class GitStatusEnricher(ShaEnricher):
+    """Ahead/behind counts and conflicts per MR head and target branch tip, from the local repository.
+
+    Values are keyed by '<head sha>:<target sha>', so a new target tip is a new key. The request path
+    only resolves the target branches through the cat-file pool; the git subprocesses run here.
+    """
+
+    name = 'gitstatus'
+    field = 'git_status'
+    max_workers = 4
+
+    def keys(self, mrs):
+        if not git_engine.available():
+            return [None] * len(mrs)
+        targets = {}
+        keys = []
+        for mr in mrs:
+            branch = mr.get('target_branch')
+            if branch not in targets:
+                targets[branch] = git_engine.resolve_branch(branch) if branch else None
+            target_sha = targets[branch]
+            keys.append(f"{mr['sha']}:{target_sha}" if mr.get('sha') and target_sha else None)
+        return keys
+
+    def compute(self, mr, key):
+        source_sha, target_sha = key.split(':')
+        if git_engine.resolve(source_sha) is None or git_engine.resolve(target_sha) is None:
+            # Not fetched into the local repository yet; the next view queues the MR again
+            return None
+        counts = git_engine.ahead_behind(target_sha, source_sha)
+        conflicts = git_engine.merge_conflicts(target_sha, source_sha)
+        if counts is None or conflicts is None:
+            return _FAILED
+        return {
+            'target_sha': target_sha,
+            'ahead': counts[0],
+            'behind': counts[1],
+            'conflicts': bool(conflicts),
+            'conflicted_files': conflicts
+        }
+
+# Global enricher instances
+pipeline_enricher = PipelineStatusEnricher()
+diff_stats_enricher = DiffStatsEnricher()
+git_status_enricher = GitStatusEnricher()
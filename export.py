@@ -0,0 +1,79 @@
+"""
+Export Module for GitLab MR Manager
+Streams stored MRs matching a stage and the page filters as NDJSON or CSV without building the list in memory
+"""
+
+import io
+import csv
+import json
+from database import iter_documents
+from stages import STAGES
+
+EXPORT_FIELDS = ['mr_id', 'title', 'author', 'state', 'stage', 'labels', 'reviewers', 'assignees', 'source_branch',
+                 'target_branch', 'sha', 'web_url', 'created_at', 'updated_at', 'merged_at', 'closed_at']
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+LINES_PER_CHUNK = 200
+
+def export_query(stage='all', reviewer='', author='', label=''):
+    """MongoDB query for the merge_requests collection equivalent to a page stage and its filters"""
+    query = {}
+    if stage == 'merged':
+        query['state'] = 'merged'
+    elif stage == 'open':
+        query['state'] = 'opened'
+    elif stage in STAGES:
+        query['state'] = 'opened'
+        query['stage'] = stage
+    if reviewer and reviewer != 'all':
+        query['reviewers'] = reviewer
+    if author and author != 'all':
+        query['author'] = author
+    if label and label != 'all':
+        query['labels'] = label
+    return query
+
+def _documents(query):
+    projection = {field: 1 for field in EXPORT_FIELDS}
+    projection['_id'] = 0
+    # Newest first, walking the unique mr_id index so MongoDB never sorts in memory
+    return iter_documents('merge_requests', query, projection=projection, sort=[('mr_id', -1)])
+
+def _chunks(lines):
+    """Group lines so the response is written in reasonably sized pieces"""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= LINES_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+def ndjson_lines(query):
+    """One JSON object per MR"""
+    for doc in _documents(query):
+        yield json.dumps({field: doc.get(field) for field in EXPORT_FIELDS}) + '\n'
+
+def csv_lines(query):
+    """CSV header then one row per MR; list fields are joined with '; '"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(values)
+        return buffer.getvalue()
+
+    yield line(EXPORT_FIELDS)
+    for doc in _documents(query):
+        yield line(['; '.join(value) if isinstance(value, list) else ('' if value is None else value)
+                    for value in (doc.get(field) for field in EXPORT_FIELDS)])
+
+def export_mrs(export_format, query):
+    """Generator of response chunks for an export format"""
+    lines = csv_lines(query) if export_format == 'csv' else ndjson_lines(query)
+    if export_format == 'csv':
+        # Send the header right away so the download starts before the first batch arrives
+        yield next(lines)
+    yield from _chunks(lines)
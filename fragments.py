@@ -0,0 +1,121 @@
+"""
+Fragments Module for GitLab MR Manager
+Caches the rendered HTML of MR cards per MR version so stage pages are mostly joined cached fragments
+"""
+
+import os
+import zlib
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from markupsafe import Markup
+from cache import get_cached_many, set_cached_many, redis_available
+from metrics import count_cache_lookups
+
+logger = logging.getLogger(__name__)
+
+FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 5000))          # cards kept in process
+FRAGMENT_EXPIRY_SECONDS = int(os.getenv('FRAGMENT_EXPIRY_SECONDS', 7 * 24 * 3600))
+
+# MR fields attached after listing that a card shows but that do not change the MR's updated_at
+_ENRICHED_FIELDS = ('pipeline', 'diff_stats', 'git_status')
+
+class FragmentCache:
+    """Rendered MR cards keyed by card template, template version, MR iid and updated_at.
+
+    Cards are looked up in process first, then in Redis (shared by all workers), and only rendered
+    on a miss. The template version is a hash of the card template source, so editing a card
+    template retires its cached fragments.
+    """
+
+    def __init__(self, max_entries=FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._fragments = OrderedDict()  # key -> HTML, least recently used first
+        self._versions = {}              # template name -> source hash
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def template_version(self, env, name):
+        """Short hash of a template's source, re-read on every call while templates auto-reload"""
+        with self._lock:
+            version = self._versions.get(name)
+        if version is None or env.auto_reload:
+            source = env.loader.get_source(env, name)[0]
+            version = hashlib.sha1(source.encode()).hexdigest()[:10]
+            with self._lock:
+                self._versions[name] = version
+        return version
+
+    @staticmethod
+    def key(name, version, mr):
+        """Cache key of one MR's card; enrichment values are folded in as a checksum"""
+        enriched = zlib.crc32(repr([mr.get(field) for field in _ENRICHED_FIELDS]).encode())
+        return f"fragment:{name}:{version}:{mr['id']}:{mr['updated_ts']}:{enriched:08x}"
+
+    def _remember(self, key, html):
+        with self._lock:
+            self._fragments[key] = html
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+
+    def render(self, env, name, mrs):
+        """Card HTML for each MR dict of a page, rendering only the cards not cached yet"""
+        version = self.template_version(env, name)
+        keys = [self.key(name, version, mr) for mr in mrs]
+
+        fragments = {}
+        with self._lock:
+            for key in keys:
+                if key in self._fragments:
+                    self._fragments.move_to_end(key)
+                    fragments[key] = self._fragments[key]
+
+        missing = [key for key in keys if key not in fragments]
+        # Only Redis is shared between workers; the MongoDB fallback would cost more than rendering
+        if missing and redis_available():
+            for key, html in get_cached_many(missing).items():
+                fragments[key] = html
+                self._remember(key, html)
+
+        rendered = {}
+        template = None
+        for key, mr in zip(keys, mrs):
+            if key in fragments or key in rendered:
+                continue
+            if template is None:
+                template = env.get_template(name)
+            rendered[key] = template.render(mr=mr)
+            self._remember(key, rendered[key])
+        if rendered and redis_available():
+            set_cached_many(rendered, expiry_seconds=FRAGMENT_EXPIRY_SECONDS)
+
+        self.hits += len(keys) - len(rendered)
+        self.misses += len(rendered)
+        count_cache_lookups('fragments', len(keys) - len(rendered), len(rendered))
+        fragments.update(rendered)
+        return [Markup(fragments[key]) for key in keys]
+
+    def clear(self):
+        """Drop the in-process fragments"""
+        with self._lock:
+            self._fragments.clear()
+            self._versions.clear()
+
+    def stats(self):
+        """Fragment cache size and hit counts"""
+        with self._lock:
+            size = len(self._fragments)
+        total = self.hits + self.misses
+        return {
+            'cached_cards': size,
+            'max_cards': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None
+        }
+
+# Global fragment cache instance
+fragment_cache = FragmentCache()
@@ -0,0 +1,234 @@
+"""
+Local Git Engine for GitLab MR Manager
+Answers diff stats, conflict and ahead/behind questions for MRs from a local repository instead of the GitLab API
+"""
+
+import os
+import queue
+import subprocess
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+GITLAB_REPO_PATH = os.getenv('GITLAB_REPO_PATH', '/path/to/your/gitlab/repo')
+GIT_CAT_FILE_PROCESSES = int(os.getenv('GIT_CAT_FILE_PROCESSES', 4))
+
+def run_git_command(command, repo_path=None, input=None, timeout=30, env=None):
+    """Run git command and return output; env adds variables to the inherited environment"""
+    if repo_path is None:
+        repo_path = GITLAB_REPO_PATH
+
+    try:
+        result = subprocess.run(
+            ['git'] + command,
+            cwd=repo_path,
+            input=input,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            env=dict(os.environ, **env) if env else None
+        )
+        return result.stdout.strip(), result.stderr.strip(), result.returncode
+    except Exception as e:
+        return "", str(e), -1
+
+class CatFileBatch:
+    """Long-lived `git cat-file --batch` process reading objects without a spawn per lookup"""
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.process = None
+
+    def _ensure_process(self):
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                ['git', 'cat-file', '--batch'],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+
+    def read(self, rev):
+        """Return (sha, type, content) for a revision, or None if it does not exist"""
+        for attempt in range(2):
+            try:
+                self._ensure_process()
+                self.process.stdin.write(rev.encode() + b'\n')
+                self.process.stdin.flush()
+                header = self.process.stdout.readline()
+                if not header:
+                    raise BrokenPipeError('git cat-file exited')
+                parts = header.split()
+                if len(parts) != 3:
+                    return None  # "<rev> missing" or "<rev> ambiguous"
+                sha, object_type, size = parts
+                content = self.process.stdout.read(int(size))
+                self.process.stdout.read(1)  # trailing newline
+                return sha.decode(), object_type.decode(), content
+            except (BrokenPipeError, OSError, ValueError) as e:
+                self.close()
+                if attempt:
+                    logger.error(f"git cat-file failed for {rev}: {e}")
+        return None
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+            self.process = None
+
+class LocalGitEngine:
+    """Diff stats, merge conflicts and ahead/behind counts computed against GITLAB_REPO_PATH.
+
+    Object lookups go through a pool of persistent cat-file processes, and every result is
+    memoized by commit SHAs, so repeated questions about unchanged branches cost nothing.
+    """
+
+    max_memoized = 10000
+
+    def __init__(self, repo_path=None, processes=GIT_CAT_FILE_PROCESSES):
+        self.repo_path = repo_path or GITLAB_REPO_PATH
+        self._processes = processes
+        self._pool = queue.Queue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+        self._available = None
+
+    def available(self):
+        """Whether the configured path is a usable git repository"""
+        if self._available is None:
+            if not os.path.isdir(self.repo_path):
+                self._available = False
+            else:
+                _, _, returncode = run_git_command(['rev-parse', '--git-dir'], self.repo_path)
+                self._available = returncode == 0
+            if not self._available:
+                logger.info(f"Local git engine disabled: {self.repo_path} is not a git repository")
+        return self._available
+
+    def invalidate(self):
+        """Re-check repository availability on next use, e.g. after the mirror was created"""
+        self._available = None
+
+    def _acquire(self):
+        with self._pool_lock:
+            if self._pool.empty() and self._created < self._processes:
+                self._created += 1
+                return CatFileBatch(self.repo_path)
+        return self._pool.get()
+
+    def read_object(self, rev):
+        """Read an object through the cat-file pool"""
+        batch = self._acquire()
+        try:
+            return batch.read(rev)
+        finally:
+            self._pool.put(batch)
+
+    def resolve(self, rev):
+        """Resolve a revision to a commit SHA"""
+        obj = self.read_object(rev)
+        if obj is None or obj[1] != 'commit':
+            return None
+        return obj[0]
+
+    def resolve_branch(self, branch):
+        """Resolve a branch in a mirror (refs/heads) or a regular clone (refs/remotes/origin)"""
+        return self.resolve(f"refs/heads/{branch}") or self.resolve(f"refs/remotes/origin/{branch}")
+
+    def _memoized(self, key, compute):
+        if key in self._memo:
+            return self._memo[key]
+        value = compute()
+        if value is not None:
+            with self._memo_lock:
+                if len(self._memo) >= self.max_memoized:
+                    self._memo.pop(next(iter(self._memo)))
+                self._memo[key] = value
+        return value
+
+    def diff_stats(self, base_sha, head_sha):
+        """Lines added/removed and files changed between the merge base and head, like the MR diff"""
+        def compute():
+            stdout, stderr, returncode = run_git_command(['diff', '--numstat', f"{base_sha}...{head_sha}"], self.repo_path)
+            if returncode != 0:
+                logger.error(f"git diff failed for {base_sha}...{head_sha}: {stderr}")
+                return None
+            additions = deletions = files_changed = 0
+            for line in stdout.splitlines():
+                added, deleted, _ = line.split('\t', 2)
+                files_changed += 1
+                if added != '-':  # binary files report "-"
+                    additions += int(added)
+                    deletions += int(deleted)
+            return {'sha': head_sha, 'additions': additions, 'deletions': deletions,
+                    'files_changed': files_changed, 'truncated': False}
+        return self._memoized(('diff', base_sha, head_sha), compute)
+
+    def merge_conflicts(self, target_sha, source_sha):
+        """Conflicting paths when merging source into target, via `git merge-tree --write-tree`"""
+        def compute():
+            stdout, stderr, returncode = run_git_command(
+                ['merge-tree', '--write-tree', '--name-only', '--no-messages', target_sha, source_sha], self.repo_path)
+            if returncode not in (0, 1):
+                logger.error(f"git merge-tree failed for {target_sha} {source_sha}: {stderr}")
+                return None
+            # First line is the resulting tree; conflicted paths follow when the exit status is 1
+            return list(dict.fromkeys(stdout.splitlines()[1:])) if returncode == 1 else []
+        return self._memoized(('conflicts', target_sha, source_sha), compute)
+
+    def ahead_behind(self, target_sha, source_sha):
+        """(ahead, behind) commit counts of source relative to target"""
+        def compute():
+            stdout, stderr, returncode = run_git_command(
+                ['rev-list', '--left-right', '--count', f"{target_sha}...{source_sha}"], self.repo_path)
+            if returncode != 0:
+                logger.error(f"git rev-list failed for {target_sha}...{source_sha}: {stderr}")
+                return None
+            behind, ahead = stdout.split()
+            return int(ahead), int(behind)
+        return self._memoized(('ahead_behind', target_sha, source_sha), compute)
+
+    def mr_status(self, source_sha, target_branch):
+        """Ahead/behind counts and conflicts for an MR head against the current target branch tip"""
+        if not source_sha or not self.available():
+            return None
+        target_sha = self.resolve_branch(target_branch)
+        if target_sha is None or self.resolve(source_sha) is None:
+            return None
+        counts = self.ahead_behind(target_sha, source_sha)
+        conflicts = self.merge_conflicts(target_sha, source_sha)
+        if counts is None or conflicts is None:
+            return None
+        return {
+            'target_sha': target_sha,
+            'ahead': counts[0],
+            'behind': counts[1],
+            'conflicts': bool(conflicts),
+            'conflicted_files': conflicts
+        }
+
+    def mr_diff_stats(self, source_sha, target_branch):
+        """Diff stats for an MR head, or None when the commits are not in the local repository"""
+        if not source_sha or not self.available():
+            return None
+        target_sha = self.resolve_branch(target_branch)
+        if target_sha is None or self.resolve(source_sha) is None:
+            return None
+        return self.diff_stats(target_sha, source_sha)
+
+    def close(self):
+        """Stop all cat-file processes"""
+        while not self._pool.empty():
+            self._pool.get().close()
+
+# Global engine instance
+git_engine = LocalGitEngine()
@@ -0,0 +1,47 @@
+"""
+Gunicorn Configuration for GitLab MR Manager
+Preloads the app and MR snapshot once in the master, then starts connections and background workers in each worker process
+
+    gunicorn -c gunicorn.conf.py
+"""
+
+import os
+import glob
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('GUNICORN_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')            # 'gevent' for many concurrent GitLab waits
+threads = int(os.getenv('GUNICORN_THREADS', 4))                         # per worker with gthread
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 200)) # per worker with gevent
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))      # in-flight requests finish on reload or stop
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))               # recycle workers after this many requests
+max_requests_jitter = max_requests // 10
+
+# Imported once in the master: workers fork with the app and MR snapshot already in memory
+preload_app = True
+wsgi_app = 'wsgi:create_app(start_workers=False)'
+
+if worker_class == 'gevent':
+    # Patch before the preloaded app imports requests, redis and pymongo
+    from gevent import monkey
+    monkey.patch_all()
+
+def on_starting(server):
+    # Metric files left by a previous run's workers would be summed into this run's /metrics
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+def post_worker_init(worker):
+    # Threads and client connections do not survive fork, so each worker opens its own
+    from app import start_background_workers
+    start_background_workers()
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,100 @@
+"""
+Health Module for GitLab MR Manager
+Liveness and readiness state refreshed by a background checker, so health probes never touch MongoDB, Redis or GitLab
+"""
+
+import os
+import time
+import threading
+import logging
+from database import db_manager
+from cache import redis_client
+from breaker import gitlab_breaker
+from search import search_index
+from sync import mr_sync
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', 5))   # seconds between dependency checks
+READY_MAX_DATA_AGE = int(os.getenv('READY_MAX_DATA_AGE', 900))       # seconds before MR data is too old to serve
+
+class HealthChecker:
+    """Checks MongoDB, Redis, the GitLab circuit and MR data freshness every HEALTH_CHECK_INTERVAL seconds.
+
+    Probes read the last result. Readiness requires MR data (the snapshot, MongoDB or a sync) no older
+    than READY_MAX_DATA_AGE; MongoDB, Redis and GitLab are reported but do not fail readiness because the
+    app keeps serving without them. Liveness fails only when the checker itself stops refreshing.
+    """
+
+    def __init__(self, interval=HEALTH_CHECK_INTERVAL, max_data_age=READY_MAX_DATA_AGE):
+        self.interval = interval
+        self.max_data_age = max_data_age
+        self.started_at = None
+        self.checked_at = None
+        self.checks = {}
+        self._thread = None
+
+    def start(self):
+        """Start the checker thread"""
+        if self._thread is not None:
+            return
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name='health-check', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error checking health: {e}")
+            time.sleep(self.interval)
+
+    def refresh(self):
+        """Check every dependency once and publish the results"""
+        # In-process state is published first so a slow MongoDB ping never delays readiness;
+        # each result is published as one assignment so probes never see a half-updated one
+        checks = dict(self.checks, mr_data=self._mr_data(),
+                      gitlab={'ok': not gitlab_breaker.is_open, 'circuit': 'open' if gitlab_breaker.is_open else 'closed'})
+        self.checks, self.checked_at = checks, time.time()
+        # Pinged only once connected; the first connection attempt may block for the server selection timeout
+        mongodb_ok = db_manager.db is not None and db_manager.is_connected()
+        checks = dict(checks, mongodb={'ok': mongodb_ok}, redis={'ok': self._ping_redis()})
+        self.checks, self.checked_at = checks, time.time()
+
+    @staticmethod
+    def _ping_redis():
+        try:
+            return bool(redis_client.ping())
+        except Exception:
+            return False
+
+    def _mr_data(self):
+        as_of = max(search_index.data_as_of or 0, mr_sync.last_sync or 0) or None
+        age = round(time.time() - as_of) if as_of else None
+        return {
+            'ok': age is not None and age <= self.max_data_age,
+            'loaded': search_index.data_as_of is not None,
+            'mrs': len(search_index),
+            'age_seconds': age,
+            'max_age_seconds': self.max_data_age
+        }
+
+    def liveness(self):
+        """(alive, body): alive while the checker keeps refreshing"""
+        stale_after = max(3 * self.interval, 30)
+        last = self.checked_at or self.started_at
+        alive = last is None or time.time() - last <= stale_after
+        return alive, {'status': 'ok' if alive else 'stalled', 'checked_at': self.checked_at}
+
+    def readiness(self):
+        """(ready, body): ready once fresh MR data is loaded"""
+        checks = self.checks
+        if not checks:
+            return False, {'status': 'starting', 'checked_at': None, 'checks': {}}
+        ready = checks['mr_data']['ok']
+        return ready, {'status': 'ready' if ready else 'not_ready', 'checked_at': self.checked_at, 'checks': checks}
+
+# Global health checker instance
+health_checker = HealthChecker()
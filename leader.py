@@ -0,0 +1,142 @@
+"""
+Leader Election Module for GitLab MR Manager
+Redis leases electing one process per background job across all app instances, renewed while the holder is alive
+"""
+
+import os
+import time
+import uuid
+import socket
+import atexit
+import threading
+import logging
+import redis
+from cache import redis_client, redis_available
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LEADER_LEASE_SECONDS = int(os.getenv('LEADER_LEASE_SECONDS', 10))  # a dead leader's jobs move on within this time
+SINGLE_INSTANCE = os.getenv('SINGLE_INSTANCE', 'false').lower() in ('1', 'true', 'yes')  # lead every job without electing
+
+LEASE_KEY = 'leader:{job}'
+
+# Extend the lease only while this instance still holds it
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Give the lease up only while this instance still holds it
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class LeaderElection:
+    """One leader per job name among every process sharing the Redis instance.
+
+    A process leads a job while it holds the job's Redis key, set with NX and a lease of
+    LEADER_LEASE_SECONDS and renewed every third of the lease. It stops acting as leader when its
+    own view of the lease runs out, before the key expires in Redis, so two processes never lead
+    at once. Leases are released on clean exit for immediate failover.
+
+    While Redis is unreachable no lease can be taken or renewed: a leader keeps its jobs only until
+    its lease would have expired, and no other process starts leading. Only a process configured as
+    the single instance (SINGLE_INSTANCE) leads every job without Redis.
+    """
+
+    def __init__(self, lease_seconds=LEADER_LEASE_SECONDS, single_instance=SINGLE_INSTANCE):
+        self.lease_seconds = lease_seconds
+        self.single_instance = single_instance
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held_until = {}   # job -> monotonic time until which this process may act as leader
+        self._lock = threading.Lock()
+        self._thread = None
+        self._renew = redis_client.register_script(_RENEW_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+
+    def register(self, job):
+        """Take part in the election for a job, trying to win it right away"""
+        with self._lock:
+            if job in self._held_until:
+                return
+            self._held_until[job] = 0
+            if self._thread is None:
+                # Forked workers must not share the parent's identity
+                self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+                self._thread = threading.Thread(target=self._run, name='leader-election', daemon=True)
+                self._thread.start()
+                atexit.register(self.release_all)
+        self._elect(job)
+
+    def is_leader(self, job):
+        """Whether this process should run a job now"""
+        if self.single_instance:
+            return True
+        return self._held_until.get(job, 0) > time.monotonic()
+
+    def _run(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            for job in list(self._held_until):
+                self._elect(job)
+
+    def _elect(self, job):
+        """Renew a held lease or try to take a free one"""
+        if self.single_instance or not redis_available():
+            # A held lease runs out on its own; nobody else can take the job before it expires in Redis
+            return
+        key = LEASE_KEY.format(job=job)
+        lease_ms = self.lease_seconds * 1000
+        started = time.monotonic()
+        was_leader = self._held_until.get(job, 0) > started
+        try:
+            if was_leader:
+                leading = bool(self._renew(keys=[key], args=[self.instance_id, lease_ms]))
+            else:
+                leading = bool(redis_client.set(key, self.instance_id, nx=True, px=lease_ms))
+        except redis.RedisError as e:
+            # The lease may still be ours in Redis; keep leading only until it would have expired
+            logger.warning(f"Leader election for {job} failed: {e}")
+            return
+        # Counted from before the Redis call, so this process stops leading before the key expires
+        self._held_until[job] = started + self.lease_seconds if leading else 0
+        if leading != was_leader:
+            logger.info(f"{'Became' if leading else 'No longer'} leader for {job} ({self.instance_id})")
+
+    def release_all(self):
+        """Give up every held lease so other instances take over without waiting for expiry"""
+        for job, held_until in list(self._held_until.items()):
+            if held_until > time.monotonic():
+                try:
+                    self._release(keys=[LEASE_KEY.format(job=job)], args=[self.instance_id])
+                except redis.RedisError:
+                    pass
+                self._held_until[job] = 0
+
+    def status(self):
+        """Leader of every job this process takes part in"""
+        jobs = {}
+        for job in sorted(self._held_until):
+            holder = None
+            if redis_available():
+                try:
+                    holder = redis_client.get(LEASE_KEY.format(job=job))
+                except redis.RedisError:
+                    pass
+            jobs[job] = {'leader': self.is_leader(job), 'holder': holder.decode() if holder else None}
+        return {
+            'instance': self.instance_id,
+            'single_instance': self.single_instance,
+            'shared': redis_available(),
+            'lease_seconds': self.lease_seconds,
+            'jobs': jobs
+        }
+
+# Global leader election instance
+leader_election = LeaderElection()
@@ -0,0 +1,35 @@
+"""
+MR Listing Module for GitLab MR Manager
+Lean MR listing that reads the merge request list API as raw JSON straight into MRRecords, skipping python-gitlab objects
+"""
+
+import json
+import logging
+from urllib.parse import quote
+from records import MRRecord
+
+# orjson parses GitLab list pages several times faster than the standard library
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+LIST_PAGE_SIZE = 100
+
+def iter_mr_pages(gl, project_id, **query):
+    """Yield the raw MR dicts of each page of the project MR list, following the API's next links"""
+    path = f"/projects/{quote(str(project_id), safe='')}/merge_requests"
+    query_data = dict(query, per_page=LIST_PAGE_SIZE)
+    while path:
+        # http_request keeps python-gitlab's auth, retries and rate-limit handling
+        response = gl.http_request('get', path, query_data=query_data)
+        yield _loads(response.content)
+        path = response.links.get('next', {}).get('url')
+        query_data = None   # the next link carries the query
+
+def list_mr_records(gl, project_id, state='opened', **query):
+    """All project MRs in a state as MRRecords"""
+    return [MRRecord.from_json(item) for page in iter_mr_pages(gl, project_id, state=state, **query) for item in page]
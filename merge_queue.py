@@ -0,0 +1,268 @@
+"""
+Merge Queue Module for GitLab MR Manager
+Redis-backed merge queue: web requests enqueue merges and a background worker rebases, merges and retries them in order per target branch
+"""
+
+import os
+import json
+import uuid
+import time
+import threading
+import logging
+import redis
+import gitlab
+from cache import redis_client, redis_available
+from ratelimit import gitlab_budget
+from leader import leader_election
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MERGE_QUEUE_POLL_INTERVAL = int(os.getenv('MERGE_QUEUE_POLL_INTERVAL', 10))   # seconds between checks of a waiting job
+MERGE_JOB_MAX_ATTEMPTS = int(os.getenv('MERGE_JOB_MAX_ATTEMPTS', 5))
+MERGE_JOB_TIMEOUT = int(os.getenv('MERGE_JOB_TIMEOUT', 3 * 3600))            # give up on jobs waiting this long
+MERGE_JOB_EXPIRY = 7 * 24 * 3600                                             # finished jobs stay visible this long
+
+JOB_KEY = 'merge_queue:job:{}'
+MR_JOB_KEY = 'merge_queue:mr:{}'            # mr_id -> job id of its unfinished job
+BRANCH_QUEUE_KEY = 'merge_queue:branch:{}'  # job ids in merge order for a target branch
+BRANCH_LOCK_KEY = 'merge_queue:lock:{}'     # held by the process advancing a branch's head job
+BRANCHES_KEY = 'merge_queue:branches'
+
+FINISHED_STATUSES = {'merged', 'failed', 'cancelled'}
+RUNNING_PIPELINE_STATUSES = {'created', 'waiting_for_resource', 'preparing', 'pending', 'running', 'scheduled'}
+# GitLab answers these while an MR is not mergeable yet (pipeline, rebase, SHA moved); worth another try
+RETRYABLE_MERGE_CODES = {405, 406, 409, 422}
+
+class MergeQueue:
+    """Merge jobs stored in Redis with one FIFO per target branch.
+
+    Only the head job of a branch is worked on, so merges into a branch happen in the order they were
+    requested. Each pass advances a job by one step: rebase when GitLab reports the branch behind,
+    set "merge when pipeline succeeds" while the head pipeline runs, merge otherwise, and wait for the
+    outcome on the next pass. Failed steps are retried with backoff up to MERGE_JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, poll_interval=MERGE_QUEUE_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.project = None
+        self._thread = None
+        self._wakeup = threading.Event()
+
+    def start(self, project):
+        """Start the merge worker thread"""
+        if self._thread is not None:
+            return
+        self.project = project
+        leader_election.register('merge_queue')
+        self._thread = threading.Thread(target=self._run, name='merge-queue', daemon=True)
+        self._thread.start()
+        logger.info(f"Started merge queue worker (every {self.poll_interval}s)")
+
+    def _run(self):
+        while True:
+            try:
+                # Any instance enqueues; only the leader advances jobs
+                if leader_election.is_leader('merge_queue'):
+                    self.process_once()
+            except Exception as e:
+                logger.error(f"Error processing merge queue: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _save(self, job, **changes):
+        job.update(changes, updated_at=time.time())
+        expiry = MERGE_JOB_EXPIRY if job['status'] in FINISHED_STATUSES else None
+        redis_client.set(JOB_KEY.format(job['id']), json.dumps(job), ex=expiry)
+        return job
+
+    def get_job(self, job_id):
+        """A job dict by id, or None when unknown or Redis is unavailable"""
+        if not redis_available():
+            return None
+        try:
+            data = redis_client.get(JOB_KEY.format(job_id))
+            return json.loads(data) if data else None
+        except redis.RedisError as e:
+            logger.error(f"Error reading merge job {job_id}: {e}")
+            return None
+
+    def enqueue(self, mr_id, target_branch, requested_by=None):
+        """Queue a merge of an MR, returning its job (the existing one if the MR is already queued).
+
+        Returns None when Redis is unavailable.
+        """
+        if not redis_available():
+            return None
+        job = {
+            'id': uuid.uuid4().hex,
+            'mr_id': mr_id,
+            'target_branch': target_branch,
+            'status': 'queued',
+            'message': 'Waiting for earlier merges into the target branch',
+            'attempts': 0,
+            'requested_by': requested_by,
+            'created_at': time.time(),
+            'next_attempt_at': 0
+        }
+        try:
+            # One unfinished job per MR, even when the button is pressed twice
+            if not redis_client.set(MR_JOB_KEY.format(mr_id), job['id'], nx=True):
+                existing_id = redis_client.get(MR_JOB_KEY.format(mr_id))
+                existing = self.get_job(existing_id.decode()) if existing_id else None
+                if existing is not None and existing['status'] not in FINISHED_STATUSES:
+                    return existing
+                redis_client.set(MR_JOB_KEY.format(mr_id), job['id'])
+            self._save(job)
+            pipeline = redis_client.pipeline()
+            pipeline.rpush(BRANCH_QUEUE_KEY.format(target_branch), job['id'])
+            pipeline.sadd(BRANCHES_KEY, target_branch)
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"Error queueing merge of MR {mr_id}: {e}")
+            return None
+        self._wakeup.set()
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started merging; returns the job or None if it cannot be cancelled"""
+        job = self.get_job(job_id)
+        if job is None or job['status'] != 'queued':
+            return None
+        self._finish(job, 'cancelled', 'Cancelled before merging')
+        return job
+
+    def queue(self):
+        """Unfinished jobs per target branch, in merge order"""
+        if not redis_available():
+            return {}
+        queues = {}
+        try:
+            for branch in sorted(b.decode() for b in redis_client.smembers(BRANCHES_KEY)):
+                job_ids = [job_id.decode() for job_id in redis_client.lrange(BRANCH_QUEUE_KEY.format(branch), 0, -1)]
+                jobs = [self.get_job(job_id) for job_id in job_ids]
+                queues[branch] = [job for job in jobs if job is not None]
+        except redis.RedisError as e:
+            logger.error(f"Error reading merge queue: {e}")
+        return queues
+
+    def _finish(self, job, status, message):
+        self._save(job, status=status, message=message)
+        pipeline = redis_client.pipeline()
+        pipeline.lrem(BRANCH_QUEUE_KEY.format(job['target_branch']), 0, job['id'])
+        # Only clear the MR's pointer if it still refers to this job
+        if (redis_client.get(MR_JOB_KEY.format(job['mr_id'])) or b'').decode() == job['id']:
+            pipeline.delete(MR_JOB_KEY.format(job['mr_id']))
+        pipeline.execute()
+        logger.info(f"Merge job {job['id']} for MR {job['mr_id']}: {status} ({message})")
+
+    def process_once(self):
+        """Advance the head job of every target branch by one step"""
+        if self.project is None or not redis_available():
+            return
+        for branch in [b.decode() for b in redis_client.smembers(BRANCHES_KEY)]:
+            # Another process may be advancing this branch; its lock expires if that process dies
+            lock = redis_client.lock(BRANCH_LOCK_KEY.format(branch), timeout=300, blocking=False)
+            if not lock.acquire():
+                continue
+            try:
+                self._process_branch(branch)
+            finally:
+                try:
+                    lock.release()
+                except redis.exceptions.LockError:
+                    pass
+
+    def _process_branch(self, branch):
+        while True:
+            job_id = redis_client.lindex(BRANCH_QUEUE_KEY.format(branch), 0)
+            if job_id is None:
+                redis_client.srem(BRANCHES_KEY, branch)
+                return
+            job = self.get_job(job_id.decode())
+            if job is None or job['status'] in FINISHED_STATUSES:
+                redis_client.lrem(BRANCH_QUEUE_KEY.format(branch), 0, job_id)
+                continue
+            if time.time() >= job.get('next_attempt_at', 0):
+                self.advance(job)
+            if job['status'] not in FINISHED_STATUSES:
+                return      # later jobs wait for the head of the branch
+
+    def advance(self, job):
+        """Move a job one step towards merged, retrying failed steps with backoff"""
+        if time.time() - job['created_at'] > MERGE_JOB_TIMEOUT:
+            self._finish(job, 'failed', f"Not merged within {MERGE_JOB_TIMEOUT // 60} minutes")
+            return
+        try:
+            # Merges were asked for by a user, so they do not wait behind the background sync
+            with gitlab_budget.priority('interactive'):
+                self._step(job)
+        except gitlab.exceptions.GitlabError as e:
+            code = getattr(e, 'response_code', None)
+            if code in (401, 403, 404):
+                self._finish(job, 'failed', f"GitLab refused the merge: {e.error_message}")
+            else:
+                self._retry(job, f"GitLab error {code}: {e.error_message}" if code else str(e),
+                            retryable=code is None or code >= 500 or code in RETRYABLE_MERGE_CODES)
+        except Exception as e:
+            self._retry(job, str(e))
+
+    def _retry(self, job, message, retryable=True):
+        attempts = job['attempts'] + 1
+        if not retryable or attempts >= MERGE_JOB_MAX_ATTEMPTS:
+            self._finish(job, 'failed', f"{message} (after {attempts} attempts)")
+            return
+        delay = self.poll_interval * 2 ** attempts
+        self._save(job, attempts=attempts, next_attempt_at=time.time() + delay,
+                   message=f"{message}; retrying in {delay}s")
+        logger.warning(f"Merge job {job['id']} for MR {job['mr_id']} attempt {attempts} failed: {message}")
+
+    def _step(self, job):
+        mr = self.project.mergerequests.get(job['mr_id'], include_rebase_in_progress=True)
+        attributes = mr.attributes
+        if mr.state == 'merged':
+            self._finish(job, 'merged', f"Merged into {job['target_branch']}")
+            return
+        if mr.state != 'opened':
+            self._finish(job, 'failed', f"MR is {mr.state}")
+            return
+        if mr.target_branch != job['target_branch']:
+            self._finish(job, 'failed', f"Target branch changed to {mr.target_branch}; merge it again")
+            return
+
+        if attributes.get('rebase_in_progress'):
+            self._save(job, status='rebasing', message='Rebasing onto the target branch')
+            return
+        if job['status'] == 'rebasing' and attributes.get('merge_error'):
+            self._retry(job, f"Rebase failed: {attributes['merge_error']}", retryable=False)
+            return
+        if attributes.get('has_conflicts'):
+            self._finish(job, 'failed', 'MR has conflicts with the target branch')
+            return
+
+        detailed_status = attributes.get('detailed_merge_status')
+        if detailed_status == 'need_rebase':
+            mr.rebase()
+            self._save(job, status='rebasing', message='Rebasing onto the target branch')
+            return
+
+        pipeline_status = (attributes.get('head_pipeline') or {}).get('status')
+        if attributes.get('merge_when_pipeline_succeeds'):
+            # GitLab merges by itself once the pipeline passes
+            if pipeline_status == 'failed':
+                self._finish(job, 'failed', 'Head pipeline failed')
+            else:
+                self._save(job, status='waiting_for_pipeline', message='Merging when the pipeline succeeds')
+            return
+        if pipeline_status in RUNNING_PIPELINE_STATUSES or detailed_status == 'ci_still_running':
+            mr.merge(merge_when_pipeline_succeeds=True)
+            self._save(job, status='waiting_for_pipeline', message='Merging when the pipeline succeeds')
+            return
+
+        self._save(job, status='merging', message='Merging')
+        mr.merge()
+        if mr.state == 'merged':
+            self._finish(job, 'merged', f"Merged into {job['target_branch']}")
+
+# Global merge queue instance
+merge_queue = MergeQueue()
@@ -0,0 +1,149 @@
+"""
+Metrics Module for GitLab MR Manager
+Prometheus metrics for request latency, GitLab API calls, cache hits, sync lag, snapshot size and stage counts
+"""
+
+import os
+import re
+import time
+import threading
+import logging
+from urllib.parse import urlsplit
+from flask import request, g
+
+# prometheus_client is optional; without it recording is a no-op and /metrics answers 503
+try:
+    from prometheus_client import (Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST,
+                                   generate_latest, multiprocess)
+    from prometheus_client.core import GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Set (to an empty directory, cleared on deploy) to aggregate metrics across gunicorn worker processes
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# Numeric path segments and branch-like refs collapse into placeholders so label values stay bounded
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+_REF_SEGMENT = re.compile(r'/(repository/(?:branches|commits|files))/[^/]+')
+
+if PROMETHEUS_AVAILABLE:
+    REQUEST_LATENCY = Histogram(
+        'mr_manager_request_duration_seconds', 'HTTP request latency by route',
+        ['method', 'route', 'status'],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    )
+    GITLAB_CALLS = Counter(
+        'mr_manager_gitlab_requests_total', 'GitLab API calls by endpoint and status code',
+        ['method', 'endpoint', 'status']
+    )
+    GITLAB_LATENCY = Histogram(
+        'mr_manager_gitlab_request_duration_seconds', 'GitLab API call latency by endpoint',
+        ['method', 'endpoint'],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    )
+    CACHE_LOOKUPS = Counter(
+        'mr_manager_cache_lookups_total', 'Cache lookups by cache and result',
+        ['cache', 'result']
+    )
+
+def gitlab_endpoint(url):
+    """API path of a GitLab URL with ids replaced, e.g. '/projects/:id/merge_requests/:id/changes'"""
+    path = urlsplit(url).path
+    if '/api/v4' in path:
+        path = path[path.index('/api/v4') + len('/api/v4'):]
+    path = _REF_SEGMENT.sub(r'/\1/:ref', path)
+    return _ID_SEGMENT.sub('/:id', path) or '/'
+
+def observe_gitlab_call(method, url, status, seconds):
+    """Count one GitLab API call; status is the HTTP status code or 'error' when no response came back"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    endpoint = gitlab_endpoint(url)
+    GITLAB_CALLS.labels(method.upper(), endpoint, str(status)).inc()
+    GITLAB_LATENCY.labels(method.upper(), endpoint).observe(seconds)
+
+def count_cache_lookups(cache, hits, misses):
+    """Count cache hits and misses; the hit ratio is hits / (hits + misses)"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    if hits:
+        CACHE_LOOKUPS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, 'miss').inc(misses)
+
+class AppStateCollector:
+    """Values read from the scraped process at scrape time: sync lag, snapshot size and MR stage counts"""
+
+    def collect(self):
+        from sync import mr_sync
+        from search import search_index
+        from snapshot import MR_SNAPSHOT_PATH
+
+        lag = GaugeMetricFamily('mr_manager_sync_lag_seconds', 'Seconds since the last completed MR sync')
+        if mr_sync.last_sync is not None:
+            lag.add_metric([], time.time() - mr_sync.last_sync)
+        yield lag
+
+        snapshot = GaugeMetricFamily('mr_manager_snapshot_bytes', 'Size of the on-disk MR snapshot')
+        if os.path.exists(MR_SNAPSHOT_PATH):
+            snapshot.add_metric([], os.path.getsize(MR_SNAPSHOT_PATH))
+        yield snapshot
+
+        indexed = GaugeMetricFamily('mr_manager_indexed_mrs', 'MRs held in the search index')
+        indexed.add_metric([], len(search_index))
+        yield indexed
+
+        counts = {'open': 0, 'to_be_reviewed': 0, 'reviewed': 0, 'good_to_merge': 0}
+        for mr in search_index.matching():
+            if mr.state == 'opened':
+                counts['open'] += 1
+                if mr.stage in counts:
+                    counts[mr.stage] += 1
+        stages = GaugeMetricFamily('mr_manager_open_mrs', 'Open MRs by review stage', labels=['stage'])
+        for stage, count in counts.items():
+            stages.add_metric([stage], count)
+        yield stages
+
+def _scrape_registry():
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Sum the metric files every worker writes; this process's own registry would only hold its share
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    registry.register(AppStateCollector())
+    return registry
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def metrics_response():
+    """(body, status, headers) of the Prometheus text exposition"""
+    global _registry
+    if not PROMETHEUS_AVAILABLE:
+        return 'prometheus_client is not installed\n', 503, {'Content-Type': 'text/plain'}
+    with _registry_lock:
+        if _registry is None:
+            _registry = _scrape_registry()
+    return generate_latest(_registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
+def init_app(app):
+    """Observe the latency of every request by route"""
+    if not PROMETHEUS_AVAILABLE:
+        logger.info("prometheus_client not installed, /metrics disabled")
+        return
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(time.perf_counter() - started)
+        return response
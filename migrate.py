@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Migration Script for GitLab MR Manager
+Creates the MongoDB indexes once per schema version instead of on every worker start
+"""
+
+import sys
+from database import db_manager, SCHEMA_VERSION
+
+def main():
+    print("🔄 Connecting to MongoDB...")
+    if not db_manager.wait_until_connected(timeout=30):
+        print("❌ Could not connect to MongoDB")
+        return 1
+
+    print(f"🔄 Creating indexes for schema version {SCHEMA_VERSION}...")
+    if not db_manager.create_indexes():
+        print("❌ Index creation failed")
+        return 1
+
+    print("✅ Database is up to date")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Mirror Scheduler Module for GitLab MR Manager
+Keeps a bare mirror at GITLAB_REPO_PATH current by fetching only the refs of open MRs and their target branches
+"""
+
+import os
+import re
+import base64
+import threading
+import logging
+from git_engine import GITLAB_REPO_PATH, run_git_command, git_engine
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+GITLAB_MIRROR_ENABLED = os.getenv('GITLAB_MIRROR_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+GITLAB_MIRROR_FETCH_TIMEOUT = int(os.getenv('GITLAB_MIRROR_FETCH_TIMEOUT', 600))
+MAX_REFSPECS_PER_FETCH = 500
+
+def mr_ref(mr_id):
+    """Ref GitLab publishes for an MR head"""
+    return f"refs/merge-requests/{mr_id}/head"
+
+class MirrorScheduler:
+    """Fetch scheduler fed by the MR sync.
+
+    Each cycle runs one `git fetch` covering the heads of MRs whose updated_at changed plus the
+    target branches of open MRs, and deletes the refs of MRs that closed in one `update-ref --stdin`.
+    A merge moves its target branch, so a merged MR alone is enough to refetch the target branches.
+    """
+
+    retry_interval = 300  # seconds before a failed fetch is retried without new MR changes
+
+    def __init__(self, repo_path=GITLAB_REPO_PATH):
+        self.repo_path = repo_path
+        self.remote_url = None
+        self.token = None
+        self._dirty = set()             # MR ids whose head ref must be fetched
+        self._closed = set()            # MR ids whose head ref must be deleted
+        self._moved_branches = set()    # target branches that MRs were merged into
+        self._target_branches = {}      # mr_id -> target branch of open MRs
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, project, token):
+        """Create the mirror if needed and start the fetch thread"""
+        if self._thread is not None:
+            return
+        self.remote_url = project.http_url_to_repo
+        self.token = token
+        self._thread = threading.Thread(target=self._run, name='mirror-fetch', daemon=True)
+        self._thread.start()
+        logger.info(f"Started mirror fetch scheduler for {self.repo_path}")
+
+    def on_sync(self, changed, closed_ids):
+        """MR sync listener: queue changed heads and closed MRs for the next fetch cycle"""
+        with self._lock:
+            for doc in changed:
+                if doc['state'] == 'merged':
+                    self._moved_branches.add(doc['target_branch'])
+                if doc['state'] != 'opened':
+                    continue
+                self._dirty.add(doc['mr_id'])
+                self._closed.discard(doc['mr_id'])
+                self._target_branches[doc['mr_id']] = doc['target_branch']
+            for mr_id in closed_ids:
+                self._dirty.discard(mr_id)
+                self._closed.add(mr_id)
+                self._target_branches.pop(mr_id, None)
+        if changed or closed_ids:
+            self._wakeup.set()
+
+    def _git(self, command, **kwargs):
+        """Run git against the mirror with the GitLab token passed through the environment.
+
+        The token is never written to the mirror's config and never appears on the command line,
+        where other local users could read it from the process list.
+        """
+        credentials = base64.b64encode(f"oauth2:{self.token}".encode()).decode()
+        env = {
+            'GIT_CONFIG_COUNT': '1',
+            'GIT_CONFIG_KEY_0': 'http.extraHeader',
+            'GIT_CONFIG_VALUE_0': f"Authorization: Basic {credentials}"
+        }
+        return run_git_command(command, self.repo_path, env=env, **kwargs)
+
+    def _fetch(self, refspecs):
+        """One fetch for all refspecs, retried without refs that vanished upstream (e.g. a deleted branch)"""
+        stdout, stderr, returncode = self._git(['fetch', '--quiet', '--no-tags', 'origin'] + refspecs,
+                                               timeout=GITLAB_MIRROR_FETCH_TIMEOUT)
+        missing = set(re.findall(r"couldn't find remote ref (\S+)", stderr))
+        if returncode != 0 and missing:
+            refspecs = [spec for spec in refspecs if spec.lstrip('+').split(':')[0] not in missing]
+            logger.info(f"Skipping {len(missing)} refs missing upstream: {', '.join(sorted(missing))}")
+            if refspecs:
+                return self._fetch(refspecs)
+            return stdout, '', 0
+        return stdout, stderr, returncode
+
+    def ensure_mirror(self):
+        """Initialize a bare repository with the project remote if the path is empty"""
+        if os.path.isdir(os.path.join(self.repo_path, 'objects')) or os.path.isdir(os.path.join(self.repo_path, '.git')):
+            return True
+        os.makedirs(self.repo_path, exist_ok=True)
+        _, stderr, returncode = run_git_command(['init', '--bare', '--quiet'], self.repo_path)
+        if returncode != 0:
+            logger.error(f"Could not initialize mirror at {self.repo_path}: {stderr}")
+            return False
+        run_git_command(['remote', 'add', 'origin', self.remote_url], self.repo_path)
+        git_engine.invalidate()
+        logger.info(f"Initialized bare mirror at {self.repo_path}")
+        return True
+
+    def _run(self):
+        if not self.ensure_mirror():
+            return
+        while True:
+            self._wakeup.wait(self.retry_interval)
+            self._wakeup.clear()
+            try:
+                self.fetch_cycle()
+            except Exception as e:
+                logger.error(f"Error in mirror fetch cycle: {e}")
+
+    def fetch_cycle(self):
+        """Fetch queued MR heads and target branches, then prune closed MR refs"""
+        with self._lock:
+            dirty, self._dirty = sorted(self._dirty), set()
+            closed, self._closed = sorted(self._closed), set()
+            moved, self._moved_branches = self._moved_branches, set()
+            branches = sorted(set(self._target_branches.values()) | moved)
+
+        if dirty or moved:
+            refspecs = [f"+refs/heads/{branch}:refs/heads/{branch}" for branch in branches]
+            refspecs += [f"+{mr_ref(mr_id)}:{mr_ref(mr_id)}" for mr_id in dirty]
+            for start in range(0, len(refspecs), MAX_REFSPECS_PER_FETCH):
+                chunk = refspecs[start:start + MAX_REFSPECS_PER_FETCH]
+                _, stderr, returncode = self._fetch(chunk)
+                if returncode != 0:
+                    logger.error(f"Mirror fetch failed: {stderr}")
+                    with self._lock:
+                        self._dirty.update(dirty)  # retry on the next cycle
+                        self._moved_branches.update(moved)
+                    break
+            else:
+                logger.info(f"Mirror fetched {len(dirty)} MR heads and {len(branches)} target branches")
+
+        if closed:
+            commands = ''.join(f"delete {mr_ref(mr_id)}\n" for mr_id in closed)
+            _, stderr, returncode = run_git_command(['update-ref', '--stdin'], self.repo_path, input=commands)
+            if returncode != 0:
+                logger.error(f"Mirror prune failed: {stderr}")
+            else:
+                logger.info(f"Mirror pruned {len(closed)} closed MR refs")
+
+# Global mirror scheduler instance
+mirror_scheduler = MirrorScheduler()
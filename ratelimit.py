@@ -0,0 +1,258 @@
+"""
+Rate Limit Module for GitLab MR Manager
+Cluster-wide token-bucket budget for GitLab API calls, shared through Redis, with priority classes and GitLab's RateLimit headers
+"""
+
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+import redis
+import requests
+from flask import has_request_context
+from cache import redis_client, redis_available
+from timing import record
+from metrics import observe_gitlab_call
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+GITLAB_RATE_LIMIT = int(os.getenv('GITLAB_RATE_LIMIT', 600))              # API calls per minute for all processes
+GITLAB_RATE_BURST = int(os.getenv('GITLAB_RATE_BURST', GITLAB_RATE_LIMIT // 4))
+GITLAB_BACKGROUND_RESERVE = float(os.getenv('GITLAB_BACKGROUND_RESERVE', 0.25))  # share of the bucket kept for interactive calls
+
+# Priority class -> (share of the bucket it may not touch, longest wait for a token in seconds)
+PRIORITIES = {
+    'interactive': (0.0, 10),
+    'background': (GITLAB_BACKGROUND_RESERVE, 300)
+}
+
+BUCKET_KEY = 'gitlab_budget:bucket'
+PAUSED_KEY = 'gitlab_budget:paused_until'
+SERVER_KEY = 'gitlab_budget:server'
+STATS_KEY = 'gitlab_budget:stats'
+
+# Take one token unless that would leave fewer than the caller's reserve; returns the seconds to wait otherwise
+_TAKE_SCRIPT = """
+local capacity, rate, now, reserve = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local paused_until = tonumber(redis.call('GET', KEYS[2]) or '0')
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if now < paused_until then
+    wait = paused_until - now
+elseif tokens - 1 >= reserve then
+    tokens = tokens - 1
+else
+    wait = (reserve + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 3600)
+return {tostring(wait), tostring(tokens)}
+"""
+
+# Lower the bucket to what GitLab says is left; GitLab's own count includes clients outside this app
+_OBSERVE_SCRIPT = """
+local remaining, now = tonumber(ARGV[1]), tonumber(ARGV[2])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or ARGV[3])
+if remaining < tokens then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(remaining), 'ts', tostring(now))
+end
+return 1
+"""
+
+class BudgetExceeded(requests.exceptions.RequestException):
+    """No GitLab API budget became available within the caller's priority class wait limit"""
+
+class GitLabBudget:
+    """Token bucket refilled at GITLAB_RATE_LIMIT calls per minute, shared by every process through Redis.
+
+    Calls are interactive inside a Flask request and background otherwise. Background calls leave a
+    reserve of the bucket untouched so user actions still go through while the sync is busy. GitLab's
+    RateLimit-Remaining header can only lower the bucket, and a 429 or an exhausted limit pauses every
+    caller until GitLab's reset time. Without Redis each process keeps a local bucket.
+    """
+
+    def __init__(self, rate_per_minute=GITLAB_RATE_LIMIT, burst=GITLAB_RATE_BURST):
+        self.capacity = max(burst, 1)
+        self.rate = rate_per_minute / 60.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tokens = float(self.capacity)     # local bucket used while Redis is down
+        self._updated = time.time()
+        self._paused_until = 0
+        self._take = redis_client.register_script(_TAKE_SCRIPT)
+        self._observe = redis_client.register_script(_OBSERVE_SCRIPT)
+
+    @contextmanager
+    def priority(self, name):
+        """Run GitLab calls made by this thread inside the block in a priority class"""
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = name
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def current_priority(self):
+        """Priority class of GitLab calls made by this thread"""
+        name = getattr(self._local, 'priority', None)
+        if name is not None:
+            return name
+        return 'interactive' if has_request_context() else 'background'
+
+    def _take_local(self, reserve, now):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens - 1 >= reserve:
+                self._tokens -= 1
+                return 0
+            return (reserve + 1 - self._tokens) / self.rate
+
+    def _try_take(self, reserve):
+        """Take a token, returning 0 or the seconds to wait before trying again"""
+        now = time.time()
+        if redis_available():
+            try:
+                wait, _ = self._take(keys=[BUCKET_KEY, PAUSED_KEY], args=[self.capacity, self.rate, now, reserve])
+                return float(wait)
+            except redis.RedisError as e:
+                logger.warning(f"GitLab budget falling back to a local bucket: {e}")
+        return self._take_local(reserve, now)
+
+    def acquire(self):
+        """Block until the current priority class may make one GitLab call; raises BudgetExceeded on timeout"""
+        priority = self.current_priority()
+        reserve_share, max_wait = PRIORITIES.get(priority, PRIORITIES['background'])
+        reserve = self.capacity * reserve_share
+        started = time.time()
+        while True:
+            wait = self._try_take(reserve)
+            if wait <= 0:
+                waited = time.time() - started
+                self._count(priority, 'granted', waited)
+                return waited
+            if time.time() - started + wait > max_wait:
+                self._count(priority, 'denied')
+                raise BudgetExceeded(f"No GitLab API budget for {priority} calls within {max_wait}s")
+            time.sleep(min(wait, 1.0))
+
+    def observe(self, response):
+        """Fold GitLab's rate limit headers and 429 responses into the shared budget"""
+        headers = response.headers
+        now = time.time()
+        remaining = headers.get('RateLimit-Remaining')
+        reset = headers.get('RateLimit-Reset')
+        paused_until = None
+        if response.status_code == 429:
+            retry_after = headers.get('Retry-After')
+            paused_until = now + (float(retry_after) if retry_after and retry_after.isdigit() else 60)
+        elif remaining is not None and int(remaining) <= 0 and reset:
+            paused_until = float(reset)
+
+        if not redis_available():
+            with self._lock:
+                if remaining is not None:
+                    self._tokens = min(self._tokens, float(remaining))
+                if paused_until:
+                    self._paused_until = max(self._paused_until, paused_until)
+            return
+        try:
+            if remaining is not None:
+                self._observe(keys=[BUCKET_KEY], args=[int(remaining), now, self.capacity])
+                redis_client.hset(SERVER_KEY, mapping={
+                    'limit': headers.get('RateLimit-Limit', ''), 'remaining': remaining,
+                    'reset': reset or '', 'observed_at': now
+                })
+            if paused_until:
+                redis_client.set(PAUSED_KEY, paused_until, ex=max(int(paused_until - now) + 1, 1))
+                logger.warning(f"GitLab rate limit reached, pausing API calls for {paused_until - now:.0f}s")
+            if response.status_code == 429:
+                redis_client.hincrby(STATS_KEY, 'rate_limited', 1)
+        except redis.RedisError as e:
+            logger.error(f"Error recording GitLab rate limit headers: {e}")
+
+    def _count(self, priority, outcome, waited=0):
+        if not redis_available():
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.hincrby(STATS_KEY, f"{priority}:{outcome}", 1)
+            if waited:
+                pipeline.hincrbyfloat(STATS_KEY, f"{priority}:waited_seconds", round(waited, 3))
+            pipeline.execute()
+        except redis.RedisError:
+            pass
+
+    def status(self):
+        """Current budget, last GitLab rate limit headers and per-priority counters"""
+        info = {
+            'capacity': self.capacity,
+            'refill_per_minute': round(self.rate * 60, 2),
+            'priorities': {name: {'reserve': round(self.capacity * share, 2), 'max_wait_seconds': max_wait}
+                           for name, (share, max_wait) in PRIORITIES.items()},
+            'shared': redis_available()
+        }
+        now = time.time()
+        if not info['shared']:
+            with self._lock:
+                tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                info.update(tokens=round(tokens, 2), paused_for_seconds=max(round(self._paused_until - now), 0))
+            return info
+        try:
+            tokens, updated = redis_client.hmget(BUCKET_KEY, 'tokens', 'ts')
+            tokens = float(tokens) if tokens is not None else self.capacity
+            if updated is not None:
+                tokens = min(self.capacity, tokens + (now - float(updated)) * self.rate)
+            paused_until = float(redis_client.get(PAUSED_KEY) or 0)
+            info.update(
+                tokens=round(tokens, 2),
+                paused_for_seconds=max(round(paused_until - now), 0),
+                gitlab={k.decode(): v.decode() for k, v in redis_client.hgetall(SERVER_KEY).items()},
+                stats={k.decode(): float(v) for k, v in redis_client.hgetall(STATS_KEY).items()}
+            )
+        except redis.RedisError as e:
+            info['error'] = str(e)
+        return info
+
+class BudgetedSession(requests.Session):
+    """requests session for python-gitlab that takes a budget token before every GitLab call and,
+    given a circuit breaker, reports each call's outcome to it"""
+
+    def __init__(self, budget, breaker=None):
+        super().__init__()
+        self.budget = budget
+        self.breaker = breaker
+
+    def request(self, method, url, *args, **kwargs):
+        if self.breaker is not None:
+            self.breaker.before_call()
+        waited = self.budget.acquire()
+        started = time.time()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException as e:
+            observe_gitlab_call(method, url, 'error', time.time() - started)
+            if self.breaker is not None:
+                self.breaker.record_failure(e)
+            raise
+        finally:
+            # Time spent waiting for budget counts towards the request's GitLab time
+            record('gitlab', waited + time.time() - started)
+        observe_gitlab_call(method, url, response.status_code, time.time() - started)
+        self.budget.observe(response)
+        if self.breaker is not None:
+            if response.status_code >= 500:
+                self.breaker.record_failure(f"GitLab returned {response.status_code}")
+            else:
+                self.breaker.record_success(time.time() - started)
+        return response
+
+# Global GitLab API budget instance
+gitlab_budget = GitLabBudget()
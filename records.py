@@ -0,0 +1,176 @@
+"""
+MR Records Module for GitLab MR Manager
+Compact slotted MR records for in-process MR lists, with conversion to the template and JSON shapes
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from stages import mr_stage
+
+# Identical label/user combinations share one tuple across all records
+_shared_tuples = {}
+
+def _intern(value):
+    return sys.intern(value) if value else value
+
+def _intern_tuple(values):
+    """Tuple of interned strings, shared with every record holding the same values"""
+    key = tuple(_intern(value) for value in values or ())
+    return _shared_tuples.setdefault(key, key)
+
+def _username(user):
+    if not user:
+        return 'Unknown'
+    return user.get('username', user.get('name', 'Unknown'))
+
+def to_timestamp(value):
+    """GitLab ISO timestamp to integer epoch seconds (0 when missing)"""
+    if not value:
+        return 0
+    return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+
+def _date(timestamp):
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp)) if timestamp else 'Unknown'
+
+def _iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp)) if timestamp else None
+
+@dataclass
+class MRRecord:
+    """One MR in about a third of the memory of its dict: no per-instance __dict__, interned usernames,
+    branches and labels, shared label/user tuples and integer timestamps."""
+
+    __slots__ = ('id', 'title', 'author', 'state', 'stage', 'labels', 'reviewers', 'assignees', 'source_branch',
+                 'target_branch', 'sha', 'web_url', 'created_at', 'updated_at', 'merged_at', 'merged_by',
+                 'closed_at', 'closed_by')
+
+    id: int
+    title: str
+    author: str
+    state: str
+    stage: str
+    labels: tuple
+    reviewers: tuple
+    assignees: tuple
+    source_branch: str
+    target_branch: str
+    sha: str
+    web_url: str
+    created_at: int
+    updated_at: int
+    merged_at: int
+    merged_by: str
+    closed_at: int
+    closed_by: str
+
+    @classmethod
+    def create(cls, mr_id, title, author, state, labels, reviewers, assignees, source_branch, target_branch, sha,
+               web_url, created_at, updated_at, merged_at=None, merged_by=None, closed_at=None, closed_by=None):
+        """Build a record from plain values, interning repeated strings and parsing timestamps"""
+        labels = _intern_tuple(labels)
+        return cls(mr_id, title, _intern(author), _intern(state), mr_stage(labels) if state == 'opened' else None,
+                   labels, _intern_tuple(reviewers), _intern_tuple(assignees), _intern(source_branch),
+                   _intern(target_branch), sha, web_url, to_timestamp(created_at), to_timestamp(updated_at),
+                   to_timestamp(merged_at), _intern(merged_by), to_timestamp(closed_at), _intern(closed_by))
+
+    @classmethod
+    def from_json(cls, data):
+        """Record for an MR as returned by the GitLab merge request list API"""
+        reviewers = []
+        if data.get('reviewers'):
+            reviewers = [_username(r) for r in data['reviewers'] if _username(r) != 'Unknown']
+        elif data.get('approved_by'):
+            # For merged MRs, use people who have already reviewed
+            reviewers = [a.get('user', {}).get('username', 'Unknown') for a in data['approved_by']]
+            reviewers = [r for r in reviewers if r != 'Unknown']
+        merged_by, closed_by = data.get('merged_by'), data.get('closed_by')
+        return cls.create(
+            data['iid'], data['title'], _username(data.get('author')), data['state'], data.get('labels'), reviewers,
+            [_username(a) for a in (data.get('assignees') or [])], data.get('source_branch'),
+            data.get('target_branch'), data.get('sha'), data.get('web_url'), data.get('created_at'),
+            data.get('updated_at'),
+            merged_at=data.get('merged_at'), merged_by=_username(merged_by) if merged_by else None,
+            closed_at=data.get('closed_at'), closed_by=_username(closed_by) if closed_by else None
+        )
+
+    @classmethod
+    def from_gitlab(cls, mr):
+        """Record for a python-gitlab MR object"""
+        return cls.from_json(mr.attributes)
+
+    @classmethod
+    def from_document(cls, doc):
+        """Record for an MR sync document"""
+        return cls.create(
+            doc['mr_id'], doc['title'], doc['author'], doc['state'], doc.get('labels'), doc.get('reviewers'),
+            doc.get('assignees'), doc.get('source_branch'), doc.get('target_branch'), doc.get('sha'),
+            doc.get('web_url'), doc.get('created_at'), doc.get('updated_at'),
+            merged_at=doc.get('merged_at'), closed_at=doc.get('closed_at')
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """Record for a row written by to_row()"""
+        (mr_id, title, author, state, stage, labels, reviewers, assignees, source_branch, target_branch, sha,
+         web_url, created_at, updated_at, merged_at, merged_by, closed_at, closed_by) = row
+        return cls(mr_id, title, _intern(author), _intern(state), _intern(stage), _intern_tuple(labels),
+                   _intern_tuple(reviewers), _intern_tuple(assignees), _intern(source_branch),
+                   _intern(target_branch), sha, web_url, created_at, updated_at, merged_at, _intern(merged_by),
+                   closed_at, _intern(closed_by))
+
+    def to_row(self):
+        """Compact list form for snapshot files"""
+        return [self.id, self.title, self.author, self.state, self.stage, self.labels, self.reviewers, self.assignees,
+                self.source_branch, self.target_branch, self.sha, self.web_url, self.created_at, self.updated_at,
+                self.merged_at, self.merged_by, self.closed_at, self.closed_by]
+
+    def get(self, name, default=None):
+        """Dict-style read access so list filters work on records and MR dicts alike"""
+        return getattr(self, name, default)
+
+    def to_template(self):
+        """MR dict in the shape the page templates expect (dates without time, mutable for enrichers)"""
+        mr = {
+            'id': self.id,
+            'title': self.title,
+            'author': self.author,
+            'created_at': _date(self.created_at),
+            'updated_at': _date(self.updated_at),
+            'updated_ts': self.updated_at,
+            'labels': list(self.labels),
+            'assignees': list(self.assignees),
+            'reviewers': list(self.reviewers),
+            'state': self.state,
+            'web_url': self.web_url,
+            'source_branch': self.source_branch,
+            'target_branch': self.target_branch,
+            'sha': self.sha
+        }
+        if self.merged_at:
+            mr['merged_at'] = _date(self.merged_at)
+            mr['merged_by'] = self.merged_by or 'Unknown'
+        if self.closed_at:
+            mr['closed_at'] = _date(self.closed_at)
+            mr['closed_by'] = self.closed_by or 'Unknown'
+        return mr
+
+    def to_json(self):
+        """MR dict for API responses with full UTC timestamps"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'author': self.author,
+            'state': self.state,
+            'stage': self.stage,
+            'labels': list(self.labels),
+            'reviewers': list(self.reviewers),
+            'source_branch': self.source_branch,
+            'target_branch': self.target_branch,
+            'sha': self.sha,
+            'web_url': self.web_url,
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+            'merged_at': _iso(self.merged_at)
+        }
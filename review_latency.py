@@ -0,0 +1,198 @@
+"""
+Review Latency Module for GitLab MR Manager
+Ingests GitLab resource label events per MR into review-stage transition timestamps and reports latency percentiles
+"""
+
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from database import get_review_cycles_collection
+from stages import mr_stage, GOOD_TO_MERGE_LABELS
+from analytics import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PER_PAGE = 100
+REVIEW_LABELS = set(GOOD_TO_MERGE_LABELS)
+PERCENTILES = (50, 75, 90, 95)
+
+# Latency metric -> (hours field, field naming the user who completed the step)
+LATENCY_METRICS = {
+    'ready_to_reviewed': ('ready_to_reviewed_hours', 'reviewed_by'),
+    'reviewed_to_good_to_merge': ('reviewed_to_gtm_hours', 'gtm_by')
+}
+
+def _hours_between(start, end):
+    return round((parse_timestamp(end) - parse_timestamp(start)).total_seconds() / 3600, 2)
+
+def apply_label_events(record, events):
+    """Replay label events (oldest first) onto an MR's review-cycle record.
+
+    Only review labels matter. Latencies are measured for the first completed cycle: from the last
+    time the MR became ready for review to its first review, and from then to Good To Merge.
+    """
+    labels = set(record.get('labels', []))
+    stage = record.get('stage')
+    entered = record.setdefault('stage_entered', {})
+    transitions = record.setdefault('transitions', [])
+
+    for event in events:
+        record['last_event_id'] = max(record.get('last_event_id', 0), event.id)
+        name = ((event.label or {}).get('name') or '').lower()
+        if name not in REVIEW_LABELS:
+            continue
+        if event.action == 'add':
+            labels.add(name)
+        elif event.action == 'remove':
+            labels.discard(name)
+
+        new_stage = mr_stage(labels)
+        if new_stage == stage:
+            continue
+        at = event.created_at
+        user = (event.user or {}).get('username')
+        transitions.append({'stage': new_stage, 'at': at, 'by': user})
+
+        if stage == 'to_be_reviewed' and new_stage in ('reviewed', 'good_to_merge') \
+                and record.get('ready_to_reviewed_hours') is None:
+            record['reviewed_at'] = at
+            record['reviewed_by'] = user
+            record['ready_to_reviewed_hours'] = _hours_between(entered['to_be_reviewed'], at)
+        if new_stage == 'good_to_merge' and record.get('reviewed_at') and record.get('reviewed_to_gtm_hours') is None:
+            record['good_to_merge_at'] = at
+            record['gtm_by'] = user
+            record['reviewed_to_gtm_hours'] = _hours_between(record['reviewed_at'], at)
+
+        if new_stage:
+            entered[new_stage] = at
+        stage = new_stage
+
+    record['labels'] = sorted(labels)
+    record['stage'] = stage
+    return record
+
+class LabelEventIngester:
+    """Sync listener and worker pool fetching only the label events each changed MR gained since its cursor.
+
+    The cursor of an MR is the newest event id applied plus the number of events seen, which lets the
+    next ingestion start at the page holding the first new event instead of paging the whole history.
+    """
+
+    max_workers = 8
+
+    def __init__(self):
+        self.project = None
+        self._queue = {}        # mr_id -> {'author', 'updated_at'} of MRs with possibly new events
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, project):
+        """Attach the GitLab project and start the ingestion thread"""
+        if self._thread is not None:
+            return
+        self.project = project
+        self._thread = threading.Thread(target=self._run, name='label-events', daemon=True)
+        self._thread.start()
+        logger.info("Started label event ingestion worker")
+
+    def on_sync(self, changed, closed_ids):
+        """MR sync listener: label changes bump updated_at, so every changed MR may have new events"""
+        with self._lock:
+            for doc in changed:
+                self._queue[doc['mr_id']] = {'author': doc['author'], 'updated_at': doc['updated_at']}
+        if changed:
+            self._wakeup.set()
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='label-events') as executor:
+            while True:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                try:
+                    self.ingest_queued(executor)
+                except Exception as e:
+                    logger.error(f"Error ingesting label events: {e}")
+
+    def ingest_queued(self, executor):
+        """Ingest every queued MR whose stored record is older than its latest update"""
+        collection = get_review_cycles_collection()
+        if collection is None:
+            return
+        with self._lock:
+            queued, self._queue = self._queue, {}
+        if not queued:
+            return
+
+        records = {record['mr_id']: record for record in
+                   collection.find({'mr_id': {'$in': list(queued)}}, {'_id': 0})}
+        due = [(mr_id, info, records.get(mr_id, {'mr_id': mr_id}))
+               for mr_id, info in queued.items()
+               if records.get(mr_id, {}).get('updated_at') != info['updated_at']]
+        if not due:
+            return
+
+        ingested = sum(executor.map(lambda item: self._ingest_safely(collection, *item), due))
+        logger.info(f"Ingested label events for {ingested} of {len(due)} MRs")
+
+    def _ingest_safely(self, collection, mr_id, info, record):
+        try:
+            self.ingest(collection, mr_id, info, record)
+            return 1
+        except Exception as e:
+            logger.error(f"Error ingesting label events for MR {mr_id}: {e}")
+            with self._lock:
+                self._queue.setdefault(mr_id, info)  # retried with the next sync
+            return 0
+
+    def _new_events(self, mr_id, record):
+        """Label events after the MR's cursor, oldest first"""
+        events_api = self.project.mergerequests.get(mr_id, lazy=True).resourcelabelevents
+        last_event_id = record.get('last_event_id', 0)
+        page = record.get('events_seen', 0) // EVENTS_PER_PAGE + 1
+        events = []
+        while True:
+            batch = events_api.list(page=page, per_page=EVENTS_PER_PAGE, get_all=False)
+            events.extend(event for event in batch if event.id > last_event_id)
+            if len(batch) < EVENTS_PER_PAGE:
+                break
+            page += 1
+        return sorted(events, key=lambda event: event.id)
+
+    def ingest(self, collection, mr_id, info, record):
+        """Apply an MR's new label events and store its record"""
+        events = self._new_events(mr_id, record)
+        apply_label_events(record, events)
+        record['events_seen'] = record.get('events_seen', 0) + len(events)
+        record['author'] = info['author']
+        record['updated_at'] = info['updated_at']
+        collection.update_one({'mr_id': mr_id}, {'$set': record}, upsert=True)
+
+def latency_percentiles(group_by='reviewer', since=None):
+    """Review latency percentiles in hours per reviewer (who completed the step) or per MR author"""
+    collection = get_review_cycles_collection()
+    if collection is None:
+        return {}
+
+    results = {}
+    for metric, (hours_field, user_field) in LATENCY_METRICS.items():
+        key_field = user_field if group_by == 'reviewer' else 'author'
+        match = {hours_field: {'$ne': None}, key_field: {'$ne': None}}
+        if since:
+            match['reviewed_at' if metric == 'ready_to_reviewed' else 'good_to_merge_at'] = {'$gte': since}
+        pipeline = [
+            {'$match': match},
+            {'$sort': {hours_field: 1}},
+            {'$group': {'_id': f"${key_field}", 'hours': {'$push': f"${hours_field}"}}}
+        ]
+        for group in collection.aggregate(pipeline):
+            hours = group['hours']
+            stats = {'count': len(hours)}
+            for percentile in PERCENTILES:
+                # Nearest-rank percentile over the sorted values
+                stats[f"p{percentile}"] = hours[max(0, -(-percentile * len(hours) // 100) - 1)]
+            results.setdefault(group['_id'], {})[metric] = stats
+    return results
+
+# Global label event ingester instance
+label_event_ingester = LabelEventIngester()
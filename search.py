@@ -0,0 +1,282 @@
+"""
+Search Module for GitLab MR Manager
+In-process inverted index with prefix matching over MR titles, descriptions, branches and labels, kept current by the MR sync
+"""
+
+import os
+import re
+import time
+import json
+import base64
+import bisect
+import threading
+import logging
+from database import db_manager, iter_documents
+from snapshot import write_snapshot, read_snapshot
+from stages import in_stage, matches_filters
+from records import MRRecord, to_timestamp
+from leader import leader_election
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+MR_SNAPSHOT_INTERVAL = int(os.getenv('MR_SNAPSHOT_INTERVAL', 300))  # seconds between snapshot writes after syncs
+
+# Sort orders of MR list pages -> (record attribute, descending)
+SORTS = {
+    'updated_desc': ('updated_at', True),
+    'updated_asc': ('updated_at', False),
+    'created_desc': ('created_at', True),
+    'created_asc': ('created_at', False)
+}
+
+def tokenize(text):
+    """Lowercase alphanumeric words of a text; branch names split on / - _ ."""
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+def _document_tokens(doc):
+    tokens = {str(doc['mr_id'])}
+    for field in ('title', 'description', 'source_branch', 'target_branch'):
+        tokens.update(tokenize(doc.get(field)))
+    for label in doc.get('labels') or []:
+        tokens.update(tokenize(label))
+    return tokens
+
+class MRSearchIndex:
+    """Inverted index from words to MR ids with a sorted vocabulary for prefix lookups.
+
+    Every query word matches any indexed word it is a prefix of, and all query words must match (AND).
+    Updates only touch the postings of words that were added to or removed from an MR.
+    """
+
+    def __init__(self):
+        self._docs = {}         # mr_id -> MRRecord used for filters and results (descriptions are only indexed)
+        self._doc_tokens = {}   # mr_id -> words indexed for the MR
+        self._postings = {}     # word -> set of mr_ids
+        self._vocabulary = []   # sorted words
+        self._versions = {}     # mr_id -> index version of its last update
+        self.version = 0        # bumped on every update so clients can ask for changes since a version
+        self._snapshot_version = None
+        self._snapshot_at = 0
+        self.data_as_of = None  # when the newest indexed data was current: snapshot write, MongoDB load or sync
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def get(self, mr_id):
+        """Indexed record of an MR, or None"""
+        return self._docs.get(mr_id)
+
+    def start(self):
+        """Warm the index from the on-disk snapshot, then from MongoDB, in the background"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._warm, name='search-index', daemon=True)
+        self._thread.start()
+
+    def _warm(self):
+        # A preloading server already loaded the snapshot before forking this worker
+        if self.data_as_of is None:
+            self.load_snapshot()
+        # The snapshot may be older than MongoDB; reconcile once MongoDB is reachable
+        db_manager.connected.wait()
+        self.load()
+        # Only the sync leader writes the snapshot; other workers read it
+        if leader_election.is_leader('mr_sync'):
+            self.save_snapshot()
+
+    def load_snapshot(self):
+        """Index the MRs of the snapshot file without tokenizing them again"""
+        started = time.perf_counter()
+        reader = read_snapshot()
+        if reader is None:
+            return 0
+        try:
+            modified_at = reader.modified_at
+            rows = [(MRRecord.from_row(row[:-1]), row[-1]) for row in reader]
+        except Exception as e:
+            logger.error(f"Error reading MR snapshot: {e}")
+            return 0
+        finally:
+            reader.close()
+
+        docs, doc_tokens, postings = {}, {}, {}
+        for record, tokens in rows:
+            docs[record.id] = record
+            doc_tokens[record.id] = tokens = set(tokens)
+            for token in tokens:
+                postings.setdefault(token, set()).add(record.id)
+        with self._lock:
+            if not self._docs:
+                # Nothing synced yet: take the snapshot's structures as they are
+                self._docs, self._doc_tokens, self._postings = docs, doc_tokens, postings
+                self._vocabulary = sorted(postings)
+                self.version += 1
+                self._versions = dict.fromkeys(docs, self.version)
+            else:
+                for record, tokens in rows:
+                    current = self._docs.get(record.id)
+                    if current is None or current.updated_at < record.updated_at:
+                        self._index(record, set(tokens))
+            self.data_as_of = max(self.data_as_of or 0, modified_at)
+        logger.info(f"Search index warmed from snapshot with {len(rows)} MRs in "
+                    f"{(time.perf_counter() - started) * 1000:.0f} ms")
+        return len(rows)
+
+    def save_snapshot(self):
+        """Write the indexed MRs and their words to the snapshot file"""
+        with self._lock:
+            rows = [record.to_row() + [sorted(self._doc_tokens[mr_id])] for mr_id, record in self._docs.items()]
+            version = self.version
+        if not rows:
+            return 0
+        try:
+            write_snapshot(rows)
+            self._snapshot_version, self._snapshot_at = version, time.time()
+        except Exception as e:
+            logger.error(f"Error writing MR snapshot: {e}")
+        return len(rows)
+
+    def load(self):
+        """Index every MR stored in MongoDB, keeping newer versions already received from the sync"""
+        count = 0
+        for doc in iter_documents('merge_requests', projection={'_id': 0, 'rollup': 0, 'diff_stats': 0}):
+            if 'mr_id' not in doc or 'title' not in doc:
+                continue
+            with self._lock:
+                current = self._docs.get(doc['mr_id'])
+                if current is not None and current.updated_at >= to_timestamp(doc.get('updated_at')):
+                    continue
+                self.update(doc)
+            count += 1
+        self.data_as_of = time.time()
+        logger.info(f"Search index loaded {count} MRs")
+
+    def on_sync(self, changed, closed_ids):
+        """MR sync listener re-indexing changed MRs (every process)"""
+        with self._lock:
+            for doc in changed:
+                self.update(doc)
+            self.data_as_of = time.time()
+
+    def snapshot_on_sync(self, changed, closed_ids):
+        """MR sync listener refreshing the snapshot every MR_SNAPSHOT_INTERVAL (sync leader only)"""
+        if self.version != self._snapshot_version and time.time() - self._snapshot_at >= MR_SNAPSHOT_INTERVAL:
+            self.save_snapshot()
+
+    def update(self, doc):
+        """Index or re-index one MR document"""
+        self._index(MRRecord.from_document(doc), _document_tokens(doc))
+
+    def _index(self, record, tokens):
+        mr_id = record.id
+        with self._lock:
+            old_tokens = self._doc_tokens.get(mr_id, set())
+            for token in old_tokens - tokens:
+                postings = self._postings[token]
+                postings.discard(mr_id)
+                if not postings:
+                    del self._postings[token]
+                    del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+            for token in tokens - old_tokens:
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = set()
+                    bisect.insort(self._vocabulary, token)
+                postings.add(mr_id)
+            self._doc_tokens[mr_id] = tokens
+            self._docs[mr_id] = record
+            self.version += 1
+            self._versions[mr_id] = self.version
+
+    def _matching_ids(self, word):
+        """Ids of MRs with an indexed word starting with `word`"""
+        ids = set()
+        position = bisect.bisect_left(self._vocabulary, word)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(word):
+            ids |= self._postings[self._vocabulary[position]]
+            position += 1
+        return ids
+
+    def _query_ids(self, words):
+        """Ids of MRs matching every query word"""
+        candidates = None
+        # Longest words first: they expand to the fewest postings
+        for word in sorted(set(words), key=len, reverse=True):
+            matches = self._matching_ids(word)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                break
+        return candidates
+
+    def matching(self, query='', stage=None, reviewer='', author='', label='', records=None):
+        """Records (all indexed ones by default) matching every query word and the page filters, unordered"""
+        words = tokenize(query)
+        with self._lock:
+            if records is None:
+                ids = self._query_ids(words) if words else self._docs.keys()
+                records = [self._docs[mr_id] for mr_id in ids]
+            elif words:
+                ids = self._query_ids(words)
+                records = [record for record in records if record.id in ids]
+        return [record for record in records
+                if in_stage(record, stage) and matches_filters(record, reviewer, author, label)]
+
+    def search(self, query, stage=None, reviewer='', author='', label='', limit=50, offset=0):
+        """MRs matching every query word and the page filters, most recently updated first"""
+        results = self.matching(query, stage, reviewer, author, label)
+        results.sort(key=lambda record: record.updated_at, reverse=True)
+        return {
+            'total': len(results),
+            'mrs': [record.to_json() for record in results[offset:offset + limit]],
+            'indexed': len(self)
+        }
+
+    def page(self, query='', stage=None, reviewer='', author='', label='', sort='updated_desc', after=None, limit=50):
+        """One keyset page of matching records in a sort order.
+
+        `after` is the (sort value, id) key of the last record of the previous page; returns the page,
+        the total number of matches and the key to continue from (None on the last page).
+        """
+        field, descending = SORTS[sort]
+        sort_key = lambda record: (getattr(record, field), record.id)
+        results = self.matching(query, stage, reviewer, author, label)
+        if after is not None:
+            after = tuple(after)
+            results_after = [r for r in results if (sort_key(r) < after if descending else sort_key(r) > after)]
+        else:
+            results_after = results
+        results_after.sort(key=sort_key, reverse=descending)
+        page = results_after[:limit]
+        next_key = sort_key(page[-1]) if len(results_after) > limit else None
+        return page, len(results), next_key
+
+    def changes_since(self, version, query='', stage=None, reviewer='', author='', label=''):
+        """Records updated after an index version, split into those matching the filters and ids that no longer do"""
+        with self._lock:
+            changed = [self._docs[mr_id] for mr_id, changed_at in self._versions.items() if changed_at > version]
+            current = self.version
+        matching = self.matching(query, stage, reviewer, author, label, records=changed)
+        matching_ids = {record.id for record in matching}
+        removed = [record.id for record in changed if record.id not in matching_ids]
+        return matching, removed, current
+
+def encode_cursor(sort, key):
+    """Opaque cursor for the page after `key` in a sort order"""
+    return base64.urlsafe_b64encode(json.dumps([sort, list(key)]).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(sort, key) of an opaque cursor; raises ValueError if it is malformed"""
+    try:
+        sort, key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if sort not in SORTS or len(key) != 2:
+            raise ValueError
+        return sort, (int(key[0]), int(key[1]))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+# Global search index instance
+search_index = MRSearchIndex()
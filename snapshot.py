@@ -0,0 +1,89 @@
+"""
+Snapshot Module for GitLab MR Manager
+Compact on-disk MR snapshot read through a memory map, so a starting worker has MR data before MongoDB or GitLab answer
+"""
+
+import os
+import json
+import mmap
+import struct
+import tempfile
+import logging
+
+# orjson encodes and decodes snapshot rows several times faster than the standard library
+try:
+    import orjson
+    _dumps, _loads = orjson.dumps, orjson.loads
+except ImportError:
+    _dumps, _loads = (lambda value: json.dumps(value, separators=(',', ':')).encode()), json.loads
+
+logger = logging.getLogger(__name__)
+
+MR_SNAPSHOT_PATH = os.getenv('MR_SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'mr_snapshot.bin'))
+
+# File layout: magic, row count, (count + 1) row end offsets relative to the data section, then the rows
+_MAGIC = b'MRSNAP02'
+_HEADER = struct.Struct('<8sI')
+_OFFSET = struct.Struct('<Q')
+
+def write_snapshot(rows, path=MR_SNAPSHOT_PATH):
+    """Write JSON-serializable rows to a snapshot file, replacing any previous one atomically"""
+    encoded = [_dumps(row) for row in rows]
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.mr_snapshot.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, len(encoded)))
+            end = 0
+            f.write(_OFFSET.pack(0))
+            for data in encoded:
+                end += len(data)
+                f.write(_OFFSET.pack(end))
+            for data in encoded:
+                f.write(data)
+        # Readers keep their memory map of the old file; new readers see the new one
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+    return len(encoded)
+
+class SnapshotReader:
+    """Rows of a snapshot file decoded on access from a read-only memory map"""
+
+    def __init__(self, path=MR_SNAPSHOT_PATH):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            self._map.close()
+            raise ValueError(f"Not an MR snapshot: {path}")
+        self._offsets = _HEADER.size
+        self._data = self._offsets + (self._count + 1) * _OFFSET.size
+        self.modified_at = os.path.getmtime(path)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start, end = struct.unpack_from('<2Q', self._map, self._offsets + index * _OFFSET.size)
+        return _loads(self._map[self._data + start:self._data + end])
+
+    def __iter__(self):
+        return (self[index] for index in range(self._count))
+
+    def close(self):
+        self._map.close()
+
+def read_snapshot(path=MR_SNAPSHOT_PATH):
+    """A SnapshotReader for the snapshot file, or None if there is no usable snapshot"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return SnapshotReader(path)
+    except Exception as e:
+        logger.error(f"Error opening MR snapshot {path}: {e}")
+        return None
@@ -0,0 +1,52 @@
+"""
+MR Stage Module for GitLab MR Manager
+Label-based review stages and list filters shared by the pages, search and analytics
+"""
+
+# Labels an MR needs (case-insensitive) to be in each stage
+TO_BE_REVIEWED_LABELS = ['self reviewed', 'peer reviewed', 'ready to be reviewed']
+REVIEWED_LABELS = TO_BE_REVIEWED_LABELS + ['reviewed']
+GOOD_TO_MERGE_LABELS = REVIEWED_LABELS + ['good to merge']
+
+STAGES = ['to_be_reviewed', 'reviewed', 'good_to_merge']
+PAGE_STAGES = ['open'] + STAGES + ['merged']
+
+_UNKNOWN = object()
+
+def mr_stage(labels):
+    """Review stage of an open MR from its labels, or None if it is not in review yet"""
+    label_names = {label.lower() for label in labels or []}
+    if all(label in label_names for label in GOOD_TO_MERGE_LABELS):
+        return 'good_to_merge'
+    if all(label in label_names for label in REVIEWED_LABELS):
+        return 'reviewed'
+    if all(label in label_names for label in TO_BE_REVIEWED_LABELS):
+        return 'to_be_reviewed'
+    return None
+
+def in_stage(mr, stage):
+    """Whether an MR dict or record belongs to a page stage ('open', a review stage or 'merged'); empty or
+    'all' matches any. A precomputed 'stage' on the MR is used instead of re-reading its labels.
+    """
+    if not stage or stage == 'all':
+        return True
+    if stage == 'merged':
+        return mr.get('state') == 'merged'
+    if mr.get('state') != 'opened':
+        return False
+    if stage == 'open':
+        return True
+    current = mr.get('stage', _UNKNOWN)
+    if current is _UNKNOWN:
+        current = mr_stage(mr.get('labels'))
+    return current == stage
+
+def matches_filters(mr, reviewer='', author='', label=''):
+    """Apply the page reviewer/author/label filters with AND logic; empty or 'all' disables a filter"""
+    if reviewer and reviewer != 'all' and reviewer not in mr.get('reviewers', ()):
+        return False
+    if author and author != 'all' and mr.get('author') != author:
+        return False
+    if label and label != 'all' and label not in mr.get('labels', ()):
+        return False
+    return True
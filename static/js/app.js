@@ -44,6 +44,9 @@ function initApp() {
     
     // Setup mobile menu functionality
     setupMobileMenu();
+    
+    // Switch stage pages to the virtualized list fed by /api/mrs
+    setupMRListView();
 }
 
 function setupEventListeners() {
@@ -65,11 +68,11 @@ function setupEventListeners() {
         });
     });
 
-    // Search functionality
-    const searchInput = document.querySelector('.search-input');
+    // Search functionality (server-side, across all pages of the current stage)
+    const searchInput = document.querySelector('.mr-search-input');
     if (searchInput) {
-        searchInput.addEventListener('input', debounce(function() {
-            performSearch(this.value);
+        searchInput.addEventListener('input', debounce(function(e) {
+            performSearch(e.target.value, e.target.dataset.stage);
         }, 300));
     }
 
@@ -263,22 +266,362 @@ function filterByLabel(labelText) {
     }
 }
 
-function performSearch(query) {
-    const mrItems = document.querySelectorAll('.mr-item');
+// Server-rendered page shown again when the search box is cleared
+let pageListHtml = null;
+let latestSearch = 0;
+
+function performSearch(query, stage) {
+    // The virtualized list searches through /api/mrs itself
+    if (mrListView) {
+        mrListView.setQuery(query.trim());
+        return;
+    }
     
-    mrItems.forEach(item => {
-        const title = item.querySelector('.mr-title').textContent.toLowerCase();
-        const author = item.querySelector('.mr-author').textContent.toLowerCase();
-        const labels = Array.from(item.querySelectorAll('.label')).map(l => l.textContent.toLowerCase());
+    const mrList = document.querySelector('.mr-list');
+    if (!mrList) {
+        return;
+    }
+    if (pageListHtml === null) {
+        pageListHtml = mrList.innerHTML;
+    }
+    const paginationElements = document.querySelectorAll('.pagination, .pagination-info');
+    
+    query = query.trim();
+    if (!query) {
+        latestSearch++;
+        mrList.innerHTML = pageListHtml;
+        paginationElements.forEach(el => el.style.display = '');
+        updateEmptyState();
+        return;
+    }
+    
+    // Combine the search with the reviewer/author/label filters of the page
+    const urlParams = new URLSearchParams(window.location.search);
+    const params = new URLSearchParams({ q: query, stage: stage || 'open' });
+    ['reviewer', 'author', 'label'].forEach(name => {
+        const value = urlParams.get(name);
+        if (value && value !== 'all') {
+            params.set(name, value);
+        }
+    });
+    
+    const searchId = ++latestSearch;
+    fetch(`/api/mrs/search?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            if (searchId !== latestSearch || !data.success) {
+                return;  // superseded by a newer search
+            }
+            const summary = `<div class="search-summary">${data.total} matching MRs${data.total > data.mrs.length ? `, showing the ${data.mrs.length} most recently updated` : ''}</div>`;
+            mrList.innerHTML = summary + data.mrs.map(mr => renderMRCard(mr, stage)).join('');
+            paginationElements.forEach(el => el.style.display = 'none');
+            updateEmptyState();
+        })
+        .catch(error => {
+            console.error('Error searching MRs:', error);
+            showNotification('Search failed', 'error');
+        });
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : text;
+    return div.innerHTML;
+}
+
+// Label name -> color, filled from /api/labels for cards rendered in the browser
+const labelColors = {};
+
+function labelStyle(name) {
+    const color = labelColors[name];
+    if (!color) {
+        return '';
+    }
+    const hex = color.replace('#', '');
+    const brightness = (parseInt(hex.substr(0, 2), 16) * 299 + parseInt(hex.substr(2, 2), 16) * 587 + parseInt(hex.substr(4, 2), 16) * 114) / 1000;
+    return ` style="background-color: ${color}; color: ${brightness > 128 ? '#000000' : '#ffffff'}; border: none;"`;
+}
+
+// Status badge and extra action per page stage, as in the stage templates
+const STAGE_CARDS = {
+    open: { status: 'open', text: 'Open' },
+    to_be_reviewed: { status: 'to-be-reviewed', text: 'To Be Reviewed', action: ['markAsReviewed', 'fa-check', 'Mark as Reviewed'] },
+    reviewed: { status: 'reviewed', text: 'Reviewed', action: ['markAsGTM', 'fa-thumbs-up', 'Mark as GTM'] },
+    good_to_merge: { status: 'good-to-merge', text: 'Good to Merge', action: ['mergeMR', 'fa-code-merge', 'Merge MR'] },
+    merged: { status: 'merged', text: 'Merged' }
+};
+
+function renderMRCard(mr, stage) {
+    const card = STAGE_CARDS[stage] || STAGE_CARDS[mr.state === 'merged' ? 'merged' : 'open'];
+    const date = value => value ? value.split('T')[0] : 'Unknown';
+    const labels = (mr.labels || []).map(label =>
+        `<span class="label" data-label-name="${escapeHtml(label)}"${labelStyle(label)}>${escapeHtml(label)}</span>`).join('');
+    const reviewers = (mr.reviewers || []).length
+        ? mr.reviewers.map(reviewer => `<span class="assignee">${escapeHtml(reviewer)}</span>`).join('')
+        : '<span style="color: #9ca3af; font-style: italic;">No reviewers assigned</span>';
+    
+    let meta = `<span><i class="fas fa-calendar"></i> Created ${date(mr.created_at)}</span>`;
+    meta += mr.merged_at
+        ? `<span><i class="fas fa-code-merge"></i> Merged ${date(mr.merged_at)}</span>`
+        : `<span><i class="fas fa-clock"></i> Updated ${date(mr.updated_at)}</span>`;
+    if (stage === 'good_to_merge') {
+        meta += mr.pipeline
+            ? `<a class="pipeline-status ${escapeHtml(mr.pipeline.status)}"${mr.pipeline.web_url ? ` href="${escapeHtml(mr.pipeline.web_url)}" target="_blank"` : ''} onclick="event.stopPropagation()"><i class="fas fa-rocket"></i> Pipeline ${escapeHtml(mr.pipeline.status.replace(/_/g, ' '))}</a>`
+            : '<span class="pipeline-status unknown"><i class="fas fa-rocket"></i> Pipeline checking...</span>';
+    }
+    if (mr.diff_stats) {
+        const stats = mr.diff_stats;
+        meta += `<span class="diff-stats"><i class="fas fa-file-code"></i> ${stats.files_changed}${stats.truncated ? '+' : ''} files <span class="diff-additions">+${stats.additions}</span> <span class="diff-deletions">-${stats.deletions}</span></span>`;
+    }
+    
+    let branches = `<span><i class="fas fa-code-branch"></i> ${escapeHtml(mr.source_branch)} → ${escapeHtml(mr.target_branch)}</span>`;
+    if (mr.git_status) {
+        branches += `<span>${mr.git_status.ahead} ahead, ${mr.git_status.behind} behind</span>`;
+        if (mr.git_status.conflicts) {
+            branches += `<span class="merge-conflicts" title="${escapeHtml(mr.git_status.conflicted_files.join(', '))}"><i class="fas fa-exclamation-triangle"></i> ${mr.git_status.conflicted_files.length} conflicting files</span>`;
+        }
+    }
+    
+    const action = card.action
+        ? `<button class="btn btn-success" onclick="event.stopPropagation(); ${card.action[0]}(${mr.id})"><i class="fas ${card.action[1]}"></i> ${card.action[2]}</button>`
+        : '';
+    
+    return `
+        <div class="mr-item" data-mr-id="${mr.id}" data-status="${card.status}" data-web-url="${escapeHtml(mr.web_url)}" onclick="openMRDetails(${mr.id})">
+            <div class="mr-header">
+                <div>
+                    <div class="mr-title">#${mr.id} ${escapeHtml(mr.title)}</div>
+                    <div class="mr-author">by ${escapeHtml(mr.author)}</div>
+                </div>
+                <span class="status ${card.status}">${card.text}</span>
+            </div>
+            <div class="mr-meta">${meta}</div>
+            <div class="mr-branches">${branches}</div>
+            <div class="mr-labels">${labels}</div>
+            <div class="mr-assignees">
+                <span style="color: #6b7280; font-size: 0.875rem;">Reviewers:</span>
+                ${reviewers}
+            </div>
+            <div class="mr-actions" style="margin-top: 1rem; display: flex; gap: 0.5rem;">
+                <button class="btn btn-secondary" onclick="event.stopPropagation(); openMRDetails(${mr.id})"><i class="fas fa-eye"></i> View</button>
+                ${action}
+            </div>
+        </div>`;
+}
+
+// Virtualized MR list: only the cards in view are in the DOM, pages are fetched by cursor while
+// scrolling, and a periodic refresh applies just the MRs that changed since the last response
+const MR_ROW_HEIGHT = 276;      // .virtual-list .mr-item height plus its margin
+const MR_OVERSCAN = 4;
+const MR_PAGE_SIZE = 100;
+const MR_REFRESH_INTERVAL = 60000;
+
+let mrListView = null;
+
+class MRListView {
+    constructor(container, stage) {
+        this.container = container;
+        this.stage = stage;
+        this.query = '';
+        this.items = [];
+        this.total = 0;
+        this.nextCursor = null;
+        this.version = 0;
+        this.loading = false;
+        this.range = null;
+        this.requestId = 0;
         
-        const matches = title.includes(query.toLowerCase()) ||
-                       author.includes(query.toLowerCase()) ||
-                       labels.some(label => label.includes(query.toLowerCase()));
+        this.viewport = document.createElement('div');
+        this.viewport.className = 'virtual-list';
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'virtual-list-spacer';
+        this.rows = document.createElement('div');
+        this.rows.className = 'virtual-list-rows';
+        this.spacer.appendChild(this.rows);
+        this.viewport.appendChild(this.spacer);
+        this.viewport.addEventListener('scroll', () => requestAnimationFrame(() => this.render()));
+    }
+    
+    params() {
+        // Filters and sort live in the page URL so they stay shareable
+        const urlParams = new URLSearchParams(window.location.search);
+        const params = new URLSearchParams({ stage: this.stage, limit: MR_PAGE_SIZE, sort: urlParams.get('sort') || 'updated_desc' });
+        ['reviewer', 'author', 'label'].forEach(name => {
+            const value = urlParams.get(name);
+            if (value && value !== 'all') {
+                params.set(name, value);
+            }
+        });
+        if (this.query) {
+            params.set('q', this.query);
+        }
+        return params;
+    }
+    
+    fetchPage(extra) {
+        const params = this.params();
+        Object.entries(extra || {}).forEach(([name, value]) => params.set(name, value));
+        return fetch(`/api/mrs?${params}`).then(response => response.json());
+    }
+    
+    // Load the first page; resolves false when the server has no MR snapshot yet
+    load() {
+        const requestId = ++this.requestId;
+        return this.fetchPage().then(data => {
+            if (requestId !== this.requestId || !data.success || !data.indexed) {
+                return false;
+            }
+            this.items = data.mrs;
+            this.total = data.total;
+            this.nextCursor = data.next_cursor;
+            this.version = data.version;
+            if (!this.viewport.parentNode) {
+                this.container.innerHTML = '';
+                this.container.appendChild(this.viewport);
+                document.querySelectorAll('.pagination, .pagination-info').forEach(el => el.style.display = 'none');
+            }
+            this.viewport.scrollTop = 0;
+            this.range = null;
+            this.render();
+            return true;
+        });
+    }
+    
+    setQuery(query) {
+        this.query = query;
+        this.load();
+    }
+    
+    loadMore() {
+        if (this.loading || !this.nextCursor) {
+            return;
+        }
+        this.loading = true;
+        const requestId = this.requestId;
+        this.fetchPage({ cursor: this.nextCursor })
+            .then(data => {
+                if (requestId !== this.requestId || !data.success) {
+                    return;
+                }
+                this.items.push(...data.mrs);
+                this.nextCursor = data.next_cursor;
+                this.range = null;
+                this.render();
+            })
+            .catch(error => console.error('Error loading MRs:', error))
+            .finally(() => this.loading = false);
+    }
+    
+    // Apply the MRs that changed since the last response instead of reloading the list
+    refresh() {
+        const requestId = this.requestId;
+        this.fetchPage({ changed_since: this.version }).then(data => {
+            if (requestId !== this.requestId || !data.success) {
+                return;
+            }
+            const gone = new Set(data.removed.concat(data.mrs.map(mr => mr.id)));
+            const before = this.items.length;
+            this.items = this.items.filter(mr => !gone.has(mr.id));
+            const removedCount = before - this.items.length;
+            
+            // Changed MRs are re-inserted in sort order; those past the loaded pages arrive with later pages
+            const sort = this.params().get('sort');
+            const field = sort.startsWith('created') ? 'created_at' : 'updated_at';
+            const descending = sort.endsWith('desc');
+            const last = this.items[this.items.length - 1];
+            let added = 0;
+            data.mrs.forEach(mr => {
+                const beyondLoaded = this.nextCursor && last && (descending ? mr[field] < last[field] : mr[field] > last[field]);
+                if (!beyondLoaded) {
+                    this.items.push(mr);
+                    added++;
+                }
+            });
+            this.items.sort((a, b) => (a[field] < b[field] ? -1 : a[field] > b[field] ? 1 : a.id - b.id) * (descending ? -1 : 1));
+            this.total += added - removedCount;
+            this.version = data.version;
+            this.range = null;
+            this.render();
+        }).catch(error => console.error('Error refreshing MRs:', error));
+    }
+    
+    render() {
+        const top = this.viewport.scrollTop;
+        const height = this.viewport.clientHeight;
+        this.spacer.style.height = `${Math.max(this.total, this.items.length) * MR_ROW_HEIGHT}px`;
         
-        item.style.display = matches ? 'block' : 'none';
-    });
+        const first = Math.max(0, Math.floor(top / MR_ROW_HEIGHT) - MR_OVERSCAN);
+        const last = Math.min(this.items.length, Math.ceil((top + height) / MR_ROW_HEIGHT) + MR_OVERSCAN);
+        if (!this.range || this.range[0] !== first || this.range[1] !== last) {
+            this.range = [first, last];
+            this.rows.style.transform = `translateY(${first * MR_ROW_HEIGHT}px)`;
+            this.rows.innerHTML = this.items.slice(first, last).map(mr => renderMRCard(mr, this.stage)).join('');
+        }
+        
+        // Fetch the next page before the user reaches the end of the loaded rows
+        if (last >= this.items.length - MR_OVERSCAN) {
+            this.loadMore();
+        }
+        
+        const emptyState = document.querySelector('.empty-state');
+        if (emptyState) {
+            emptyState.style.display = this.total === 0 ? 'block' : 'none';
+        }
+    }
+}
+
+function setupMRListView() {
+    const container = document.querySelector('.mr-list[data-stage]');
+    if (!container || !window.fetch) {
+        return;
+    }
     
-    updateEmptyState();
+    fetch('/api/labels')
+        .then(response => response.json())
+        .then(labels => labels.forEach(label => {
+            if (label && label.name && label.color) {
+                labelColors[label.name] = label.color;
+            }
+        }))
+        .catch(error => console.error('Error loading label colors:', error));
+    
+    const view = new MRListView(container, container.dataset.stage);
+    view.load().then(ready => {
+        if (!ready) {
+            return;  // keep the server-rendered page
+        }
+        mrListView = view;
+        setInterval(() => view.refresh(), MR_REFRESH_INTERVAL);
+        window.addEventListener('popstate', () => {
+            syncFilterSelects();
+            view.load();
+        });
+    }).catch(error => console.error('Error loading MR list:', error));
+}
+
+// Filter changes reload only the list when the virtualized list is active, otherwise the page
+function navigateFilters(url) {
+    if (!mrListView) {
+        window.location.href = url;
+        return;
+    }
+    history.pushState({}, '', url);
+    syncFilterSelects();
+    mrListView.load();
+}
+
+function syncFilterSelects() {
+    const urlParams = new URLSearchParams(window.location.search);
+    ['reviewer', 'author', 'label'].forEach(name => {
+        const select = document.getElementById(`${name}-filter`);
+        if (!select) {
+            return;
+        }
+        select.value = urlParams.get(name) || 'all';
+        if (typeof updateDropdownDisplay === 'function') {
+            updateDropdownDisplay(name, select.value);
+        }
+    });
 }
 
 function updateEmptyState() {
@@ -351,10 +694,10 @@ function approveMR(mrId) {
     }
 }
 
+const MERGE_JOB_POLL_INTERVAL = 5000;
+
 function mergeMR(mrId) {
     if (confirm(`Are you sure you want to merge MR #${mrId}?`)) {
-        showNotification(`Merging MR #${mrId}...`, 'info');
-        
         fetch(`/api/mrs/${mrId}/merge`, {
             method: 'POST',
             headers: {
@@ -364,11 +707,8 @@ function mergeMR(mrId) {
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                showNotification(`MR #${mrId} merged successfully!`, 'success');
-                // Reload the page to get updated data
-                setTimeout(() => {
-                    window.location.reload();
-                }, 1000);
+                showNotification(data.message, 'info');
+                pollMergeJob(data.job.id, mrId, data.job.status);
             } else {
                 showNotification(`Error: ${data.message}`, 'error');
             }
@@ -379,6 +719,33 @@ function mergeMR(mrId) {
     }
 }
 
+// Follow a queued merge until the worker finishes it, reporting status changes
+function pollMergeJob(jobId, mrId, lastStatus) {
+    setTimeout(() => {
+        fetch(`/api/merge-jobs/${jobId}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    showNotification(`Error: ${data.message}`, 'error');
+                    return;
+                }
+                const job = data.job;
+                if (job.status === 'merged') {
+                    showNotification(`MR #${mrId} merged successfully!`, 'success');
+                    setTimeout(() => window.location.reload(), 1000);
+                } else if (job.status === 'failed' || job.status === 'cancelled') {
+                    showNotification(`MR #${mrId} not merged: ${job.message}`, 'error');
+                } else {
+                    if (job.status !== lastStatus) {
+                        showNotification(`MR #${mrId}: ${job.message}`, 'info');
+                    }
+                    pollMergeJob(jobId, mrId, job.status);
+                }
+            })
+            .catch(() => pollMergeJob(jobId, mrId, lastStatus));
+    }, MERGE_JOB_POLL_INTERVAL);
+}
+
 function closeMR(mrId) {
     if (confirm(`Are you sure you want to close MR #${mrId}?`)) {
         showNotification(`Closing MR #${mrId}...`, 'info');
@@ -0,0 +1,198 @@
+"""
+MR Sync Module for GitLab MR Manager
+Syncs merge requests from GitLab incrementally in the background and notifies listeners about MRs that changed or closed
+"""
+
+import os
+import threading
+import time
+import logging
+from database import db_manager, find_one_document, update_document, bulk_upsert_documents, iter_documents
+from leader import leader_election
+from stages import mr_stage
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MR_SYNC_INTERVAL = int(os.getenv('MR_SYNC_INTERVAL', 60))  # seconds between syncs
+SYNC_CHUNK_SIZE = 1000
+SYNC_CURSOR_KEY = 'mr_sync_cursor'
+
+def _username(user):
+    """Username of a GitLab user dict"""
+    if not user:
+        return 'Unknown'
+    return user.get('username', user.get('name', 'Unknown'))
+
+def mr_document(mr):
+    """Normalize a python-gitlab MR into the record stored and passed to sync listeners (full timestamps)"""
+    return {
+        'mr_id': mr.iid,
+        'title': mr.title,
+        'description': getattr(mr, 'description', None) or '',
+        'author': _username(mr.author),
+        'state': mr.state,
+        'stage': mr_stage(mr.labels) if mr.state == 'opened' else None,
+        'labels': mr.labels or [],
+        'reviewers': [_username(r) for r in (getattr(mr, 'reviewers', None) or []) if _username(r) != 'Unknown'],
+        'assignees': [_username(a) for a in (mr.assignees or [])],
+        'source_branch': mr.source_branch,
+        'target_branch': mr.target_branch,
+        'sha': getattr(mr, 'sha', None),
+        'web_url': mr.web_url,
+        'created_at': mr.created_at,
+        'updated_at': mr.updated_at,
+        'merged_at': mr.merged_at,
+        'closed_at': mr.closed_at
+    }
+
+class MRSyncWorker:
+    """Background job keeping the MR snapshot current with as few GitLab calls as possible.
+
+    The first sync in a process lists all open MRs, plus the whole MR history the very first time
+    MongoDB is used; later syncs only ask for MRs updated since the newest updated_at seen. Listeners
+    are called as listener(changed, closed_ids) with the documents of new or updated MRs (any state)
+    and the ids of those that are no longer open, in chunks of at most SYNC_CHUNK_SIZE documents.
+
+    Only the elected leader among all instances calls GitLab. The other processes follow the MRs the
+    leader stores in MongoDB and notify just the listeners registered with every_process=True, such
+    as in-memory indexes; the leader's listeners store and derive the shared data.
+    """
+
+    def __init__(self, interval=MR_SYNC_INTERVAL):
+        self.interval = interval
+        self.project = None
+        self.last_sync = None
+        self.cursor = None      # newest updated_at seen (GitLab ISO timestamps sort lexically)
+        self._known = {}        # mr_id -> updated_at already passed to listeners
+        self._listeners = []    # (listener, every_process)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add_listener(self, listener, every_process=False):
+        """Register a callable notified after every sync; every_process listeners also run where this
+        process only follows the leader's syncs"""
+        self._listeners.append((listener, every_process))
+
+    def start(self, project):
+        """Start the sync thread; does nothing while no listener is registered"""
+        if self._thread is not None or not self._listeners:
+            return
+        self.project = project
+        leader_election.register('mr_sync')
+        self._thread = threading.Thread(target=self._run, name='mr-sync', daemon=True)
+        self._thread.start()
+        logger.info(f"Started MR sync worker (every {self.interval}s)")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if leader_election.is_leader('mr_sync'):
+                    self.sync_once()
+                else:
+                    self.follow_once()
+            except Exception as e:
+                logger.error(f"Error syncing MRs: {e}")
+            self._stop.wait(self.interval)
+
+    def _listings(self):
+        """Lazy python-gitlab listings covering this sync"""
+        mergerequests = self.project.mergerequests
+        updated_since = lambda: mergerequests.list(state='all', updated_after=self.cursor, order_by='updated_at',
+                                                   sort='asc', per_page=100, iterator=True)
+        if self.last_sync is not None and self.cursor is not None:
+            return [updated_since()]
+
+        if self.cursor is None:
+            stored = find_one_document('settings', {'key': SYNC_CURSOR_KEY})
+            self.cursor = stored['value'] if stored else None
+
+        listings = [mergerequests.list(state='opened', per_page=100, iterator=True)]
+        if self.cursor is not None:
+            listings.append(updated_since())
+        elif db_manager.db is not None:
+            # One-time backfill of the MR history into MongoDB
+            listings.append(mergerequests.list(state='all', per_page=100, iterator=True))
+        return listings
+
+    def sync_once(self):
+        """Fetch new and updated MRs once and notify listeners chunk by chunk"""
+        changed_count = 0
+        chunk = []
+        for listing in self._listings():
+            for mr in listing:
+                doc = mr_document(mr)
+                if self._known.get(doc['mr_id']) == doc['updated_at']:
+                    continue
+                self._known[doc['mr_id']] = doc['updated_at']
+                if self.cursor is None or doc['updated_at'] > self.cursor:
+                    self.cursor = doc['updated_at']
+                chunk.append(doc)
+                if len(chunk) >= SYNC_CHUNK_SIZE:
+                    self._notify(chunk)
+                    changed_count += len(chunk)
+                    chunk = []
+        if chunk:
+            self._notify(chunk)
+            changed_count += len(chunk)
+
+        if changed_count and self.cursor is not None:
+            update_document('settings', {'key': SYNC_CURSOR_KEY}, {'key': SYNC_CURSOR_KEY, 'value': self.cursor}, upsert=True)
+        self.last_sync = time.time()
+        logger.info(f"MR sync: {changed_count} MRs changed")
+        return changed_count
+
+    def follow_once(self):
+        """Notify every-process listeners of the MRs the leader stored since the last followed sync.
+
+        Only MRs up to the leader's stored cursor are read. The leader stores it after a sync has written
+        all its MRs, which arrive in no particular updated_at order, so nothing below it is still missing.
+        """
+        if db_manager.db is None:
+            return None
+        stored = find_one_document('settings', {'key': SYNC_CURSOR_KEY})
+        if stored is None:
+            return None
+        leader_cursor = stored['value']
+        if self.cursor is None:
+            # MRs up to the leader's cursor are already in MongoDB, where the index warms from
+            self.cursor = leader_cursor
+
+        changed_count = 0
+        chunk = []
+        for doc in iter_documents('merge_requests', {'updated_at': {'$gt': self.cursor, '$lte': leader_cursor}},
+                                  projection={'_id': 0, 'rollup': 0, 'diff_stats': 0}, sort=[('updated_at', 1)]):
+            chunk.append(doc)
+            if len(chunk) >= SYNC_CHUNK_SIZE:
+                self._notify(chunk, every_process_only=True)
+                self.cursor = chunk[-1]['updated_at']
+                changed_count += len(chunk)
+                chunk = []
+        if chunk:
+            self._notify(chunk, every_process_only=True)
+            changed_count += len(chunk)
+        self.cursor = max(self.cursor, leader_cursor)
+
+        self.last_sync = time.time()
+        logger.info(f"MR sync followed the leader: {changed_count} MRs changed")
+        return changed_count
+
+    def _notify(self, changed, every_process_only=False):
+        closed_ids = [doc['mr_id'] for doc in changed if doc['state'] != 'opened']
+        for listener, every_process in self._listeners:
+            if every_process_only and not every_process:
+                continue
+            try:
+                listener(changed, closed_ids)
+            except Exception as e:
+                logger.error(f"Error in MR sync listener {getattr(listener, '__qualname__', listener)}: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+def persist_mrs(changed, closed_ids):
+    """Sync listener storing changed MR documents in MongoDB with bulk upserts"""
+    bulk_upsert_documents('merge_requests', changed, key_fields=('mr_id',))
+
+# Global sync worker instance
+mr_sync = MRSyncWorker()
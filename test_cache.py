@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for clearing the Redis cache without touching the other data kept in Redis
+"""
+
+from dotenv import load_dotenv
+
+# Load environment variables before the modules read their configuration
+load_dotenv()
+
+from cache import redis_client, set_cached_data, get_cached_data, clear_all_cache
+from merge_queue import merge_queue, JOB_KEY, BRANCH_QUEUE_KEY, BRANCHES_KEY
+
+TEST_MR_ID = 999999999
+TEST_BRANCH = 'test-clear-cache'
+
+def test_redis_connection():
+    """Test Redis connection"""
+    print("🔍 Testing Redis Connection...")
+    try:
+        redis_client.ping()
+        print("✅ Redis connection successful!")
+        return True
+    except Exception as e:
+        print(f"❌ Redis connection failed: {e}")
+        print("💡 Make sure Redis is running and check your connection settings")
+        return False
+
+def test_clear_cache_keeps_merge_queue():
+    """A queued merge job survives clearing the cache while cache entries are removed"""
+    print("\n🧪 Testing Clear Cache...")
+    if not test_redis_connection():
+        return False
+
+    job = merge_queue.enqueue(TEST_MR_ID, TEST_BRANCH, requested_by='test_cache')
+    try:
+        assert job is not None, "Merge job could not be queued"
+        set_cached_data('labels:test_cache', ['label'], expiry_seconds=60)
+        assert get_cached_data('labels:test_cache') == ['label']
+
+        assert clear_all_cache()
+
+        assert get_cached_data('labels:test_cache') is None, "Cache entry survived clear_all_cache()"
+        stored = merge_queue.get_job(job['id'])
+        assert stored is not None and stored['status'] == 'queued', "Queued merge job was dropped"
+        queued_ids = [job_id.decode() for job_id in redis_client.lrange(BRANCH_QUEUE_KEY.format(TEST_BRANCH), 0, -1)]
+        assert job['id'] in queued_ids, "Merge job left its branch queue"
+        print("✅ Cache cleared, queued merge job kept")
+        return True
+    finally:
+        if job is not None:
+            merge_queue.cancel(job['id'])
+            redis_client.delete(JOB_KEY.format(job['id']), BRANCH_QUEUE_KEY.format(TEST_BRANCH))
+            redis_client.srem(BRANCHES_KEY, TEST_BRANCH)
+
+def main():
+    """Main test function"""
+    print("🚀 Cache Test Suite")
+    print("=" * 50)
+
+    if test_clear_cache_keeps_merge_queue():
+        print("\n🎉 All tests passed!")
+    else:
+        print("\n❌ Some tests failed")
+
+if __name__ == "__main__":
+    main()
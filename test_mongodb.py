@@ -14,7 +14,8 @@ def test_mongodb_connection():
     """Test MongoDB connection"""
     print("🔍 Testing MongoDB Connection...")
     
-    if db_manager.is_connected():
+    # The connection is made in the background
+    if db_manager.wait_until_connected(timeout=10) and db_manager.is_connected():
         print("✅ MongoDB connection successful!")
         print(f"📊 Available collections: {list(db_manager.collections.keys())}")
         return True
@@ -0,0 +1,142 @@
+"""
+Request Timing Module for GitLab MR Manager
+Per-request breakdown of time spent on GitLab, cache, MongoDB, filtering and rendering, sent as a Server-Timing header and a structured log line
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import logging
+from pymongo import monitoring
+from flask import request, before_render_template, template_rendered
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+REQUEST_TIMING_SAMPLE_RATE = float(os.getenv('REQUEST_TIMING_SAMPLE_RATE', 1.0))  # share of requests timed, 0 turns timing off
+
+# Order of the phases in the Server-Timing header
+PHASES = ('gitlab', 'cache', 'mongo', 'filter', 'render')
+# Probe and scrape endpoints called every few seconds, never timed or logged
+UNTIMED_PATHS = {'/healthz', '/readyz', '/metrics'}
+
+_local = threading.local()
+
+class RequestTimer:
+    """Call counts and seconds per phase for the request handled by the current thread"""
+
+    __slots__ = ('started', 'phases')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        entry = self.phases.get(phase)
+        if entry is None:
+            self.phases[phase] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def server_timing(self, total):
+        """Server-Timing header value, e.g. 'gitlab;dur=412.3;desc="2 calls", render;dur=8.1, total;dur=431.0'"""
+        parts = []
+        for phase in sorted(self.phases, key=lambda name: PHASES.index(name) if name in PHASES else len(PHASES)):
+            count, seconds = self.phases[phase]
+            parts.append(f'{phase};dur={seconds * 1000:.1f};desc="{count} call{"s" if count != 1 else ""}"')
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(parts)
+
+class _Phase:
+    __slots__ = ('timer', 'phase', 'started')
+
+    def __init__(self, timer, phase):
+        self.timer = timer
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.add(self.phase, time.perf_counter() - self.started)
+        return False
+
+class _Untimed:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        return False
+
+_UNTIMED = _Untimed()
+
+def timed(phase):
+    """Context manager adding its duration to a phase of the current request; free outside timed requests"""
+    timer = getattr(_local, 'timer', None)
+    return _UNTIMED if timer is None else _Phase(timer, phase)
+
+def record(phase, seconds):
+    """Add an already measured duration to a phase of the current request"""
+    timer = getattr(_local, 'timer', None)
+    if timer is not None:
+        timer.add(phase, seconds)
+
+class MongoTimingListener(monitoring.CommandListener):
+    """Adds the duration of every MongoDB command run by a timed request to its 'mongo' phase"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record('mongo', event.duration_micros / 1e6)
+
+    def failed(self, event):
+        record('mongo', event.duration_micros / 1e6)
+
+def _start_render(sender, template, context, **extra):
+    timer = getattr(_local, 'timer', None)
+    if timer is not None:
+        _local.render_started = time.perf_counter()
+
+def _end_render(sender, template, context, **extra):
+    started = getattr(_local, 'render_started', None)
+    if started is not None:
+        _local.render_started = None
+        record('render', time.perf_counter() - started)
+
+def init_app(app, sample_rate=REQUEST_TIMING_SAMPLE_RATE):
+    """Time a sample of the app's requests, adding Server-Timing headers and one log line per timed request"""
+    if sample_rate <= 0:
+        return
+
+    @app.before_request
+    def start_timer():
+        sampled = sample_rate >= 1 or random.random() < sample_rate
+        _local.timer = RequestTimer() if sampled and request.path not in UNTIMED_PATHS else None
+
+    @app.after_request
+    def finish_timer(response):
+        timer = getattr(_local, 'timer', None)
+        if timer is None:
+            return response
+        total = time.perf_counter() - timer.started
+        response.headers['Server-Timing'] = timer.server_timing(total)
+        entry = {'method': request.method, 'path': request.path, 'endpoint': request.endpoint,
+                 'status': response.status_code, 'duration_ms': round(total * 1000, 2)}
+        for phase, (count, seconds) in timer.phases.items():
+            entry[f"{phase}_ms"] = round(seconds * 1000, 2)
+            entry[f"{phase}_calls"] = count
+        logger.info(json.dumps(entry))
+        return response
+
+    @app.teardown_request
+    def clear_timer(exc):
+        _local.timer = None
+
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_end_render, app)
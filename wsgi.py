@@ -0,0 +1,23 @@
+"""
+WSGI Entry Point for GitLab MR Manager
+Application factory for gunicorn and other WSGI servers; importing this module connects to nothing
+"""
+
+import gc
+from app import app, start_background_workers
+from search import search_index
+
+def preload():
+    """Load the MR snapshot before workers fork, so every worker starts with MR data in shared pages"""
+    search_index.load_snapshot()
+    # Move everything loaded so far out of the collector's generations: collections in the workers
+    # then never write to (and so never copy) the pages holding the preloaded objects
+    gc.freeze()
+
+def create_app(start_workers=True):
+    """The Flask app with the snapshot loaded; start_workers=False leaves starting the background
+    workers to a post-fork hook, as a preloading server must"""
+    preload()
+    if start_workers:
+        start_background_workers()
+    return app